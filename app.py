@@ -23,17 +23,231 @@ logger = logging.getLogger(__name__)
 from cre_agent.config import load_settings
 from cre_agent.deepgram_client import DeepgramClient
 from cre_agent.merge_client import MergeClient
-from cre_agent.scoring import get_default_buybox
-from cre_agent.agent_orchestrator import run_deal_agent
+from cre_agent.scoring import get_default_buybox, sweep_buybox
+from cre_agent.underwriting import scenario_grid
+from cre_agent.jobs import enqueue_deal, get_job_queue
+from cre_agent.worker import get_local_worker
+from cre_agent.rate_limiter import get_bedrock_limiter
 from cre_agent.storage import (
     build_evidence_packet,
     send_to_vanta,
     send_to_thoropass,
     run_daily_summary_job,
     get_cluster_health,
-    upload_evidence_to_s3
+    upload_evidence_to_s3,
+    load_run,
+    runs_version
 )
+from cre_agent.run_index import get_run_index
 from cre_agent.examples import get_all_examples
+from cre_agent.file_ingest import ingest_file, iter_pdf_pages
+
+
+# Cached resources and queries - shared across reruns and sessions, so a rerun
+# only pays for what changed. History queries are keyed on runs_version() (the
+# runs directory mtime), which changes whenever a run is written.
+@st.cache_resource
+def get_settings():
+    """Settings for the server process"""
+    return load_settings()
+
+
+@st.cache_resource
+def get_deepgram_client(api_key, demo_mode):
+    return DeepgramClient(api_key=api_key, demo_mode=demo_mode)
+
+
+@st.cache_resource
+def get_merge_client(api_key, account_token, base_url, demo_mode):
+    return MergeClient(api_key=api_key, account_token=account_token, base_url=base_url, demo_mode=demo_mode)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_history_page(filters, sort, descending, limit, cursor, version):
+    return get_run_index().page(filters, sort=sort, descending=descending, limit=limit, cursor=cursor)
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_history_count(filters, version):
+    return get_run_index().count(filters)
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_stored_deals(version):
+    """Scoring inputs of stored runs with an extracted deal, read from the run index (shared; treat as read-only)"""
+    return get_run_index().scoring_inputs()
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_sweep(param, values, buybox, version):
+    return sweep_buybox(load_stored_deals(version), param, values, buybox)
+
+
+# Fragments - interactions inside one rerun only that fragment, not the whole app
+@st.fragment(run_every=1)
+def deal_job_progress(job_id):
+    """Progress of a queued analysis; reruns the app once the job finishes"""
+    job = get_job_queue().get(job_id)
+    if job and job["status"] in ("queued", "running"):
+        status = job["message"] if job["status"] == "running" else "Waiting for a worker"
+        st.progress(job["progress"], text=f"Analyzing deal (job {job_id}): {status or 'Starting'}...")
+    else:
+        st.rerun()
+
+
+# History sort options -> (index sort key, descending)
+HISTORY_SORTS = {
+    "Newest first": ("timestamp", True),
+    "Oldest first": ("timestamp", False),
+    "Highest score": ("score", True),
+    "Largest deal": ("price", True),
+    "Highest cap rate": ("cap_rate", True),
+}
+
+
+def _history_page_turn(step, next_cursor=None):
+    """Move the history view one page forward (with the page's next_cursor) or back"""
+    cursors = st.session_state.history_cursors
+    if step > 0 and next_cursor:
+        cursors.append(next_cursor)
+    elif step < 0 and len(cursors) > 1:
+        cursors.pop()
+
+
+def show_run_details(run_id):
+    """Full payload of one run - only loaded once its expander is opened"""
+    run = load_run(run_id)
+    if not run:
+        st.warning("Run payload not found")
+        return
+    score_data = run.get("score_data") or {}
+    for reason in score_data.get("reasons", []):
+        st.markdown(f"- {reason}")
+    if run.get("ic_summary"):
+        st.markdown("**IC Summary**")
+        st.markdown(run["ic_summary"])
+    if run.get("structured_deal"):
+        st.markdown("**Structured Deal**")
+        st.json(run["structured_deal"], expanded=False)
+
+
+@st.fragment
+def recent_runs_panel(markets, property_types):
+    # Filters, sort and paging all run in the run index; only the visible page of summaries is read
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        market_filter = st.selectbox("Market", ["All"] + markets, key="history_market")
+    with col2:
+        type_filter = st.selectbox("Property Type", ["All"] + property_types, key="history_type")
+    with col3:
+        verdict_filter = st.selectbox("Verdict", ["All", "Pass", "Watch", "Hard Pass"], key="history_verdict")
+
+    col1, col2, col3, col4 = st.columns([2, 2, 1.5, 1])
+    with col1:
+        score_range = st.slider("Score", 0, 100, (0, 100), key="history_score")
+    with col2:
+        date_range = st.date_input("Date Range", value=(), key="history_dates")
+    with col3:
+        sort_label = st.selectbox("Sort", list(HISTORY_SORTS.keys()), key="history_sort")
+    with col4:
+        page_size = st.selectbox("Per Page", [10, 25, 50, 100], key="history_page_size")
+
+    history_filters = {
+        "market": None if market_filter == "All" else market_filter,
+        "property_type": None if type_filter == "All" else type_filter,
+        "verdict": None if verdict_filter == "All" else verdict_filter,
+    }
+    # The full score range keeps unscored runs; any narrower range drops them
+    if score_range != (0, 100):
+        history_filters["min_score"], history_filters["max_score"] = score_range
+    if date_range:
+        history_filters["since"] = date_range[0].isoformat()
+        history_filters["until"] = date_range[-1].isoformat()
+    sort, descending = HISTORY_SORTS[sort_label]
+
+    # Keyset cursors of the pages visited so far; any change to the query starts over at page 1
+    query = (history_filters, sort, descending, page_size)
+    if st.session_state.get("history_query") != query:
+        st.session_state.history_query = query
+        st.session_state.history_cursors = [None]
+    cursors = st.session_state.history_cursors
+
+    version = runs_version()
+    page = cached_history_page(history_filters, sort, descending, page_size, cursors[-1], version)
+    matching = cached_history_count(history_filters, version)
+
+    if not page["runs"]:
+        st.info("No matching deal runs found")
+    for run_summary in page["runs"]:
+        run_id = run_summary.get("run_id")
+        run_expander = st.expander(
+            f"{run_id} - {run_summary.get('property_type') or 'Unknown'} "
+            f"in {run_summary.get('city') or 'Unknown'} - Score: {run_summary.get('score') or 0}/100",
+            key=f"history_run_{run_id}",
+            on_change="rerun"
+        )
+        with run_expander:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown(f"**Timestamp:** {run_summary.get('timestamp')}")
+                st.markdown(f"**Verdict:** {run_summary.get('verdict')}")
+                if run_summary.get('cap_rate') is not None:
+                    st.markdown(f"**Cap Rate:** {run_summary['cap_rate']:.2f}%")
+            with col2:
+                if run_summary.get('price') is not None:
+                    st.markdown(f"**Deal Size:** ${run_summary['price']:,.0f}")
+                if run_summary.get('local_path'):
+                    st.markdown(f"**File:** {run_summary['local_path']}")
+                if run_summary.get('s3_uri'):
+                    st.markdown(f"**S3:** {run_summary['s3_uri']}")
+            if run_expander.open:
+                show_run_details(run_id)
+
+    first = (len(cursors) - 1) * page_size
+    col1, col2, col3 = st.columns([1, 3, 1])
+    with col1:
+        st.button("← Previous", key="history_prev", disabled=len(cursors) == 1,
+                  on_click=_history_page_turn, args=(-1,), use_container_width=True)
+    with col2:
+        shown = f"{first + 1}-{first + len(page['runs'])}" if page["runs"] else "0"
+        st.caption(f"Page {len(cursors)} • runs {shown} of {matching:,}")
+    with col3:
+        st.button("Next →", key="history_next", disabled=page["next_cursor"] is None,
+                  on_click=_history_page_turn, args=(1, page["next_cursor"]), use_container_width=True)
+
+
+@st.fragment
+def buybox_sensitivity(buybox):
+    # Payloads are loaded once per change to the runs directory; every grid point is scored in one vectorized pass
+    version = runs_version()
+    stored_deals = load_stored_deals(version)
+    if not stored_deals:
+        return
+
+    st.subheader("Buy-Box Sensitivity")
+    st.caption("How many stored deals pass as one buy-box threshold moves (other criteria from the sidebar)")
+
+    sweep_options = {
+        "Min Cap Rate (%)": ("min_cap_rate", 3.0, 9.0, 0.25, buybox["min_cap_rate"]),
+        "Max Cap Rate (%)": ("max_cap_rate", 4.0, 12.0, 0.25, buybox["max_cap_rate"]),
+        "Max LTV": ("max_ltv", 0.5, 0.9, 0.05, buybox["max_ltv"]),
+        "Min Deal Size ($)": ("min_deal_size", 0, 20_000_000, 1_000_000, buybox["min_deal_size"]),
+        "Max Deal Size ($)": ("max_deal_size", 10_000_000, 100_000_000, 5_000_000, buybox["max_deal_size"]),
+    }
+    sweep_label = st.selectbox("Parameter", list(sweep_options.keys()))
+    param, low, high, step, current = sweep_options[sweep_label]
+
+    steps = int(round((high - low) / step)) + 1
+    values = [low + i * step for i in range(steps)]
+    sweep = cached_sweep(param, values, buybox, version)
+
+    st.bar_chart(
+        {"value": sweep["values"], **sweep["verdict_counts"]},
+        x="value",
+        y=["Pass", "Watch", "Hard Pass"]
+    )
+    st.caption(f"{len(stored_deals)} stored deals • current setting: {current}")
+
 
 # Page config
 st.set_page_config(
@@ -260,10 +474,9 @@ st.markdown("""
 <script src="/static/island-shim.js"></script>
 """, unsafe_allow_html=True)
 
-# Initialize session state
-if 'settings' not in st.session_state:
-    st.session_state.settings = load_settings()
+settings = get_settings()
 
+# Initialize session state
 if 'last_run' not in st.session_state:
     st.session_state.last_run = None
 
@@ -282,6 +495,16 @@ if 'switch_to_tab' not in st.session_state:
 if 'last_uploaded_file' not in st.session_state:
     st.session_state.last_uploaded_file = None
 
+if 'known_fields' not in st.session_state:
+    st.session_state.known_fields = None
+
+# Summary line the rent roll added to deal_text; known_fields apply only while it is there
+if 'known_fields_line' not in st.session_state:
+    st.session_state.known_fields_line = None
+
+if 'transcript' not in st.session_state:
+    st.session_state.transcript = None
+
 # Main title - Dark mode only
 st.markdown('<h1 class="main-title">⚡ REVA</h1>', unsafe_allow_html=True)
 st.markdown('<p class="reva-subtitle">POWERED BY AWS BEDROCK & S3 • DEEPGRAM • MERGE</p>', unsafe_allow_html=True)
@@ -349,12 +572,28 @@ selected_types = st.sidebar.multiselect(
 )
 buybox["preferred_property_types"] = selected_types
 
+# Monte Carlo risk simulation
+st.sidebar.subheader("Risk Simulation")
+if st.sidebar.checkbox("Run Monte Carlo simulation", value=True):
+    buybox["simulation_paths"] = st.sidebar.select_slider(
+        "Simulated paths",
+        options=[10_000, 50_000, 100_000, 250_000],
+        value=100_000
+    )
+    buybox["max_probability_of_loss"] = st.sidebar.slider(
+        "Max Probability of Loss (%)",
+        min_value=0,
+        max_value=50,
+        value=25,
+        step=5
+    ) / 100.0
+
 # Integration status with REVA styling
 st.sidebar.divider()
 st.sidebar.markdown("**INTEGRATIONS**")
-st.sidebar.markdown(f"**AWS Bedrock:** {'✅' if st.session_state.settings.has_aws_config else '❌'}")
-st.sidebar.markdown(f"**Deepgram:** {'✅' if st.session_state.settings.has_deepgram_config else '❌'}")
-st.sidebar.markdown(f"**Merge CRM:** {'✅' if st.session_state.settings.has_merge_config else '❌'}")
+st.sidebar.markdown(f"**AWS Bedrock:** {'✅' if settings.has_aws_config else '❌'}")
+st.sidebar.markdown(f"**Deepgram:** {'✅' if settings.has_deepgram_config else '❌'}")
+st.sidebar.markdown(f"**Merge CRM:** {'✅' if settings.has_merge_config else '❌'}")
 
 # Check for tab navigation via query params
 query_params = st.query_params
@@ -362,7 +601,7 @@ if "tab" in query_params:
     try:
         tab_index = int(query_params["tab"])
         st.session_state.switch_to_tab = tab_index
-        st.query_params.clear()
+        del st.query_params["tab"]
     except:
         pass
 
@@ -395,7 +634,10 @@ if st.session_state.switch_to_tab is not None:
 with tab_input:
     st.header("Deal Input")
 
-    input_method = st.radio("Input Method", ["Voice (Deepgram)", "Paste Text", "Load Example"])
+    input_method = st.radio(
+        "Input Method",
+        ["Voice (Deepgram)", "Paste Text", "Upload Document (OM / Rent Roll)", "Load Example"]
+    )
 
     if input_method == "Voice (Deepgram)":
         st.subheader("Upload Audio File")
@@ -411,6 +653,7 @@ with tab_input:
             current_file_id = f"{uploaded_file.name}_{uploaded_file.size}"
             if st.session_state.last_uploaded_file != current_file_id:
                 st.session_state.deal_text = ""
+                st.session_state.transcript = None
                 st.session_state.last_uploaded_file = current_file_id
 
         if uploaded_file:
@@ -422,16 +665,17 @@ with tab_input:
             with col2:
                 if st.button("🎤 Transcribe with Deepgram", use_container_width=True):
                     with st.spinner("Transcribing..."):
-                        deepgram_client = DeepgramClient(
-                            api_key=st.session_state.settings.deepgram_api_key,
-                            demo_mode=not st.session_state.settings.has_deepgram_config
+                        deepgram_client = get_deepgram_client(
+                            settings.deepgram_api_key,
+                            not settings.has_deepgram_config
                         )
                         audio_bytes = uploaded_file.read()
-                        transcript = deepgram_client.transcribe_bytes(
+                        transcript = deepgram_client.transcript_from_bytes(
                             audio_bytes,
                             filename=uploaded_file.name
                         )
-                        st.session_state.deal_text = transcript
+                        st.session_state.transcript = transcript
+                        st.session_state.deal_text = transcript.text
                         st.success("Transcription complete!")
                         st.rerun()
 
@@ -479,6 +723,79 @@ with tab_input:
             if 'previous_paste_text' in st.session_state:
                 st.session_state.previous_paste_text = ""
 
+    elif input_method == "Upload Document (OM / Rent Roll)":
+        st.subheader("Upload OM or Rent Roll")
+
+        uploaded_doc = st.file_uploader(
+            "Choose an OM (PDF/TXT) or rent roll (CSV/XLSX)",
+            type=["pdf", "txt", "csv", "xlsx"],
+            help="OM text is chunked and parsed; rent rolls are aggregated into unit count and occupancy"
+        )
+
+        if uploaded_doc and st.button("📄 Ingest Document", use_container_width=True):
+            with st.spinner("Ingesting document..."):
+                try:
+                    if uploaded_doc.name.lower().endswith(".pdf"):
+                        st.session_state.deal_text = "\n".join(iter_pdf_pages(uploaded_doc))
+                        st.session_state.known_fields = None
+                    elif uploaded_doc.name.lower().endswith(".txt"):
+                        st.session_state.deal_text = uploaded_doc.read().decode("utf-8", errors="replace")
+                        st.session_state.known_fields = None
+                    else:
+                        ingested = ingest_file(uploaded_doc, filename=uploaded_doc.name)
+                        rent_roll = ingested["rent_roll"]
+                        st.session_state.known_fields = {
+                            key: value for key, value in ingested["fields"].items()
+                            if key in ("units", "occupancy", "square_feet", "rent_roll") and value is not None
+                        }
+                        summary_line = f"Rent roll: {rent_roll['units']} units"
+                        if rent_roll["occupancy"] is not None:
+                            summary_line += f", {rent_roll['occupancy']:.0%} occupied"
+                        if rent_roll["avg_in_place_rent"]:
+                            summary_line += f", average in-place rent ${rent_roll['avg_in_place_rent']:,.0f}/month"
+                        st.session_state.known_fields_line = f"{summary_line}."
+                        st.session_state.deal_text = (
+                            f"{st.session_state.deal_text}\n\n{st.session_state.known_fields_line}"
+                        ).strip()
+                    st.success(f"Ingested {uploaded_doc.name}")
+                except Exception as e:
+                    st.error(f"Error ingesting {uploaded_doc.name}: {e}")
+                    logger.exception("Document ingestion failed")
+
+        if st.session_state.known_fields and st.session_state.known_fields.get("rent_roll"):
+            rent_roll = st.session_state.known_fields["rent_roll"]
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Units", rent_roll["units"])
+            with col2:
+                st.metric("Occupancy", f"{rent_roll['occupancy']:.1%}" if rent_roll["occupancy"] is not None else "N/A")
+            with col3:
+                avg_rent = rent_roll["avg_in_place_rent"]
+                st.metric("Avg In-Place Rent", f"${avg_rent:,.0f}" if avg_rent else "N/A")
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                ltl = rent_roll.get("loss_to_lease_pct")
+                st.metric("Loss-to-Lease", f"{ltl:.1%}" if ltl is not None else "N/A")
+            with col2:
+                avg_market = rent_roll.get("avg_market_rent")
+                st.metric("Avg Market Rent", f"${avg_market:,.0f}" if avg_market else "N/A")
+            with col3:
+                walt = rent_roll.get("walt_years")
+                st.metric("WALT", f"{walt:.1f} yrs" if walt is not None else "N/A")
+
+            if rent_roll.get("expiration_ladder"):
+                with st.expander("Lease Expiration Ladder"):
+                    st.table(rent_roll["expiration_ladder"])
+
+        if st.session_state.deal_text:
+            st.session_state.deal_text = st.text_area(
+                "Deal text (add broker notes if needed):",
+                value=st.session_state.deal_text,
+                height=300,
+                key="document_editor"
+            )
+
     else:  # Load Example
         st.subheader("Load Example Deal")
         examples = get_all_examples()
@@ -500,6 +817,12 @@ with tab_input:
                 key="example_viewer"
             )
 
+    # A new paste, example, recording or OM replaced the rent roll's text - its fields no longer apply
+    line = st.session_state.known_fields_line
+    if st.session_state.known_fields and not (line and line in st.session_state.deal_text):
+        st.session_state.known_fields = None
+        st.session_state.known_fields_line = None
+
     if st.session_state.deal_text:
         st.divider()
         st.markdown('<div class="navigation-hint"> Deal text loaded! Ready for analysis.</div>', unsafe_allow_html=True)
@@ -514,75 +837,179 @@ with tab_analyze:
 
     if not st.session_state.deal_text:
         st.info("Please input deal text in the Input tab first")
-    else:
-        if st.button("Run CRE Deal Agent", type="primary", use_container_width=True):
-            with st.spinner("Analyzing deal..."):
-                try:
-                    run_payload = run_deal_agent(
-                        raw_text=st.session_state.deal_text,
-                        buybox=buybox,
-                        config=st.session_state.settings
-                    )
-                    st.session_state.last_run = run_payload
-                    st.success(f"Analysis complete! Run ID: {run_payload['run_id']}")
-                except Exception as e:
-                    st.error(f"Error during analysis: {e}")
-                    logger.exception("Analysis failed")
-
-        if st.session_state.last_run:
-            run = st.session_state.last_run
-            structured = run.get("structured_deal", {})
-            score_data = run.get("score_data", {})
-            metrics = score_data.get("metrics", {})
+    elif st.button("Run CRE Deal Agent", type="primary", use_container_width=True):
+        try:
+            # Word timings only apply while the transcript is unedited
+            transcript = st.session_state.transcript
+            if transcript is not None and transcript.text != st.session_state.deal_text:
+                transcript = None
+            if settings.job_workers > 0:
+                get_local_worker(settings.job_workers)
+            job_id = enqueue_deal(
+                raw_text=st.session_state.deal_text,
+                buybox=buybox,
+                known_fields=st.session_state.known_fields,
+                transcript=transcript.to_dict() if transcript is not None else None
+            )
+            # In the URL too, so a browser refresh picks the job back up
+            st.session_state.deal_job = job_id
+            st.query_params["job"] = job_id
+        except Exception as e:
+            st.error(f"Error queueing analysis: {e}")
+            logger.exception("Queueing analysis failed")
+
+    deal_job = st.session_state.get("deal_job") or st.query_params.get("job")
+    job = get_job_queue().get(deal_job) if deal_job else None
+    if job and job["status"] in ("queued", "running"):
+        if settings.job_workers > 0:
+            get_local_worker(settings.job_workers)
+        deal_job_progress(deal_job)
+    elif deal_job:
+        st.session_state.deal_job = None
+        if "job" in st.query_params:
+            del st.query_params["job"]
+        if job and job["status"] == "succeeded":
+            st.session_state.last_run = job["result"]
+            st.success(f"Analysis complete! Run ID: {job['result']['run_id']}")
+        elif job:
+            st.error(f"Analysis {job['status']}: {job['error'] or 'no result'}")
+
+    if st.session_state.last_run:
+        run = st.session_state.last_run
+        structured = run.get("structured_deal", {})
+        score_data = run.get("score_data", {})
+        metrics = score_data.get("metrics", {})
 
-            verdict = score_data.get("verdict", "Unknown")
-            verdict_class = f"verdict-{verdict.lower().replace(' ', '-')}"
+        if run.get("config", {}).get("bedrock_status") == "degraded":
+            st.warning("AWS Bedrock was degraded (throttled or unavailable) - fields were extracted heuristically.")
 
-            st.markdown(
-                f'<div class="{verdict_class}">Verdict: {verdict} (Score: {score_data.get("score", 0)}/100)</div>',
-                unsafe_allow_html=True
+        duplicate = run.get("duplicate_of")
+        if duplicate:
+            st.info(
+                f"Duplicate of run {duplicate['run_id']} ({duplicate['match']} match, "
+                f"{duplicate['similarity']:.0%} similar) - reused its extraction and memo, re-scored against this buy-box."
             )
 
-            st.subheader("Key Metrics")
+        verdict = score_data.get("verdict", "Unknown")
+        verdict_class = f"verdict-{verdict.lower().replace(' ', '-')}"
+
+        st.markdown(
+            f'<div class="{verdict_class}">Verdict: {verdict} (Score: {score_data.get("score", 0)}/100)</div>',
+            unsafe_allow_html=True
+        )
+
+        st.subheader("Key Metrics")
+        col1, col2, col3, col4 = st.columns(4)
+
+        with col1:
+            cap_rate = metrics.get("cap_rate") or structured.get("cap_rate")
+            st.metric("Cap Rate", f"{cap_rate:.2f}%" if cap_rate else "N/A")
+
+        with col2:
+            deal_size = metrics.get("deal_size")
+            st.metric("Deal Size", f"${deal_size:,.0f}" if deal_size else "N/A")
+
+        with col3:
+            ppu = metrics.get("price_per_unit")
+            st.metric("Price/Unit", f"${ppu:,.0f}" if ppu else "N/A")
+
+        with col4:
+            ppsf = metrics.get("price_per_sf")
+            st.metric("Price/SF", f"${ppsf:.2f}" if ppsf else "N/A")
+
+        if metrics.get("annual_debt_service"):
+            st.subheader("Underwriting (10-Year Hold)")
             col1, col2, col3, col4 = st.columns(4)
 
             with col1:
-                cap_rate = metrics.get("cap_rate") or structured.get("cap_rate")
-                st.metric("Cap Rate", f"{cap_rate:.2f}%" if cap_rate else "N/A")
+                irr = metrics.get("levered_irr")
+                st.metric("Levered IRR", f"{irr:.1%}" if irr is not None else "N/A")
 
             with col2:
-                deal_size = metrics.get("deal_size")
-                st.metric("Deal Size", f"${deal_size:,.0f}" if deal_size else "N/A")
+                multiple = metrics.get("equity_multiple")
+                st.metric("Equity Multiple", f"{multiple:.2f}x" if multiple is not None else "N/A")
 
             with col3:
-                ppu = metrics.get("price_per_unit")
-                st.metric("Price/Unit", f"${ppu:,.0f}" if ppu else "N/A")
+                dscr = metrics.get("dscr")
+                st.metric("DSCR", f"{dscr:.2f}x" if dscr is not None else "N/A")
 
             with col4:
-                ppsf = metrics.get("price_per_sf")
-                st.metric("Price/SF", f"${ppsf:.2f}" if ppsf else "N/A")
-
-            st.subheader("Scoring Breakdown")
-            reasons = score_data.get("reasons", [])
-            for reason in reasons:
-                if "✓" in reason:
-                    st.markdown(f"✅ {reason}")
-                else:
-                    st.markdown(f"⚠️ {reason}")
+                debt_yield = metrics.get("debt_yield")
+                st.metric("Debt Yield", f"{debt_yield:.1%}" if debt_yield is not None else "N/A")
+
+            with st.expander("Scenario Grid (exit cap × rent growth × LTV)"):
+                base_exit = metrics.get("exit_cap_rate") or 0.065
+                scenarios = scenario_grid(
+                    structured,
+                    exit_cap_rates=[base_exit - 0.005, base_exit, base_exit + 0.005, base_exit + 0.01],
+                    rent_growths=[0.0, 0.02, 0.03, 0.04],
+                    ltvs=[0.6, 0.65, 0.7, 0.75]
+                )
+                st.dataframe([
+                    {
+                        "Exit Cap": f"{s['exit_cap_rate']:.2%}",
+                        "Rent Growth": f"{s['rent_growth']:.0%}",
+                        "LTV": f"{s['ltv']:.0%}",
+                        "Levered IRR": f"{s['levered_irr']:.1%}" if s["levered_irr"] is not None else "N/A",
+                        "Equity Multiple": f"{s['equity_multiple']:.2f}x" if s["equity_multiple"] is not None else "N/A",
+                        "DSCR": f"{s['dscr']:.2f}x" if s["dscr"] is not None else "N/A",
+                    }
+                    for s in scenarios
+                ], use_container_width=True)
 
-            st.subheader("Structured Deal Data")
-            st.json(structured)
+        simulation = score_data.get("simulation")
+        if simulation:
+            st.subheader(f"Risk Simulation ({simulation['paths']:,} paths)")
+            col1, col2, col3, col4 = st.columns(4)
 
-            st.subheader("Investment Committee Summary")
-            ic_summary = run.get("ic_summary", "")
-            st.markdown(ic_summary)
+            with col1:
+                st.metric("Probability of Loss", f"{simulation['probability_of_loss']:.1%}")
 
-            if st.button("📋 Send IC Summary to Slack"):
-                st.code(ic_summary, language=None)
-                st.info("Copy the text above to your clipboard")
+            with col2:
+                p50 = simulation["irr"]["p50"]
+                st.metric("Median IRR", f"{p50:.1%}" if p50 is not None else "N/A")
 
-            st.divider()
-            st.markdown('<div class="navigation-hint"> Deal analyzed!  CRM records Viewable.</div>', unsafe_allow_html=True)
+            with col3:
+                p5, p95 = simulation["irr"]["p5"], simulation["irr"]["p95"]
+                st.metric("IRR 5th-95th", f"{p5:.1%} – {p95:.1%}" if p5 is not None else "N/A")
+
+            with col4:
+                st.metric("P(DSCR < 1.0x)", f"{simulation['probability_dscr_below_1']:.1%}")
+
+        st.subheader("Scoring Breakdown")
+        reasons = score_data.get("reasons", [])
+        for reason in reasons:
+            if "✓" in reason:
+                st.markdown(f"✅ {reason}")
+            else:
+                st.markdown(f"⚠️ {reason}")
+
+        st.subheader("Structured Deal Data")
+        st.json(structured)
+
+        evidence = run.get("evidence")
+        if evidence:
+            with st.expander("Evidence (where in the call each field was said)"):
+                st.dataframe([
+                    {
+                        "Field": field,
+                        "At": f"{int(e['start'] // 60)}:{e['start'] % 60:04.1f}" if e.get("start") is not None else "N/A",
+                        "Speaker": e["speaker"] if e["speaker"] >= 0 else "N/A",
+                        "Quote": e["quote"],
+                    }
+                    for field, e in evidence.items()
+                ], use_container_width=True)
+
+        st.subheader("Investment Committee Summary")
+        ic_summary = run.get("ic_summary", "")
+        st.markdown(ic_summary)
+
+        if st.button("📋 Send IC Summary to Slack"):
+            st.code(ic_summary, language=None)
+            st.info("Copy the text above to your clipboard")
+
+        st.divider()
+        st.markdown('<div class="navigation-hint"> Deal analyzed!  CRM records Viewable.</div>', unsafe_allow_html=True)
 
 
 # TAB: CRM
@@ -595,6 +1022,12 @@ with tab_crm:
         run = st.session_state.last_run
         structured = run.get("structured_deal", {})
 
+        if run.get("duplicate_of"):
+            st.warning(
+                f"This deal duplicates run {run['duplicate_of']['run_id']} - "
+                "CRM records may already exist for it."
+            )
+
         st.subheader("Contact Information")
         col1, col2 = st.columns(2)
 
@@ -619,11 +1052,11 @@ with tab_crm:
         if st.button(" Create CRM Records via Merge", type="primary", use_container_width=True):
             with st.spinner("Creating CRM records..."):
                 try:
-                    merge_client = MergeClient(
-                        api_key=st.session_state.settings.merge_api_key,
-                        account_token=st.session_state.settings.merge_account_token,
-                        base_url=st.session_state.settings.merge_base_url,
-                        demo_mode=st.session_state.settings.demo_mode or not st.session_state.settings.has_merge_config
+                    merge_client = get_merge_client(
+                        settings.merge_api_key,
+                        settings.merge_account_token,
+                        settings.merge_base_url,
+                        settings.demo_mode or not settings.has_merge_config
                     )
 
                     contact_id = merge_client.upsert_contact(
@@ -688,12 +1121,12 @@ with tab_evidence:
 
                     # Upload to S3 if configured
                     s3_uri = None
-                    if st.session_state.settings.has_s3_config and st.session_state.settings.s3_bucket:
+                    if settings.has_s3_config and settings.s3_bucket:
                         with st.spinner("Uploading evidence to S3..."):
                             s3_uri = upload_evidence_to_s3(
                                 evidence,
-                                st.session_state.settings.s3_bucket,
-                                st.session_state.settings.aws_region
+                                settings.s3_bucket,
+                                settings.aws_region
                             )
                             if s3_uri:
                                 evidence["s3_uri"] = s3_uri
@@ -779,6 +1212,37 @@ with tab_jobs:
                 st.error(f"Error running job: {e}")
                 logger.exception("Daily summary job failed")
 
+    st.divider()
+    st.subheader("Deal Job Queue")
+    st.caption("Deal analyses run as queued jobs; start more workers with `python -m cre_agent.worker --concurrency 4`.")
+    job_queue = get_job_queue()
+    counts = job_queue.counts()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Queued", counts["queued"])
+    with col2:
+        st.metric("Running", counts["running"])
+    with col3:
+        st.metric("Succeeded", counts["succeeded"])
+    with col4:
+        st.metric("Failed", counts["failed"])
+
+    recent_jobs = job_queue.list_jobs(limit=20)
+    if recent_jobs:
+        st.dataframe([
+            {
+                "Job": job["job_id"],
+                "Status": job["status"],
+                "Progress": f"{job['progress']:.0%}",
+                "Step": job["message"] or "",
+                "Attempts": f"{job['attempts']}/{job['max_attempts']}",
+                "Worker": job["worker_id"] or "",
+                "Queued At": job["created_at"][:19],
+                "Error": job["error"] or "",
+            }
+            for job in recent_jobs
+        ], use_container_width=True)
+
 # TAB: Security & Infra
 with tab_security:
     st.header("Security & Infrastructure")
@@ -820,6 +1284,9 @@ with tab_security:
                     st.markdown('<div class="status-unhealthy">❌ Cluster Unhealthy</div>', unsafe_allow_html=True)
                 st.json(health)
 
+                st.markdown("**Bedrock Rate Limiter**")
+                st.json(get_bedrock_limiter().stats())
+
                 st.divider()
                 st.markdown('<div class="navigation-hint">🎉 Demo complete! View deal history or start over.</div>', unsafe_allow_html=True)
                 if st.button("View Deal History", type="primary", use_container_width=True, key="nav_to_history"):
@@ -833,44 +1300,8 @@ with tab_history:
     runs_dir = Path("./runs")
 
     if runs_dir.exists():
-        run_files = sorted(
-            [f for f in runs_dir.glob("*.json") if f.name != "evidence_log.jsonl"],
-            key=lambda f: f.stat().st_mtime,
-            reverse=True
-        )[:10]
-
-        if run_files:
-            for run_file in run_files:
-                try:
-                    with open(run_file) as f:
-                        run_data = json.load(f)
-
-                    structured = run_data.get("structured_deal", {})
-                    score_data = run_data.get("score_data", {})
-                    location = structured.get("location", {})
-                    city = location.get("city", "Unknown") if isinstance(location, dict) else "Unknown"
-
-                    with st.expander(
-                        f"{run_data.get('run_id')} - {structured.get('property_type', 'Unknown')} "
-                        f"in {city} - Score: {score_data.get('score', 0)}/100"
-                    ):
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.markdown(f"**Timestamp:** {run_data.get('timestamp')}")
-                            st.markdown(f"**Verdict:** {score_data.get('verdict')}")
-                            if 'cap_rate' in score_data.get('metrics', {}):
-                                st.markdown(f"**Cap Rate:** {score_data['metrics']['cap_rate']:.2f}%")
-                        with col2:
-                            if 'deal_size' in score_data.get('metrics', {}):
-                                st.markdown(f"**Deal Size:** ${score_data['metrics']['deal_size']:,.0f}")
-                            if 'local_path' in run_data:
-                                st.markdown(f"**File:** {run_data['local_path']}")
-                            if 's3_uri' in run_data:
-                                st.markdown(f"**S3:** {run_data['s3_uri']}")
-                except Exception as e:
-                    st.error(f"Error loading {run_file.name}: {e}")
-        else:
-            st.info("No deal runs found yet")
+        recent_runs_panel(all_markets, all_types)
+        buybox_sensitivity(buybox)
     else:
         st.info("No runs directory found. Analyze a deal to get started!")
 
@@ -0,0 +1,114 @@
+"""
+Startup benchmark for the cre_agent package
+
+Imports each entry-point module in a fresh interpreter under
+`python -X importtime` and checks its cumulative import time against a
+budget, then runs a demo-mode deal end to end and checks that no heavy SDK
+(boto3, Deepgram, requests, ...) was loaded on the way. Exits non-zero when
+a budget is exceeded or a demo path imports an SDK.
+
+    python bench_startup.py
+    python bench_startup.py --repeat 7 --scale 2   # slower machine / CI
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from statistics import median
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent
+
+# Cumulative import time budgets (ms); numpy alone is ~70ms of the orchestrator's
+BUDGETS_MS = {
+    "cre_agent.config": 40,
+    "cre_agent.jobs": 60,
+    "cre_agent.__main__": 80,
+    "cre_agent.worker": 80,
+    "cre_agent.agent_orchestrator": 250,
+    "cre_agent.deepgram_client": 250,
+}
+
+# SDKs only real (non-demo) integrations may import
+HEAVY_MODULES = ("boto3", "botocore", "deepgram", "requests", "pydantic_settings", "pyarrow", "fastapi")
+
+_DEMO_RUN = """
+import json, sys
+from cre_agent.agent_orchestrator import run_deal_agent
+from cre_agent.config import load_settings
+from cre_agent.deepgram_client import DeepgramClient
+from cre_agent.examples import get_all_examples
+from cre_agent.merge_client import MergeClient
+from cre_agent.scoring import get_default_buybox
+
+settings = load_settings(env_file=None)
+text = next(iter(get_all_examples().values()))
+run_deal_agent(text, get_default_buybox(), settings)
+DeepgramClient(demo_mode=True).transcribe_bytes(b"")
+MergeClient(demo_mode=True).upsert_contact(email="demo@example.com")
+print(json.dumps(sorted({name.split(".")[0] for name in sys.modules} & set(sys.argv[1:]))))
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")]))
+    return env
+
+
+def import_time_ms(module: str) -> float:
+    """Cumulative import time of a module in a fresh interpreter (ms)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=_env(), cwd=ROOT, check=True
+    )
+    for line in reversed(result.stderr.splitlines()):
+        # "import time: self [us] | cumulative | imported package"
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def demo_heavy_imports() -> List[str]:
+    """Heavy SDKs loaded while running one demo-mode deal (in a scratch runs/ dir)"""
+    env = _env()
+    env["DEMO_MODE"] = "1"
+    with tempfile.TemporaryDirectory() as scratch:
+        result = subprocess.run(
+            [sys.executable, "-c", _DEMO_RUN, *HEAVY_MODULES],
+            capture_output=True, text=True, env=env, cwd=scratch, check=True
+        )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check cre_agent import-time budgets")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module (median is used)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every budget (slow machines)")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':32} {'median':>9} {'budget':>9}")
+    for module, budget in BUDGETS_MS.items():
+        elapsed = median(import_time_ms(module) for _ in range(max(1, args.repeat)))
+        limit = budget * args.scale
+        over = elapsed > limit
+        failed |= over
+        print(f"{module:32} {elapsed:7.1f}ms {limit:7.0f}ms{'  OVER BUDGET' if over else ''}")
+
+    heavy = demo_heavy_imports()
+    if heavy:
+        failed = True
+        print(f"Demo-mode run imported: {', '.join(heavy)}")
+    else:
+        print("Demo-mode run imported no heavy SDKs")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Keyword matcher benchmark for the deal-text dictionaries
+
+Times text_matcher's compiled matcher against the straightforward scan it
+replaces - one str.find pass per dictionary entry over the lowercased text,
+with the same whole-word and capitalization rules - on each example deal and
+on a large document built from them. Both must report the same matches.
+Exits non-zero when they disagree or the matcher is the slower of the two.
+
+    python bench_text_matcher.py
+    python bench_text_matcher.py --repeat 50 --copies 200
+"""
+import argparse
+import sys
+import time
+from statistics import median
+from typing import Any, Callable, List, Tuple
+
+from cre_agent.examples import get_all_examples
+from cre_agent.text_matcher import KeywordMatcher, _lower_same_length, get_deal_matcher
+
+Match = Tuple[int, int, Any]
+
+
+def reference_scanner(matcher: KeywordMatcher) -> Callable[[str], List[Match]]:
+    """Per-entry str.find scan over the matcher's dictionary"""
+    entries = [
+        (key, keyword, payload, whole_word, case_sensitive)
+        for table in (matcher._whole_word, matcher._substring)
+        for key, keyed in table.items()
+        for keyword, payload, whole_word, case_sensitive in keyed
+    ]
+
+    def scan(text: str) -> List[Match]:
+        lowered = _lower_same_length(text)
+        n = len(text)
+        matches = []
+        for key, keyword, payload, whole_word, case_sensitive in entries:
+            start = lowered.find(key)
+            while start >= 0:
+                end = start + len(key)
+                if case_sensitive and text[start:end] != keyword:
+                    pass
+                elif whole_word and ((start > 0 and text[start - 1].isalnum()) or (end < n and text[end].isalnum())):
+                    pass
+                else:
+                    matches.append((start, end, payload))
+                start = lowered.find(key, start + 1)
+        return matches
+
+    return scan
+
+
+def seconds_per_call(fn: Callable[[str], Any], texts: List[str], repeat: int) -> float:
+    """Median over repeats of the time to run fn on every text, per text"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in texts:
+            fn(text)
+        timings.append((time.perf_counter() - started) / len(texts))
+    return median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the deal keyword matcher with per-keyword scans")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed passes (median is used)")
+    parser.add_argument("--copies", type=int, default=60, help="Example copies in the large document")
+    args = parser.parse_args()
+
+    matcher = get_deal_matcher()
+    reference = reference_scanner(matcher)
+    examples = list(get_all_examples().values())
+    large = "\n\n".join(examples) * args.copies
+
+    def ordered(matches: List[Match]) -> List[Tuple[int, int, str]]:
+        return sorted((start, end, repr(payload)) for start, end, payload in matches)
+
+    failed = False
+    for text in examples + [large]:
+        if ordered(matcher.find_all(text)) != ordered(reference(text)):
+            failed = True
+            print(f"Matches differ on a {len(text):,}-character text")
+
+    print(f"{len(matcher)} keywords")
+    print(f"{'text':24} {'matcher':>10} {'per-keyword':>12} {'speedup':>8}")
+    for label, texts, repeat in (
+        (f"examples (x{len(examples)})", examples, args.repeat * 10),
+        (f"large ({len(large):,} chars)", [large], args.repeat),
+    ):
+        fast = seconds_per_call(matcher.find_all, texts, repeat)
+        slow = seconds_per_call(reference, texts, repeat)
+        failed |= fast > slow
+        print(f"{label:24} {fast * 1000:8.3f}ms {slow * 1000:10.3f}ms {slow / fast:7.1f}x")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Batch transcription check against a local fake Deepgram server
+
+Serves fake /v1/listen responses (with scripted 429s) on localhost, points a
+DeepgramClient at it through base_url, and runs transcribe_many over a set
+of fake recordings. Checks that:
+
+    results are yielded in completion order (a slow first file comes last)
+    throttled files are retried by the limiter and then succeed
+    a file that stays throttled is yielded as None without stopping the batch
+    at most 2 x concurrency files are in flight, and at most concurrency
+    requests reach the server at once
+
+Exits non-zero when a check fails.
+
+    python check_deepgram_batch.py
+    python check_deepgram_batch.py --files 40 --concurrency 8
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from cre_agent.deepgram_client import DeepgramClient
+from cre_agent.rate_limiter import RateLimiter
+
+
+class FakeDeepgram:
+    """
+    Scripted /v1/listen behaviour, keyed by the uploaded file's content
+
+    Each fake recording holds a JSON header: {"name", "delay", "throttle"},
+    where throttle is how many requests for it get a 429 before it succeeds
+    (-1: always).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.attempts: Dict[str, int] = {}
+        self.completed: List[str] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def handle(self, body: bytes):
+        script = json.loads(body.decode())
+        name = script["name"]
+        with self.lock:
+            self.attempts[name] = self.attempts.get(name, 0) + 1
+            attempt = self.attempts[name]
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if script["throttle"] < 0 or attempt <= script["throttle"]:
+                return 429, {"err_code": "TOO_MANY_REQUESTS", "err_msg": "Slow down"}
+            time.sleep(script["delay"])
+            with self.lock:
+                self.completed.append(name)
+            return 200, _listen_response(f"Deal call {name}")
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def _listen_response(text: str) -> Dict:
+    words = [
+        {"word": word.lower(), "punctuated_word": word, "start": i * 0.5, "end": i * 0.5 + 0.4,
+         "confidence": 0.99, "speaker": 0}
+        for i, word in enumerate(text.split())
+    ]
+    return {
+        "metadata": {
+            "request_id": "fake", "sha256": "", "created": "2024-01-01T00:00:00Z",
+            "duration": len(words) * 0.5, "channels": 1, "models": [], "model_info": {},
+        },
+        "results": {"channels": [{"alternatives": [{"transcript": text, "confidence": 0.99, "words": words}]}]},
+    }
+
+
+def _handler(fake: FakeDeepgram):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _read_body(self) -> bytes:
+            if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                # Files are streamed in chunks (see audio.iter_file_chunks)
+                body = b""
+                while True:
+                    size = int(self.rfile.readline().split(b";")[0], 16)
+                    if not size:
+                        self.rfile.readline()
+                        return body
+                    body += self.rfile.read(size)
+                    self.rfile.readline()
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def do_POST(self):
+            body = self._read_body()
+            if not self.path.startswith("/v1/listen"):
+                status, payload = 404, {"err_msg": "Not found"}
+            else:
+                status, payload = fake.handle(body)
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check DeepgramClient.transcribe_many against a fake server")
+    parser.add_argument("--files", type=int, default=24, help="Fake recordings to transcribe")
+    parser.add_argument("--concurrency", type=int, default=4, help="transcribe_many concurrency")
+    args = parser.parse_args()
+
+    fake = FakeDeepgram()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(fake))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ.setdefault("DEEPGRAM_API_KEY", "fake-key")
+
+    # File 0 is slow; files 3 and 7 are throttled twice; the last file is always throttled
+    scripts = {}
+    for i in range(args.files):
+        throttle = 2 if i in (3, 7) else -1 if i == args.files - 1 else 0
+        scripts[f"call{i:03d}"] = {"delay": 1.0 if i == 0 else 0.02 + 0.01 * (i % 5), "throttle": throttle}
+
+    limiter = RateLimiter(
+        rate=1000, max_concurrency=args.concurrency, max_retries=3, base_backoff=0.01, max_backoff=0.05
+    )
+    client = DeepgramClient(
+        base_url=f"http://127.0.0.1:{server.server_address[1]}", preprocess=False, use_cache=False,
+        limiter=limiter, long_audio_seconds=None
+    )
+    if client.demo_mode:
+        sys.exit("Deepgram SDK unavailable - client fell back to demo mode")
+
+    failures = []
+    with tempfile.TemporaryDirectory() as scratch:
+        paths = []
+        for name, script in scripts.items():
+            path = Path(scratch) / f"{name}.wav"
+            path.write_text(json.dumps({"name": name, **script}))
+            paths.append(path)
+
+        # In flight: taken from the input but not yet transcribed
+        pulled = finished = max_outstanding = 0
+        count_lock = threading.Lock()
+        transcript_from_file = client.transcript_from_file
+
+        def counted_transcript(path):
+            nonlocal finished
+            try:
+                return transcript_from_file(path)
+            finally:
+                with count_lock:
+                    finished += 1
+
+        client.transcript_from_file = counted_transcript
+
+        def lazy_paths() -> Iterator[Path]:
+            nonlocal pulled, max_outstanding
+            for path in paths:
+                with count_lock:
+                    pulled += 1
+                    max_outstanding = max(max_outstanding, pulled - finished)
+                yield path
+
+        yielded: List[str] = []
+        started = time.perf_counter()
+        results = {}
+        for path, transcript in client.transcribe_many(lazy_paths(), concurrency=args.concurrency):
+            name = Path(path).stem
+            yielded.append(name)
+            results[name] = transcript
+        elapsed = time.perf_counter() - started
+
+    server.shutdown()
+
+    def check(condition: bool, message: str):
+        print(f"{'ok  ' if condition else 'FAIL'} {message}")
+        if not condition:
+            failures.append(message)
+
+    last = f"call{args.files - 1:03d}"
+    check(len(yielded) == args.files and set(yielded) == set(scripts), f"all {args.files} files yielded once")
+    check(yielded.index("call000") >= args.files - args.concurrency - 1,
+          f"completion order: slow first file yielded at position {yielded.index('call000')}")
+    fast_done = [name for name in fake.completed if name != "call000"]
+    check(yielded != sorted(yielded) and sorted(fast_done) == sorted(set(yielded) - {"call000", last}),
+          "results are yielded as they complete, not in input order")
+    for name in ("call003", "call007"):
+        check(fake.attempts.get(name) == 3 and results[name] is not None
+              and results[name].text == f"Deal call {name}",
+              f"{name}: 2 throttled attempts retried, then transcribed ({fake.attempts.get(name)} requests)")
+    check(results[last] is None and fake.attempts.get(last) == limiter.max_retries + 1,
+          f"{last}: throttled on every attempt, yielded as None after {fake.attempts.get(last)} requests")
+    check(max_outstanding <= 2 * args.concurrency,
+          f"at most 2 x concurrency files in flight (max {max_outstanding}, limit {2 * args.concurrency})")
+    check(fake.max_in_flight <= args.concurrency,
+          f"at most concurrency requests at the server (max {fake.max_in_flight}, limit {args.concurrency})")
+    print(f"{args.files} files in {elapsed:.2f}s; limiter stats: {limiter.stats()}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
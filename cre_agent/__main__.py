@@ -0,0 +1,346 @@
+"""
+Command-line interface - bulk deal processing without a browser session
+
+    python -m cre_agent process deals/ extra.txt --workers 8 -o runs.parquet
+    cat deals.jsonl | python -m cre_agent process - --buybox buybox.json
+    python -m cre_agent rescore --buybox buybox.json -o rescored.jsonl
+    python -m cre_agent summary
+    python -m cre_agent reindex --full
+
+Results are written as JSONL (stdout by default) or Parquet (needs
+pyarrow). Deals run on a bounded pool of threads, or of processes with
+--processes for CPU-bound (heuristic/demo) runs.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger("cre_agent.cli")
+
+TEXT_SUFFIXES = {".txt", ".md", ".eml", ".text"}
+PDF_SUFFIXES = {".pdf"}
+
+# Summary fields written per processed deal (see storage.build_run_summary)
+_SUMMARY_SKIP = ("schema_version", "blobs", "legacy")
+
+
+def _load_buybox(path: Optional[str]) -> Dict:
+    """Buy-box from a JSON file (merged over the defaults), or the defaults"""
+    from .scoring import get_default_buybox
+
+    buybox = get_default_buybox()
+    if path:
+        with open(path) as f:
+            buybox.update(json.load(f))
+    return buybox
+
+
+def _iter_files(path: Path) -> Iterator[Path]:
+    if path.is_dir():
+        for child in sorted(path.rglob("*")):
+            if child.is_file() and child.suffix.lower() in TEXT_SUFFIXES | PDF_SUFFIXES:
+                yield child
+    else:
+        yield path
+
+
+def iter_deal_inputs(inputs: Iterable[str], stdin=None) -> Iterator[Dict]:
+    """
+    Deal inputs from files, directories and stdin, read lazily
+
+    Args:
+        inputs: Paths (directories are searched recursively for .txt/.md/.eml
+            and .pdf files) or '-' for JSONL on stdin, one object per line
+            with 'text' (or 'raw_text') and optional 'id' and 'known_fields'
+        stdin: Stream to read '-' from (default: sys.stdin)
+
+    Yields:
+        {'source', 'raw_text', 'known_fields'}, or {'source', 'error'} for
+        inputs that could not be read
+    """
+    for item in inputs:
+        if item == "-":
+            for line_number, line in enumerate(stdin or sys.stdin, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    text = record.get("text") or record.get("raw_text")
+                    if not text:
+                        raise ValueError("no 'text' field")
+                except (ValueError, AttributeError) as e:
+                    yield {"source": f"stdin:{line_number}", "error": f"Invalid input line: {e}"}
+                    continue
+                yield {
+                    "source": str(record.get("id") or f"stdin:{line_number}"),
+                    "raw_text": text,
+                    "known_fields": record.get("known_fields"),
+                }
+            continue
+
+        for path in _iter_files(Path(item)):
+            try:
+                if path.suffix.lower() in PDF_SUFFIXES:
+                    from .file_ingest import iter_pdf_pages
+                    text = "\n".join(iter_pdf_pages(path))
+                else:
+                    text = path.read_text(encoding="utf-8", errors="replace")
+            except Exception as e:
+                yield {"source": str(path), "error": f"{type(e).__name__}: {e}"}
+                continue
+            yield {"source": str(path), "raw_text": text, "known_fields": None}
+
+
+def process_deal(item: Dict, buybox: Dict) -> Dict:
+    """
+    Run one deal through the agent pipeline (module-level so process pools can pickle it)
+
+    Returns:
+        Output record: 'source', the run summary fields, and 'error' (None on
+        success); 'run' holds the full payload for --full output
+    """
+    if item.get("error"):
+        return {"source": item["source"], "error": item["error"]}
+
+    from .agent_orchestrator import run_deal_agent
+    from .config import load_settings
+    from .storage import build_run_summary
+
+    try:
+        payload = run_deal_agent(item["raw_text"], buybox, load_settings(), known_fields=item.get("known_fields"))
+    except Exception as e:
+        logger.exception(f"Processing {item['source']} failed")
+        return {"source": item["source"], "error": f"{type(e).__name__}: {e}"}
+
+    summary = build_run_summary(payload)
+    record = {"source": item["source"]}
+    record.update({key: value for key, value in summary.items() if key not in _SUMMARY_SKIP})
+    record["duplicate_of"] = (payload.get("duplicate_of") or {}).get("run_id")
+    record["error"] = None
+    record["run"] = payload
+    return record
+
+
+def parallel_map(
+    fn: Callable,
+    items: Iterable,
+    *args,
+    workers: int = 4,
+    processes: bool = False
+) -> Iterator:
+    """
+    fn(item, *args) over items on a pool, yielding results as they complete
+
+    Items are consumed lazily with at most 2 x workers in flight, so
+    arbitrarily long inputs stream through in bounded memory.
+    """
+    executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    items = iter(items)
+    with executor_class(max_workers=workers) as pool:
+        pending = set()
+        for item in items:
+            pending.add(pool.submit(fn, item, *args))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+class RecordWriter:
+    """Writes records as JSONL (streamed) or Parquet (written on close)"""
+
+    def __init__(self, path: Optional[str], fmt: Optional[str] = None):
+        self.path = path if path and path != "-" else None
+        self.format = fmt or ("parquet" if self.path and self.path.endswith(".parquet") else "jsonl")
+        self._rows: List[Dict] = []
+        self._file = None
+
+        if self.format == "parquet":
+            if not self.path:
+                raise SystemExit("Parquet output needs --output PATH")
+            try:
+                import pyarrow  # noqa: F401 - fail before any work is done
+            except ImportError:
+                raise SystemExit("Parquet output needs pyarrow (pip install pyarrow); use JSONL instead")
+        elif self.path:
+            self._file = open(self.path, "w")
+        else:
+            self._file = sys.stdout
+
+    def write(self, record: Dict) -> None:
+        if self.format == "parquet":
+            self._rows.append(record)
+        else:
+            self._file.write(json.dumps(record, default=str) + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        if self.format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pylist(self._rows)
+            pq.write_table(table, self.path)
+        elif self._file is not sys.stdout:
+            self._file.close()
+
+
+def cmd_process(args) -> int:
+    if args.full and (args.format == "parquet" or (args.output or "").endswith(".parquet")):
+        raise SystemExit("--full writes nested run payloads; use JSONL output")
+
+    buybox = _load_buybox(args.buybox)
+    writer = RecordWriter(args.output, args.format)
+    started = time.monotonic()
+    count = failed = 0
+    try:
+        results = parallel_map(
+            process_deal, iter_deal_inputs(args.inputs or ["-"]), buybox,
+            workers=args.workers, processes=args.processes
+        )
+        for record in results:
+            run = record.pop("run", None)
+            if args.full and run is not None:
+                record["run"] = run
+            writer.write(record)
+            count += 1
+            failed += record["error"] is not None
+    finally:
+        writer.close()
+
+    elapsed = time.monotonic() - started
+    print(f"Processed {count} deals ({failed} failed) in {elapsed:.1f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def cmd_rescore(args) -> int:
+    from .agent_orchestrator import rescore_run, unknown_run_record
+    from .storage import iter_run_summaries, load_run_summary
+
+    buybox = _load_buybox(args.buybox)
+    unknown: List[str] = []
+    if args.run_id:
+        # Named runs are read directly instead of filtering every stored summary
+        summaries = []
+        for run_id in dict.fromkeys(args.run_id):
+            summary = load_run_summary(run_id)
+            if summary is None:
+                unknown.append(run_id)
+            else:
+                summaries.append(summary)
+    else:
+        summaries = iter_run_summaries()
+
+    writer = RecordWriter(args.output, args.format)
+    count = failed = changed = 0
+    try:
+        for run_id in unknown:
+            writer.write(unknown_run_record(run_id))
+            count += 1
+            failed += 1
+        for record in parallel_map(rescore_run, summaries, buybox, workers=args.workers, processes=args.processes):
+            writer.write(record)
+            count += 1
+            failed += record["error"] is not None
+            changed += bool(record["change"])
+    finally:
+        writer.close()
+
+    print(f"Rescored {count} runs ({changed} changed, {failed} failed)", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def cmd_summary(args) -> int:
+    from .storage import run_daily_summary_job
+
+    summary = run_daily_summary_job()
+    if args.output or args.format:
+        writer = RecordWriter(args.output, args.format)
+        writer.write(summary)
+        writer.close()
+    else:
+        print(json.dumps(summary, indent=2, default=str))
+    return 0 if summary["status"] in ("success", "no_data") else 1
+
+
+def cmd_reindex(args) -> int:
+    from .run_index import INDEX_FILENAME, RunIndex
+    from .storage import RUNS_DIR
+
+    # Opened directly: get_run_index() would sync a new index before we could count
+    started = time.monotonic()
+    index = RunIndex(RUNS_DIR / INDEX_FILENAME)
+    try:
+        result = index.sync(full=args.full)
+    finally:
+        index.close()
+    print(
+        f"Indexed {result['indexed']} runs ({result['removed']} removed, {result['total']} total) "
+        f"in {time.monotonic() - started:.1f}s",
+        file=sys.stderr
+    )
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m cre_agent", description="CRE deal agent command line")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="Log progress (-vv for debug)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_output(command):
+        command.add_argument("-o", "--output", help="Output file (default: JSONL on stdout)")
+        command.add_argument("--format", choices=["jsonl", "parquet"],
+                             help="Output format (default: from the output suffix, else jsonl)")
+
+    def add_pool(command):
+        command.add_argument("--workers", type=int, default=os.cpu_count() or 4,
+                             help="Deals processed at once (default: CPU count)")
+        command.add_argument("--processes", action="store_true",
+                             help="Use worker processes instead of threads (CPU-bound runs; "
+                                  "rate limits then apply per process)")
+
+    process = commands.add_parser("process", help="Run deal texts through the pipeline")
+    process.add_argument("inputs", nargs="*",
+                         help="Files, directories, or - for JSONL on stdin (default: -)")
+    process.add_argument("--buybox", help="Buy-box JSON file (merged over the defaults)")
+    process.add_argument("--full", action="store_true", help="Include full run payloads (JSONL only)")
+    add_pool(process)
+    add_output(process)
+    process.set_defaults(handler=cmd_process)
+
+    rescore = commands.add_parser("rescore", help="Rescore stored runs against a buy-box")
+    rescore.add_argument("--buybox", help="Buy-box JSON file (merged over the defaults)")
+    rescore.add_argument("--run-id", action="append", help="Only this run (repeatable)")
+    add_pool(rescore)
+    add_output(rescore)
+    rescore.set_defaults(handler=cmd_rescore)
+
+    summary = commands.add_parser("summary", help="Run the daily summary job")
+    add_output(summary)
+    summary.set_defaults(handler=cmd_summary)
+
+    reindex = commands.add_parser("reindex", help="Bring the run index (runs/index.sqlite) up to date")
+    reindex.add_argument("--full", action="store_true", help="Re-read every run file, not just changed ones")
+    reindex.set_defaults(handler=cmd_reindex)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    level = logging.WARNING if not args.verbose else logging.INFO if args.verbose == 1 else logging.DEBUG
+    logging.basicConfig(level=level, stream=sys.stderr, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
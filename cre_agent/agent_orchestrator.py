@@ -3,13 +3,18 @@ CRE Deal Agent Orchestrator - chains all components together
 """
 import logging
 from datetime import datetime
-from typing import Dict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
 import uuid
 
 from .config import Settings
 from .bedrock_client import BedrockClient
+from .dedup import fingerprint, get_dedup_index, structured_key
+from .rate_limiter import get_bedrock_limiter
 from .deal_parser import heuristic_parse
+from .document_ingest import LONG_DOCUMENT_CHARS, extract_document_text
 from .scoring import score_deal
+from .transcript import Transcript
 
 logger = logging.getLogger(__name__)
 
@@ -35,10 +40,23 @@ def merge_deal_data(bedrock_result: Dict, heuristic_result: Dict) -> Dict:
     return merged
 
 
+def _bedrock_client(config: Settings) -> BedrockClient:
+    """Bedrock client for a run (demo mode if not configured), sharing the process-wide limiter"""
+    return BedrockClient(
+        region=config.aws_region,
+        use_bedrock=config.use_bedrock and config.has_aws_config,
+        demo_mode=config.demo_mode or not config.has_aws_config,
+        limiter=get_bedrock_limiter(config.bedrock_max_rps, config.bedrock_max_concurrency)
+    )
+
+
 def run_deal_agent(
     raw_text: str,
     buybox: Dict,
-    config: Settings
+    config: Settings,
+    known_fields: Optional[Dict] = None,
+    transcript: Optional[Transcript] = None,
+    progress: Optional[Callable[[float, str], None]] = None
 ) -> Dict:
     """
     Main agent pipeline - orchestrates the entire CRE deal analysis
@@ -47,49 +65,121 @@ def run_deal_agent(
         raw_text: Raw deal text (from transcription, email, etc.)
         buybox: Buy-box criteria
         config: Application settings
+        known_fields: Fields already extracted from structured sources (e.g. a
+            rent roll); they take precedence over text extraction
+        transcript: Diarized call transcript raw_text came from; heuristics
+            then read only the broker's turns
+        progress: Called with (fraction done, step description) as the
+            pipeline advances (e.g. to update a queued job)
 
     Returns:
-        Complete run payload with all analysis results
+        Complete run payload with all analysis results. Exact repeats of an
+        already processed deal reuse its extraction and memo and are
+        re-scored; near and structured matches may carry edited terms, so they
+        are extracted afresh. Both carry 'duplicate_of' ({run_id, match,
+        similarity}). Runs from a
+        transcript carry 'evidence' (field -> where in the call it was said).
     """
     run_id = str(uuid.uuid4())[:8]
     timestamp = datetime.now().isoformat()
 
     logger.info(f"Starting deal agent run {run_id}")
 
-    # Step 1: Extract structured data
-    logger.info("Step 1: Extracting deal structure")
+    def report(fraction: float, message: str) -> None:
+        if progress:
+            progress(fraction, message)
 
-    # Always run heuristic parsing
-    heuristic_result = heuristic_parse(raw_text)
+    # Heuristic parsing of the whole text (also keys the dedup lookup); long
+    # documents are only parsed chunk by chunk, after the prefilter
+    long_document = len(raw_text) > LONG_DOCUMENT_CHARS
+    heuristic_result = {} if long_document else heuristic_parse(transcript if transcript is not None else raw_text)
+    evidence = heuristic_result.pop("evidence", None)
 
-    # Run Bedrock extraction (will use demo mode if not configured)
-    bedrock_client = BedrockClient(
-        region=config.aws_region,
-        use_bedrock=config.use_bedrock and config.has_aws_config,
-        demo_mode=config.demo_mode or not config.has_aws_config
-    )
-    bedrock_result = bedrock_client.extract_deal_struct(raw_text)
+    # Step 0: Dedup - link repeat arrivals to the run that already processed the deal
+    from .storage import load_run, log_run_local, log_run_s3, update_run_summary
+
+    duplicate = None
+    existing_run = None
+    deal_fingerprint = None
+    if config.dedup_enabled:
+        dedup_index = get_dedup_index()
+        deal_fingerprint = fingerprint(
+            raw_text, merge_deal_data(known_fields or {}, heuristic_result), max_chars=LONG_DOCUMENT_CHARS
+        )
+        duplicate = dedup_index.lookup(deal_fingerprint)
+        if duplicate:
+            existing_run = load_run(duplicate["run_id"])
+            if not existing_run or not existing_run.get("structured_deal"):
+                # Stale index entry (run record deleted) - forget it and process normally
+                dedup_index.remove(duplicate["run_id"])
+                duplicate = None
+                existing_run = None
+            elif duplicate["match"] != "exact":
+                # A forwarded copy with edits (new price, cap rate) - link it, but extract it again
+                existing_run = None
+
+    bedrock_client = None
+    field_provenance = None
+
+    if existing_run:
+        # Reuse the original extraction and memo - no Bedrock spend for a repeat
+        logger.info(f"Deal is an exact duplicate of run {duplicate['run_id']}; reusing its extraction")
+        structured_deal = dict(existing_run["structured_deal"])
+        field_provenance = existing_run.get("field_provenance")
+    else:
+        if duplicate:
+            logger.info(
+                f"Deal is a {duplicate['match']} duplicate of run {duplicate['run_id']} "
+                f"(similarity {duplicate['similarity']:.2f}); extracting it again"
+            )
+
+        # Step 1: Extract structured data
+        logger.info("Step 1: Extracting deal structure")
+        report(0.1, "Extracting deal structure")
+
+        # Run Bedrock extraction (will use demo mode if not configured)
+        bedrock_client = _bedrock_client(config)
+
+        if long_document:
+            # Long OMs: extract from keyword-dense chunks in parallel and reconcile
+            if bedrock_client.status == "demo":
+                chunk_extractor = heuristic_parse
+            else:
+                def chunk_extractor(chunk_text: str) -> Dict:
+                    return merge_deal_data(bedrock_client.extract_deal_struct(chunk_text), heuristic_parse(chunk_text))
+
+            fields, field_provenance = extract_document_text(raw_text, extractor=chunk_extractor)
+            structured_deal = merge_deal_data(fields, heuristic_parse(""))
+            structured_deal["notes"] = raw_text[:500]
+        else:
+            bedrock_result = bedrock_client.extract_deal_struct(raw_text)
+
+            # Merge results
+            structured_deal = merge_deal_data(bedrock_result, heuristic_result)
+
+    if known_fields:
+        structured_deal = merge_deal_data(known_fields, structured_deal)
 
-    # Merge results
-    structured_deal = merge_deal_data(bedrock_result, heuristic_result)
     logger.info(f"Extracted deal structure: {structured_deal.get('property_type')} in {structured_deal.get('location')}")
 
+    if bedrock_client and bedrock_client.status == "degraded":
+        logger.warning(f"Bedrock degraded ({bedrock_client.last_error}); using heuristic extraction only")
+
     # Step 2: Score the deal
     logger.info("Step 2: Scoring deal against buy-box")
+    report(0.5, "Scoring deal against buy-box")
     score_data = score_deal(structured_deal, buybox)
     logger.info(f"Deal score: {score_data['score']}/100 - {score_data['verdict']}")
 
     # Step 3: Generate IC summary
     logger.info("Step 3: Generating IC summary")
-    ic_summary = ""
-
-    # Always create a Bedrock client (will use demo mode if not configured)
-    bedrock_client = BedrockClient(
-        region=config.aws_region,
-        use_bedrock=config.use_bedrock and config.has_aws_config,
-        demo_mode=config.demo_mode or not config.has_aws_config
-    )
-    ic_summary = bedrock_client.generate_ic_summary(structured_deal)
+    report(0.7, "Generating IC summary")
+    if existing_run and existing_run.get("ic_summary"):
+        ic_summary = existing_run["ic_summary"]
+    else:
+        if bedrock_client is None:
+            bedrock_client = _bedrock_client(config)
+        ic_summary = bedrock_client.generate_ic_summary(structured_deal)
 
     # Step 4: Build run payload
     run_payload = {
@@ -104,21 +194,123 @@ def run_deal_agent(
             "demo_mode": config.demo_mode,
             "used_bedrock": config.has_aws_config,
             "has_s3": config.has_s3_config,
+            "bedrock_status": bedrock_client.status if bedrock_client else "skipped",
         }
     }
 
-    # Step 5: Log locally
-    from .storage import log_run_local, log_run_s3
+    if field_provenance:
+        run_payload["field_provenance"] = field_provenance
+
+    if evidence:
+        run_payload["evidence"] = evidence
+
+    if duplicate:
+        run_payload["duplicate_of"] = duplicate
 
+    # Step 5: Log locally
+    report(0.9, "Saving run")
     local_path = log_run_local(run_id, run_payload)
     run_payload["local_path"] = local_path
 
+    # New deals become the canonical run that later copies link to
+    if deal_fingerprint is not None and not duplicate:
+        if long_document and not deal_fingerprint["struct_key"]:
+            # Long documents are keyed by the fields their chunks yielded
+            deal_fingerprint["struct_key"] = structured_key(structured_deal)
+        get_dedup_index().add(run_id, deal_fingerprint)
+
     # Step 6: Log to S3 if configured
     if config.has_s3_config:
         s3_uri = log_run_s3(run_id, run_payload, config.s3_bucket, config.aws_region)
         if s3_uri:
             run_payload["s3_uri"] = s3_uri
+            update_run_summary(run_id, s3_uri=s3_uri)
 
     logger.info(f"Deal agent run {run_id} completed successfully")
 
     return run_payload
+
+
+def process_recordings(
+    paths: Iterable[Union[str, Path]],
+    buybox: Dict,
+    config: Settings,
+    concurrency: int = 4
+) -> Iterator[Tuple[str, Optional[Dict]]]:
+    """
+    Transcribe a batch of call recordings and run the agent on each as it finishes
+
+    Args:
+        paths: Audio file paths (consumed lazily)
+        buybox: Buy-box criteria
+        config: Application settings
+        concurrency: Concurrent transcriptions
+
+    Yields:
+        (path, run payload) in completion order; the payload is None when
+        transcription failed
+    """
+    from .deepgram_client import DeepgramClient
+
+    deepgram = DeepgramClient(
+        api_key=config.deepgram_api_key,
+        demo_mode=not config.has_deepgram_config,
+        base_url=config.deepgram_base_url
+    )
+    for path, transcript in deepgram.transcribe_many(paths, concurrency=concurrency):
+        if transcript is None or not transcript.text:
+            yield path, None
+            continue
+        yield path, run_deal_agent(transcript.text, buybox, config, transcript=transcript)
+
+
+def rescore_run(summary: Dict, buybox: Dict) -> Dict:
+    """
+    Score a stored run against a (new) buy-box without reprocessing it
+
+    Args:
+        summary: Hot summary record of the run
+        buybox: Buy-box criteria
+
+    Returns:
+        Record with the run's identity, previous and new score/verdict,
+        'change', 'reasons' and 'error' (None on success)
+    """
+    from .storage import load_run_blob
+
+    record = {
+        "run_id": summary.get("run_id"),
+        "timestamp": summary.get("timestamp"),
+        "property_type": summary.get("property_type"),
+        "city": summary.get("city"),
+        "previous_score": summary.get("score"),
+        "previous_verdict": summary.get("verdict"),
+    }
+    try:
+        structured = load_run_blob(summary, "structured_deal")
+        if structured is None:
+            raise ValueError("run has no structured deal")
+        score_data = score_deal(structured, buybox)
+    except Exception as e:
+        return {**record, "score": None, "verdict": None, "change": None, "reasons": None,
+                "error": f"{type(e).__name__}: {e}"}
+
+    previous = summary.get("score")
+    return {
+        **record,
+        "score": score_data["score"],
+        "verdict": score_data["verdict"],
+        "change": score_data["score"] - previous if previous is not None else None,
+        "reasons": score_data["reasons"],
+        "error": None,
+    }
+
+
+def unknown_run_record(run_id: str) -> Dict:
+    """rescore_run-shaped error record for a run id with no stored run"""
+    return {
+        "run_id": run_id, "timestamp": None, "property_type": None, "city": None,
+        "previous_score": None, "previous_verdict": None,
+        "score": None, "verdict": None, "change": None, "reasons": None,
+        "error": f"Unknown run {run_id}",
+    }
@@ -0,0 +1,344 @@
+"""
+Audio preprocessing - downmix/resample/compress before upload, and a content-hash transcript cache
+
+Broker calls usually arrive as 48kHz stereo WAVs. Speech models only need
+16kHz mono, so audio is reduced before it is uploaded:
+
+    ffmpeg available   -> 16kHz mono Opus (or FLAC)
+    WAV, no ffmpeg     -> 16kHz mono 16-bit WAV via NumPy (stdlib wave I/O)
+    anything else      -> uploaded unchanged
+
+Transcripts are cached on disk under a key of the original audio's SHA-256
+plus the model options, so re-uploads and reruns never pay for the same
+transcription twice.
+"""
+import hashlib
+import io
+import json
+import logging
+import shutil
+import subprocess
+import tempfile
+import threading
+import wave
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TARGET_SAMPLE_RATE = 16000
+OPUS_BITRATE = "24k"
+FFMPEG_TIMEOUT_SECONDS = 300
+
+# Anti-aliasing filter length (odd) and how many output samples to filter per block
+FILTER_TAPS = 63
+RESAMPLE_BLOCK = 1 << 16
+
+TRANSCRIPTS_DIRNAME = "transcripts"
+FILE_CHUNK_BYTES = 1 << 20
+
+_FFMPEG_CODECS = {
+    "opus": (["-c:a", "libopus", "-b:a", OPUS_BITRATE, "-application", "voip", "-f", "ogg"], "audio/ogg"),
+    "flac": (["-c:a", "flac", "-f", "flac"], "audio/flac"),
+}
+
+
+def _encode_options(options: Optional[Dict]) -> bytes:
+    return json.dumps(options or {}, sort_keys=True, separators=(",", ":")).encode()
+
+
+def audio_cache_key(audio_bytes: bytes, options: Optional[Dict] = None) -> str:
+    """
+    Cache key for a transcription: SHA-256 over the audio and the canonical model options
+
+    Args:
+        audio_bytes: Original (unprocessed) audio bytes
+        options: Model and request options that change the transcript
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256(audio_bytes)
+    digest.update(_encode_options(options))
+    return digest.hexdigest()
+
+
+def _lowpass_taps(cutoff: float, taps: int = FILTER_TAPS) -> np.ndarray:
+    """Hamming-windowed sinc low-pass; cutoff as a fraction of the sample rate"""
+    n = np.arange(taps) - taps // 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (h / h.sum()).astype(np.float32)
+
+
+def resample(samples: np.ndarray, source_rate: int, target_rate: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """
+    Resample mono audio
+
+    Downsampling low-pass filters below the new Nyquist rate; the filter
+    is evaluated only at the input samples each output sample needs, in
+    blocks, then linearly interpolated to the output positions.
+
+    Args:
+        samples: 1-D float32 samples
+        source_rate: Input sample rate in Hz
+        target_rate: Output sample rate in Hz
+
+    Returns:
+        1-D float32 samples at target_rate
+    """
+    if source_rate == target_rate or not samples.size:
+        return samples.astype(np.float32, copy=False)
+
+    n_out = int(samples.size * target_rate // source_rate)
+    positions = np.arange(n_out, dtype=np.float64) * (source_rate / target_rate)
+    index = positions.astype(np.int64)
+    frac = (positions - index).astype(np.float32)
+
+    if source_rate > target_rate:
+        taps = _lowpass_taps(0.45 * target_rate / source_rate)
+    else:
+        taps = np.ones(1, dtype=np.float32)
+    pad = taps.size // 2
+    padded = np.pad(samples.astype(np.float32, copy=False), (pad, pad + 1))
+    # windows[i] is centered on samples[i]; one extra row so index + 1 is always valid
+    windows = np.lib.stride_tricks.sliding_window_view(padded, taps.size)
+
+    out = np.empty(n_out, dtype=np.float32)
+    for start in range(0, n_out, RESAMPLE_BLOCK):
+        block = index[start:start + RESAMPLE_BLOCK]
+        left = windows[block] @ taps
+        right = windows[block + 1] @ taps
+        out[start:start + block.size] = left + frac[start:start + block.size] * (right - left)
+    return out
+
+
+def _decode_pcm(frames: bytes, sample_width: int, channels: int) -> np.ndarray:
+    """PCM frames -> float32 array of shape (samples, channels) in [-1, 1]"""
+    if sample_width == 1:
+        data = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 2:
+        data = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        values = raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int32) << 16)
+        values = np.where(values & 0x800000, values - (1 << 24), values)
+        data = values.astype(np.float32) / float(1 << 23)
+    elif sample_width == 4:
+        data = np.frombuffer(frames, dtype="<i4").astype(np.float32) / float(1 << 31)
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {sample_width}")
+    return data.reshape(-1, channels)
+
+
+def read_wav(audio_bytes: bytes):
+    """
+    Decode a PCM WAV to mono float32 samples
+
+    Returns:
+        (samples, sample_rate) with channels averaged together
+    """
+    with wave.open(io.BytesIO(audio_bytes), "rb") as wav:
+        channels = wav.getnchannels()
+        sample_width = wav.getsampwidth()
+        sample_rate = wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+    samples = _decode_pcm(frames, sample_width, channels)
+    return samples.mean(axis=1) if channels > 1 else samples[:, 0], sample_rate
+
+
+def encode_wav(samples: np.ndarray, sample_rate: int = TARGET_SAMPLE_RATE) -> bytes:
+    """Encode mono float32 samples as a 16-bit PCM WAV"""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def _is_wav(audio_bytes: bytes) -> bool:
+    return audio_bytes[:4] == b"RIFF" and audio_bytes[8:12] == b"WAVE"
+
+
+def _ffmpeg_transcode(source: Union[str, Path], codec: str) -> Optional[bytes]:
+    """Transcode an audio file with ffmpeg to 16kHz mono; None if ffmpeg fails"""
+    codec_args, _ = _FFMPEG_CODECS[codec]
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin",
+        "-i", str(source), "-vn", "-ac", "1", "-ar", str(TARGET_SAMPLE_RATE),
+        *codec_args, "pipe:1",
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=FFMPEG_TIMEOUT_SECONDS)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"ffmpeg {codec} transcode failed: {e}")
+        return None
+
+    if result.returncode != 0 or not result.stdout:
+        logger.warning(f"ffmpeg {codec} transcode failed: {result.stderr.decode(errors='replace').strip()[:200]}")
+        return None
+    return result.stdout
+
+
+def _ffmpeg_preprocess(source: Union[str, Path], codec: str) -> Optional[Dict]:
+    """Try the requested codec, then FLAC"""
+    for attempt in dict.fromkeys((codec, "flac")):
+        encoded = _ffmpeg_transcode(source, attempt)
+        if encoded:
+            return {"data": encoded, "mimetype": _FFMPEG_CODECS[attempt][1], "method": f"ffmpeg-{attempt}"}
+    return None
+
+
+def preprocess_audio(audio_bytes: bytes, filename: str = "audio.wav", codec: str = "opus") -> Dict:
+    """
+    Reduce audio to 16kHz mono (compressed when ffmpeg is available) for upload
+
+    Args:
+        audio_bytes: Original audio file bytes
+        filename: Original filename (its extension helps ffmpeg probe the format)
+        codec: 'opus' or 'flac' when transcoding with ffmpeg
+
+    Returns:
+        Dictionary with 'data' (bytes to upload), 'mimetype' (None if
+        unchanged), 'method' ('ffmpeg-opus', 'ffmpeg-flac', 'wav-resample'
+        or 'none'), 'original_bytes' and 'processed_bytes'
+    """
+    if codec not in _FFMPEG_CODECS:
+        raise ValueError(f"Unsupported codec: {codec} (expected one of {sorted(_FFMPEG_CODECS)})")
+
+    result = {"data": audio_bytes, "mimetype": None, "method": "none"}
+
+    if shutil.which("ffmpeg"):
+        # Containers like MP4/M4A need a seekable input, so use a temp file rather than stdin
+        with tempfile.NamedTemporaryFile(suffix=Path(filename).suffix or ".bin") as source:
+            source.write(audio_bytes)
+            source.flush()
+            result = _ffmpeg_preprocess(source.name, codec) or result
+
+    if result["method"] == "none" and _is_wav(audio_bytes):
+        try:
+            samples, sample_rate = read_wav(audio_bytes)
+            target_rate = min(sample_rate, TARGET_SAMPLE_RATE)
+            encoded = encode_wav(resample(samples, sample_rate, target_rate), target_rate)
+            result = {"data": encoded, "mimetype": "audio/wav", "method": "wav-resample"}
+        except (wave.Error, ValueError, EOFError) as e:
+            logger.warning(f"Could not preprocess WAV {filename}: {e}")
+
+    # Never upload more than the original
+    if len(result["data"]) >= len(audio_bytes):
+        result = {"data": audio_bytes, "mimetype": None, "method": "none"}
+
+    result["original_bytes"] = len(audio_bytes)
+    result["processed_bytes"] = len(result["data"])
+    logger.info(
+        f"Preprocessed {filename}: {result['original_bytes']} -> {result['processed_bytes']} bytes "
+        f"({result['method']})"
+    )
+    return result
+
+
+def iter_file_chunks(path: Union[str, Path], chunk_size: int = FILE_CHUNK_BYTES) -> Iterator[bytes]:
+    """Read a file in chunks (for streaming uploads and hashing)"""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def file_cache_key(path: Union[str, Path], options: Optional[Dict] = None) -> str:
+    """audio_cache_key of a file's contents, hashed in chunks without loading the file"""
+    digest = hashlib.sha256()
+    for chunk in iter_file_chunks(path):
+        digest.update(chunk)
+    digest.update(_encode_options(options))
+    return digest.hexdigest()
+
+
+def preprocess_audio_file(path: Union[str, Path], codec: str = "opus") -> Optional[Dict]:
+    """
+    Preprocess an audio file on disk (see preprocess_audio)
+
+    ffmpeg reads the file directly; without ffmpeg only WAVs are reduced.
+
+    Returns:
+        preprocess_audio result, or None when the file should be streamed
+        from disk unchanged
+    """
+    if codec not in _FFMPEG_CODECS:
+        raise ValueError(f"Unsupported codec: {codec} (expected one of {sorted(_FFMPEG_CODECS)})")
+
+    path = Path(path)
+    size = path.stat().st_size
+    result = _ffmpeg_preprocess(path, codec) if shutil.which("ffmpeg") else None
+
+    if result is None:
+        with open(path, "rb") as f:
+            is_wav = _is_wav(f.read(12))
+        if not is_wav:
+            return None
+        result = preprocess_audio(path.read_bytes(), filename=path.name, codec=codec)
+        return result if result["method"] != "none" else None
+
+    if len(result["data"]) >= size:
+        return None
+    result["original_bytes"] = size
+    result["processed_bytes"] = len(result["data"])
+    logger.info(f"Preprocessed {path.name}: {size} -> {result['processed_bytes']} bytes ({result['method']})")
+    return result
+
+
+class TranscriptCache:
+    """Transcripts stored as JSON files keyed by audio_cache_key"""
+
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached entry (with 'transcript') or None"""
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def put(self, key: str, transcript: Any, **metadata) -> None:
+        """Store a transcript with optional metadata (filename, options, ...)"""
+        from .storage import _write_text_atomic
+
+        entry = {"transcript": transcript, "cached_at": datetime.now().isoformat(), **metadata}
+        _write_text_atomic(self._path(key), json.dumps(entry, default=str))
+
+
+_caches: Dict[Path, TranscriptCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_transcript_cache(directory: Optional[Union[str, Path]] = None) -> TranscriptCache:
+    """
+    Get the process-wide transcript cache (default: runs/transcripts)
+
+    Args:
+        directory: Cache directory
+
+    Returns:
+        Shared TranscriptCache for that directory
+    """
+    if directory is None:
+        from .storage import RUNS_DIR
+        directory = RUNS_DIR / TRANSCRIPTS_DIRNAME
+
+    directory = Path(directory).resolve()
+    with _caches_lock:
+        if directory not in _caches:
+            _caches[directory] = TranscriptCache(directory)
+        return _caches[directory]
@@ -3,28 +3,137 @@ AWS Bedrock client for CRE deal extraction and IC summary generation
 """
 import json
 import logging
-from typing import Dict, Optional
+import threading
+from typing import Any, Dict, List, Optional
+
+from .rate_limiter import RateLimiter, ServiceDegradedError, get_bedrock_limiter, is_throttle_error
 
 logger = logging.getLogger(__name__)
 
+MODEL_ID = "amazon.titan-text-lite-v1"
+
+DEAL_SCHEMA = """{
+  "property_type": "multifamily|office|industrial|retail|mixed_use|other",
+  "location": {"city": "string", "state": "string"},
+  "purchase_price": number (in dollars),
+  "noi": number (in dollars, annual),
+  "cap_rate": number (as decimal, e.g., 5.25 for 5.25%),
+  "units": number (for multifamily),
+  "square_feet": number,
+  "year_built": number,
+  "occupancy": number (as decimal, e.g., 0.95 for 95%),
+  "deferred_maintenance": number (in dollars, upper end of any estimate),
+  "asking_price": number (in dollars),
+  "broker_name": "string",
+  "broker_email": "string",
+  "broker_company": "string",
+  "seller_name": "string",
+  "notes": "string"
+}"""
+
+# Titan Text Lite has a 4k-token context shared by prompt and output: a batch
+# must fit BATCH_PROMPT_TOKEN_BUDGET on its own, and prompt plus
+# BATCH_OUTPUT_TOKENS_PER_DEAL per deal must fit MODEL_CONTEXT_TOKENS
+MODEL_CONTEXT_TOKENS = 4096
+BATCH_PROMPT_TOKEN_BUDGET = 2500
+BATCH_OUTPUT_TOKENS_PER_DEAL = 350
+MAX_OUTPUT_TOKENS = 3072
+
+# Single-call retries per extract_deal_structs call for deals a batch missed
+MAX_SINGLE_RETRIES = 8
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+def _build_extract_prompt(text: str) -> str:
+    return f"""You are a commercial real estate expert. Extract structured deal information from the following text.
+
+Return ONLY valid JSON with these fields (use null for missing data):
+{DEAL_SCHEMA}
+
+Text:
+{text}
+
+JSON:"""
+
+
+def _build_batch_extract_prompt(texts: Dict[str, str]) -> str:
+    deals = "\n\n".join(
+        f'<deal id="{deal_id}">\n{text}\n</deal>' for deal_id, text in texts.items()
+    )
+    return f"""You are a commercial real estate expert. Extract structured deal information from each deal below.
+
+Return ONLY a valid JSON array with one object per deal. Each object must have an "id" field
+matching the deal id, plus these fields (use null for missing data):
+{DEAL_SCHEMA}
+
+Deals:
+{deals}
+
+JSON array:"""
+
+
+_BATCH_PROMPT_OVERHEAD = estimate_tokens(_build_batch_extract_prompt({}))
+
+# Connections per shared runtime client; sized for many concurrent runs in one process
+RUNTIME_MAX_POOL_CONNECTIONS = 64
+
+_runtime_clients: Dict[str, Any] = {}
+_runtime_clients_lock = threading.Lock()
+
+
+def get_bedrock_runtime(region: str):
+    """
+    Process-wide bedrock-runtime client for a region
+
+    boto3 clients are thread-safe; sharing one keeps a single pool of
+    keep-alive connections instead of a new client (and TLS handshakes)
+    per deal run.
+    """
+    with _runtime_clients_lock:
+        if region not in _runtime_clients:
+            import boto3
+            from botocore.config import Config
+
+            _runtime_clients[region] = boto3.client(
+                "bedrock-runtime",
+                region_name=region,
+                config=Config(max_pool_connections=RUNTIME_MAX_POOL_CONNECTIONS)
+            )
+        return _runtime_clients[region]
+
 
 class BedrockClient:
     """Client for AWS Bedrock Titan text model"""
 
-    def __init__(self, region: str = "us-east-1", use_bedrock: bool = True, demo_mode: bool = False):
+    def __init__(
+        self,
+        region: str = "us-east-1",
+        use_bedrock: bool = True,
+        demo_mode: bool = False,
+        limiter: Optional[RateLimiter] = None
+    ):
         self.region = region
         self.use_bedrock = use_bedrock
         self.demo_mode = demo_mode
         self.client = None
+        self.limiter = limiter or get_bedrock_limiter()
+
+        # "demo" when no real client is used, "degraded" after a failed real call
+        self.status = "demo" if demo_mode or not use_bedrock else "healthy"
+        self.last_error: Optional[str] = None
 
         if use_bedrock and not demo_mode:
             try:
-                import boto3
-                self.client = boto3.client("bedrock-runtime", region_name=region)
+                self.client = get_bedrock_runtime(region)
                 logger.info(f"Bedrock client initialized for region {region}")
             except Exception as e:
                 logger.warning(f"Failed to initialize Bedrock client: {e}. Falling back to demo mode.")
                 self.demo_mode = True
+                self.status = "demo"
 
     def extract_deal_struct(self, text: str) -> Dict:
         """
@@ -34,58 +143,20 @@ class BedrockClient:
             text: Raw deal text (from voice transcription, email, OM, etc.)
 
         Returns:
-            Dictionary with structured deal fields
+            Dictionary with structured deal fields. Empty if Bedrock is degraded,
+            so callers fall back to heuristics instead of scoring placeholder data.
         """
         if self.demo_mode or not self.client:
             logger.info("Using demo mode for deal extraction")
             return self._demo_extract_deal_struct(text)
 
         try:
-            prompt = f"""You are a commercial real estate expert. Extract structured deal information from the following text.
-
-Return ONLY valid JSON with these fields (use null for missing data):
-{{
-  "property_type": "multifamily|office|industrial|retail|mixed_use|other",
-  "location": {{"city": "string", "state": "string"}},
-  "purchase_price": number (in dollars),
-  "noi": number (in dollars, annual),
-  "cap_rate": number (as decimal, e.g., 5.25 for 5.25%),
-  "units": number (for multifamily),
-  "square_feet": number,
-  "year_built": number,
-  "occupancy": number (as decimal, e.g., 0.95 for 95%),
-  "asking_price": number (in dollars),
-  "broker_name": "string",
-  "broker_email": "string",
-  "broker_company": "string",
-  "seller_name": "string",
-  "notes": "string"
-}}
-
-Text:
-{text}
-
-JSON:"""
-
-            body = json.dumps({
-                "inputText": prompt,
-                "textGenerationConfig": {
-                    "maxTokenCount": 1024,
-                    "temperature": 0.1,
-                    "topP": 0.9
-                }
-            })
-
-            response = self.client.invoke_model(
-                modelId="amazon.titan-text-lite-v1",
-                body=body,
-                contentType="application/json",
-                accept="application/json"
+            result_text = self._invoke_text(
+                _build_extract_prompt(text),
+                max_tokens=1024,
+                temperature=0.1
             )
 
-            response_body = json.loads(response["body"].read())
-            result_text = response_body["results"][0]["outputText"]
-
             # Extract JSON from response (might have extra text)
             json_start = result_text.find("{")
             json_end = result_text.rfind("}") + 1
@@ -96,9 +167,152 @@ JSON:"""
             logger.info("Successfully extracted deal structure via Bedrock")
             return extracted
 
+        except json.JSONDecodeError as e:
+            # Bedrock answered; the model's reply just wasn't valid JSON
+            logger.error(f"Bedrock extraction returned malformed JSON: {e}. Returning no Bedrock fields.")
+            return {}
         except Exception as e:
-            logger.error(f"Bedrock extraction failed: {e}. Falling back to demo mode.")
-            return self._demo_extract_deal_struct(text)
+            if self._is_outage(e):
+                self._mark_degraded(e)
+                logger.error(f"Bedrock extraction failed: {e}. Returning no Bedrock fields (degraded).")
+            else:
+                logger.error(f"Bedrock extraction failed: {e}. Returning no Bedrock fields.")
+            return {}
+
+    def extract_deal_structs(
+        self,
+        texts: List[str],
+        token_budget: int = BATCH_PROMPT_TOKEN_BUDGET,
+        max_batch_size: int = 8
+    ) -> List[Dict]:
+        """
+        Extract structured deal data for many texts, packing several deals per model call
+
+        The schema preamble is sent once per batch instead of once per deal.
+        Any deal whose entry is missing or unparseable in the batch response
+        is retried with a single extract_deal_struct call, up to
+        MAX_SINGLE_RETRIES per call; past that it gets no Bedrock fields.
+
+        Args:
+            texts: Raw deal texts
+            token_budget: Maximum estimated prompt tokens per batch
+            max_batch_size: Maximum deals per batch
+
+        Returns:
+            List of structured deal dictionaries, in the same order as texts
+        """
+        if self.demo_mode or not self.client:
+            logger.info("Using demo mode for batch deal extraction")
+            return [self._demo_extract_deal_struct(text) for text in texts]
+
+        results: List[Optional[Dict]] = [None] * len(texts)
+        retries_left = MAX_SINGLE_RETRIES
+
+        for batch in self._pack_batches(texts, token_budget, max_batch_size):
+            if len(batch) == 1:
+                index = batch[0]
+                results[index] = self.extract_deal_struct(texts[index])
+                continue
+
+            parsed = self._extract_batch({str(i): texts[i] for i in batch})
+            missed = [index for index in batch if parsed.get(str(index)) is None]
+            if missed:
+                retried = missed[:retries_left]
+                retries_left -= len(retried)
+                scope = "whole batch" if len(missed) == len(batch) else f"{len(missed)}/{len(batch)} deals"
+                logger.warning(
+                    f"Batch extraction missed the {scope}; retrying {len(retried)} individually"
+                    + (f", {len(missed) - len(retried)} left to heuristics" if len(retried) < len(missed) else "")
+                )
+                for index in retried:
+                    parsed[str(index)] = self.extract_deal_struct(texts[index])
+            for index in batch:
+                results[index] = parsed.get(str(index)) or {}
+
+        return results
+
+    @staticmethod
+    def _pack_batches(texts: List[str], token_budget: int, max_batch_size: int) -> List[List[int]]:
+        """
+        Greedily pack text indices into batches that fit the prompt token budget
+        and, with BATCH_OUTPUT_TOKENS_PER_DEAL per deal, the model context
+        """
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = _BATCH_PROMPT_OVERHEAD
+
+        for index, text in enumerate(texts):
+            # Deal wrapper tags add a handful of tokens per entry
+            tokens = estimate_tokens(text) + 8
+            prompt_tokens = current_tokens + tokens
+            context_tokens = prompt_tokens + BATCH_OUTPUT_TOKENS_PER_DEAL * (len(current) + 1)
+            if current and (
+                prompt_tokens > token_budget
+                or context_tokens > MODEL_CONTEXT_TOKENS
+                or len(current) >= max_batch_size
+            ):
+                batches.append(current)
+                current, current_tokens = [], _BATCH_PROMPT_OVERHEAD
+            current.append(index)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def _extract_batch(self, texts: Dict[str, str]) -> Dict[str, Dict]:
+        """Run one batched extraction call and map the response array back by deal id"""
+        try:
+            result_text = self._invoke_text(
+                _build_batch_extract_prompt(texts),
+                max_tokens=min(MAX_OUTPUT_TOKENS, BATCH_OUTPUT_TOKENS_PER_DEAL * len(texts)),
+                temperature=0.1
+            )
+
+            json_start = result_text.find("[")
+            json_end = result_text.rfind("]") + 1
+            if json_start < 0 or json_end <= json_start:
+                raise ValueError("No JSON array in batch response")
+
+            entries = json.loads(result_text[json_start:json_end])
+        except ServiceDegradedError as e:
+            # Don't hammer a throttled service with per-deal retries
+            self._mark_degraded(e)
+            logger.error(f"Bedrock batch extraction failed: {e}")
+            return {str(deal_id): {} for deal_id in texts}
+        except Exception as e:
+            logger.error(f"Bedrock batch extraction failed: {e}")
+            return {}
+
+        parsed = {}
+        for entry in entries:
+            if isinstance(entry, dict) and str(entry.get("id")) in texts:
+                deal_id = str(entry.pop("id"))
+                parsed[deal_id] = entry
+
+        logger.info(f"Batch extracted {len(parsed)}/{len(texts)} deals via Bedrock")
+        return parsed
+
+    def _invoke_text(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        """Invoke the Titan text model and return the generated text"""
+        body = json.dumps({
+            "inputText": prompt,
+            "textGenerationConfig": {
+                "maxTokenCount": max_tokens,
+                "temperature": temperature,
+                "topP": 0.9
+            }
+        })
+
+        response = self.limiter.call(lambda: self.client.invoke_model(
+            modelId=MODEL_ID,
+            body=body,
+            contentType="application/json",
+            accept="application/json"
+        ))
+
+        response_body = json.loads(response["body"].read())
+        return response_body["results"][0]["outputText"]
 
     def generate_ic_summary(self, struct: Dict) -> str:
         """
@@ -132,31 +346,30 @@ Write in a professional, direct tone. Be analytical but concise.
 
 Summary:"""
 
-            body = json.dumps({
-                "inputText": prompt,
-                "textGenerationConfig": {
-                    "maxTokenCount": 512,
-                    "temperature": 0.3,
-                    "topP": 0.9
-                }
-            })
-
-            response = self.client.invoke_model(
-                modelId="amazon.titan-text-lite-v1",
-                body=body,
-                contentType="application/json",
-                accept="application/json"
-            )
-
-            response_body = json.loads(response["body"].read())
-            summary = response_body["results"][0]["outputText"].strip()
+            summary = self._invoke_text(prompt, max_tokens=512, temperature=0.3).strip()
             logger.info("Successfully generated IC summary via Bedrock")
             return summary
 
         except Exception as e:
-            logger.error(f"Bedrock IC summary generation failed: {e}. Falling back to demo mode.")
+            # The template summary only restates the structured fields, so it is safe to show
+            if self._is_outage(e):
+                self._mark_degraded(e)
+            logger.error(f"Bedrock IC summary generation failed: {e}. Falling back to template summary.")
             return self._demo_generate_ic_summary(struct)
 
+    @staticmethod
+    def _is_outage(error: Exception) -> bool:
+        """Throttling, an open circuit or a transport failure - not a bad request or reply"""
+        return isinstance(error, ServiceDegradedError) or is_throttle_error(error)
+
+    def _mark_degraded(self, error: Exception) -> None:
+        self.status = "degraded"
+        self.last_error = str(error)
+
+    def limiter_stats(self) -> Dict:
+        """Stats of the shared Bedrock rate limiter"""
+        return self.limiter.stats()
+
     def _demo_extract_deal_struct(self, text: str) -> Dict:
         """Demo/fallback extraction using simple heuristics"""
         # This will be enhanced by deal_parser.py
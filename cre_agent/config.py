@@ -1,39 +1,62 @@
 """
 Configuration module - handles environment variables and settings
+
+Settings is a plain dataclass filled from the environment and an optional
+.env file by load_settings(). It deliberately avoids pydantic-settings,
+whose import alone costs ~0.2s in every worker and CLI process.
 """
 import os
-from typing import Optional
-from pydantic_settings import BaseSettings
-from pydantic import Field
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Dict, Optional, Union, get_args
+
+ENV_FILE = ".env"
+
+_TRUE = {"1", "true", "t", "yes", "y", "on"}
+_FALSE = {"0", "false", "f", "no", "n", "off"}
+
 
+def env_field(default, alias: str):
+    """Dataclass field read from environment variable `alias`"""
+    return field(default=default, metadata={"env": alias})
 
-class Settings(BaseSettings):
+
+@dataclass
+class Settings:
     """Application settings loaded from environment variables"""
 
     # Demo mode - if True, use mock responses for all integrations
-    demo_mode: bool = Field(default=False, alias="DEMO_MODE")
+    demo_mode: bool = env_field(default=False, alias="DEMO_MODE")
 
     # AWS Configuration
-    aws_region: str = Field(default="us-east-1", alias="AWS_REGION")
-    aws_profile: Optional[str] = Field(default=None, alias="AWS_PROFILE")
-    s3_bucket: Optional[str] = Field(default=None, alias="S3_BUCKET")
-    use_bedrock: bool = Field(default=True, alias="USE_BEDROCK")
+    aws_region: str = env_field(default="us-east-1", alias="AWS_REGION")
+    aws_profile: Optional[str] = env_field(default=None, alias="AWS_PROFILE")
+    s3_bucket: Optional[str] = env_field(default=None, alias="S3_BUCKET")
+    use_bedrock: bool = env_field(default=True, alias="USE_BEDROCK")
+    bedrock_max_rps: float = env_field(default=5.0, alias="BEDROCK_MAX_RPS")
+    bedrock_max_concurrency: int = env_field(default=16, alias="BEDROCK_MAX_CONCURRENCY")
+
+    # Link repeat arrivals of the same deal to the original run instead of reprocessing
+    dedup_enabled: bool = env_field(default=True, alias="DEDUP_ENABLED")
+
+    # Deal jobs processed by the app's own worker threads (0: only external `python -m cre_agent.worker`)
+    job_workers: int = env_field(default=2, alias="JOB_WORKERS")
+
+    # HTTP API (cre_agent.server): pipeline threads per server process and per-request time limit
+    api_max_concurrency: int = env_field(default=32, alias="API_MAX_CONCURRENCY")
+    api_request_timeout: float = env_field(default=60.0, alias="API_REQUEST_TIMEOUT")
 
     # Deepgram
-    deepgram_api_key: Optional[str] = Field(default=None, alias="DEEPGRAM_API_KEY")
+    deepgram_api_key: Optional[str] = env_field(default=None, alias="DEEPGRAM_API_KEY")
+    deepgram_base_url: Optional[str] = env_field(default=None, alias="DEEPGRAM_BASE_URL")
 
     # Merge CRM
-    merge_api_key: Optional[str] = Field(default=None, alias="MERGE_API_KEY")
-    merge_base_url: str = Field(
+    merge_api_key: Optional[str] = env_field(default=None, alias="MERGE_API_KEY")
+    merge_base_url: str = env_field(
         default="https://api.merge.dev/api/crm/v1",
         alias="MERGE_BASE_URL"
     )
-    merge_account_token: Optional[str] = Field(default=None, alias="MERGE_ACCOUNT_TOKEN")
-
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
-        extra = "ignore"
+    merge_account_token: Optional[str] = env_field(default=None, alias="MERGE_ACCOUNT_TOKEN")
 
     @property
     def has_aws_config(self) -> bool:
@@ -60,6 +83,47 @@ class Settings(BaseSettings):
         )
 
 
-def load_settings() -> Settings:
-    """Load settings from environment"""
-    return Settings()
+def _coerce(name: str, value: str, annotation) -> Union[str, bool, int, float]:
+    kind = next((arg for arg in get_args(annotation) if arg is not type(None)), annotation)
+    if kind is bool:
+        lowered = value.strip().lower()
+        if lowered in _TRUE:
+            return True
+        if lowered in _FALSE:
+            return False
+        raise ValueError(f"{name}: expected a boolean, got {value!r}")
+    try:
+        return kind(value)
+    except ValueError:
+        raise ValueError(f"{name}: expected {kind.__name__}, got {value!r}") from None
+
+
+def _env_values(env_file: Optional[Union[str, Path]]) -> Dict[str, str]:
+    """Environment variables over .env file values, keyed case-insensitively"""
+    values: Dict[str, str] = {}
+    if env_file and Path(env_file).is_file():
+        from dotenv import dotenv_values
+        values.update(
+            (key.upper(), value) for key, value in dotenv_values(env_file).items() if value is not None
+        )
+    values.update((key.upper(), value) for key, value in os.environ.items())
+    return values
+
+
+def load_settings(env_file: Optional[Union[str, Path]] = ENV_FILE) -> Settings:
+    """
+    Load settings from environment
+
+    Args:
+        env_file: .env file read under the process environment (None to skip)
+
+    Raises:
+        ValueError: a variable could not be parsed as its setting's type
+    """
+    env = _env_values(env_file)
+    values = {}
+    for setting in fields(Settings):
+        raw = env.get(setting.metadata["env"].upper())
+        if raw is not None:
+            values[setting.name] = _coerce(setting.metadata["env"], raw, setting.type)
+    return Settings(**values)
@@ -2,7 +2,14 @@
 CRE deal parser - extracts numbers and structured data from free-form text
 """
 import re
-from typing import Dict, Optional, List
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from .geo import get_gazetteer, normalize_state
+from .text_matcher import scan_deal_text, scan_deal_text_spans
+from .transcript import Transcript
+
+# (start, end) character offsets of the text a value was extracted from
+Span = Tuple[int, int]
 
 
 def parse_currency(text: str) -> Optional[float]:
@@ -67,6 +74,10 @@ def parse_units(text: str) -> Optional[int]:
         "148-unit" -> 148
         "32 units" -> 32
     """
+    return _find_units(text)[0]
+
+
+def _find_units(text: str) -> Tuple[Optional[int], Optional[Span]]:
     patterns = [
         r'(\d+)[-\s]unit',
         r'(\d+)\s+units',
@@ -75,9 +86,9 @@ def parse_units(text: str) -> Optional[int]:
     for pattern in patterns:
         match = re.search(pattern, text, re.IGNORECASE)
         if match:
-            return int(match.group(1))
+            return int(match.group(1)), match.span()
 
-    return None
+    return None, None
 
 
 def parse_square_feet(text: str) -> Optional[int]:
@@ -89,6 +100,11 @@ def parse_square_feet(text: str) -> Optional[int]:
         "20,000 SF" -> 20000
         "950 square feet" -> 950
     """
+    return _find_square_feet(text)[0]
+
+
+def _find_square_feet(text: str) -> Tuple[Optional[int], Optional[Span]]:
+    original = text
     text = text.replace(",", "")
 
     patterns = [
@@ -101,63 +117,124 @@ def parse_square_feet(text: str) -> Optional[int]:
     for pattern in patterns:
         match = re.search(pattern, text, re.IGNORECASE)
         if match:
+            # Map the span back onto the text with its commas
+            kept = [i for i, c in enumerate(original) if c != ","]
+            span = (kept[match.start()], kept[match.end() - 1] + 1)
             value = float(match.group(1))
             if 'k' in text.lower() or 'K' in text:
-                return int(value * 1_000)
+                return int(value * 1_000), span
             else:
-                return int(value)
+                return int(value), span
 
-    return None
+    return None, None
 
 
-def extract_property_type(text: str) -> Optional[str]:
-    """Extract property type from text"""
-    text_lower = text.lower()
+def parse_deferred_maintenance(text: str) -> Optional[float]:
+    """
+    Extract a deferred maintenance / capex estimate from text (upper end of a range)
 
-    property_types = {
-        "multifamily": ["multifamily", "multi-family", "apartment", "unit"],
-        "office": ["office"],
-        "industrial": ["industrial", "warehouse", "distribution"],
-        "retail": ["retail", "shopping center", "mall"],
-        "mixed_use": ["mixed use", "mixed-use"],
-    }
+    Examples:
+        "deferred maintenance, maybe $400K to $500K" -> 500000.0
+        "deferred capex on the roof, probably $150K-$200K" -> 200000.0
+        "about 400 to 500k of deferred maintenance" -> 500000.0
+    """
+    return _find_deferred_maintenance(text)[0]
 
-    for prop_type, keywords in property_types.items():
-        for keyword in keywords:
-            if keyword in text_lower:
-                return prop_type
 
-    return None
+def _find_deferred_maintenance(text: str) -> Tuple[Optional[float], Optional[Span]]:
+    amount_pattern = r'\$?\s*(\d+(?:\.\d+)?)\s*([KkMm])\b'
+    phrase_pattern = r'deferred\s+(?:maintenance|capex|capital)'
+
+    for match in re.finditer(phrase_pattern, text, re.IGNORECASE):
+        # Amount quoted after the phrase, within the same sentence
+        after = re.split(r'\.\s', text[match.end():match.end() + 150])[0]
+        # Amount quoted just before the phrase ("500k of deferred maintenance")
+        before = text[max(0, match.start() - 40):match.start()]
+        before = before if re.search(r'\b(?:of|in)\s+$', before) else ""
+
+        amounts = [
+            float(value) * (1_000_000 if suffix.lower() == "m" else 1_000)
+            for value, suffix in re.findall(amount_pattern, before + " " + after.replace(",", ""))
+        ]
+        if amounts:
+            return max(amounts), match.span()
+
+    return None, None
+
+
+def extract_property_type(text: str, hits: Optional[Dict[str, List[str]]] = None) -> Optional[str]:
+    """Extract property type from text (hits: precomputed scan_deal_text result)"""
+    if hits is None:
+        hits = scan_deal_text(text)
+    types = hits["property_type"]
+    return types[0] if types else None
 
 
-def extract_location(text: str) -> Dict[str, Optional[str]]:
+def extract_location(text: str, hits: Optional[Dict[str, List[str]]] = None) -> Dict[str, Optional[str]]:
     """
     Extract city and state from text
 
+    Args:
+        text: Raw deal text
+        hits: Precomputed scan_deal_text result
+
     Returns:
-        Dictionary with 'city' and 'state' keys
+        Dictionary with 'city' and 'state' (2-letter code) keys
     """
-    # Pattern: City, State or City, XX
-    pattern = r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*),\s*([A-Z]{2}|[A-Z][a-z]+)'
-    match = re.search(pattern, text)
+    return _find_location(text, hits)[0]
+
+
+# "in Tampa", "located in the Domain", "near Round Rock" - up to four capitalized words
+_LOCATION_CONTEXT = re.compile(
+    r"\b(?:[Ll]ocated in|[Bb]ased in|[Ii]n|[Nn]ear|[Oo]utside(?: of)?)\s+((?:the\s+)?[A-Z][\w'.-]*(?:\s+[A-Z][\w'.-]*){0,3})"
+)
 
-    if match:
-        city = match.group(1)
-        state = match.group(2)
-        return {"city": city, "state": state}
-
-    # Try common city names without state
-    common_cities = [
-        "Austin", "Dallas", "Houston", "San Antonio", "Phoenix", "Los Angeles",
-        "San Francisco", "Seattle", "Portland", "Denver", "Atlanta", "Miami",
-        "New York", "Boston", "Chicago", "Philadelphia"
-    ]
 
-    for city in common_cities:
-        if city.lower() in text.lower():
-            return {"city": city, "state": None}
+def _find_location(
+    text: str,
+    hits: Optional[Dict[str, List[str]]] = None,
+    spans: Optional[Dict[Tuple[str, str], Span]] = None
+) -> Tuple[Dict[str, Optional[str]], Optional[Span]]:
+    # Pattern: City, State or City, XX (the second part must be a real state)
+    pattern = r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*),\s*([A-Z]{2}|[A-Z][a-z]+)'
+    for match in re.finditer(pattern, text):
+        state = normalize_state(match.group(2))
+        if state:
+            return {"city": match.group(1), "state": state}, match.span()
+
+    if hits is None:
+        hits, spans = scan_deal_text_spans(text)
+    state_hint = normalize_state(hits["state"][0]) if hits["state"] else None
+
+    # A known place in locational context ("in Tampa"), longest name first;
+    # this also finds names too common to match anywhere (text_match=0)
+    gazetteer = get_gazetteer()
+    for match in _LOCATION_CONTEXT.finditer(text):
+        words = match.group(1).split()
+        for size in range(len(words), 0, -1):
+            name = re.sub(r"'s$", "", " ".join(words[:size]).rstrip(".,"))
+            place = gazetteer.lookup(name, state_hint)
+            if place:
+                city = place["market"] if place["kind"] == "submarket" else place["name"]
+                start = match.start(1)
+                return {"city": city, "state": state_hint or place["state"]}, (start, start + len(name))
+
+    # Otherwise the earliest known city or submarket; dictionary order breaks ties
+    candidates = [
+        ((spans or {}).get((kind, value), (len(text), len(text))), rank, kind, value)
+        for kind in ("city", "submarket")
+        for rank, value in enumerate(hits[kind])
+    ]
+    if candidates:
+        span, _, kind, city = min(candidates, key=lambda candidate: (candidate[0][0], candidate[1]))
+        if state_hint:
+            state = state_hint
+        else:
+            place = gazetteer.lookup(city)
+            state = place["state"] if place else None
+        return {"city": city, "state": state}, span if spans else None
 
-    return {"city": None, "state": None}
+    return {"city": None, "state": None}, None
 
 
 def extract_email(text: str) -> Optional[str]:
@@ -172,13 +249,26 @@ def extract_email(text: str) -> Optional[str]:
     return None
 
 
-def extract_broker_info(text: str) -> Dict[str, Optional[str]]:
+def extract_broker_info(text: str, hits: Optional[Dict[str, List[str]]] = None) -> Dict[str, Optional[str]]:
     """
     Extract broker name, email, and company from text
 
+    Args:
+        text: Raw deal text
+        hits: Precomputed scan_deal_text result
+
     Returns:
         Dictionary with 'name', 'email', 'company' keys
     """
+    return _find_broker_info(text, hits)[0]
+
+
+def _find_broker_info(
+    text: str,
+    hits: Optional[Dict[str, List[str]]] = None,
+    spans: Optional[Dict[Tuple[str, str], Span]] = None
+) -> Tuple[Dict[str, Optional[str]], Dict[str, Span]]:
+    found: Dict[str, Span] = {}
     broker_info = {
         "name": None,
         "email": None,
@@ -187,13 +277,20 @@ def extract_broker_info(text: str) -> Dict[str, Optional[str]]:
 
     # Extract email
     broker_info["email"] = extract_email(text)
-
-    # Common CRE firms
-    firms = ["JLL", "CBRE", "Cushman", "Colliers", "Marcus & Millichap", "Newmark"]
-    for firm in firms:
-        if firm.lower() in text.lower():
-            broker_info["company"] = firm
-            break
+    if broker_info["email"]:
+        # The address may be spoken ("marcus at jll.com"); point at its local part
+        local_part = broker_info["email"].split("@")[0]
+        position = text.find(local_part)
+        if position != -1:
+            found["email"] = (position, position + len(local_part))
+
+    # Known CRE firms
+    if hits is None:
+        hits = scan_deal_text(text)
+    if hits["firm"]:
+        broker_info["company"] = hits["firm"][0]
+        if spans and ("firm", broker_info["company"]) in spans:
+            found["company"] = spans[("firm", broker_info["company"])]
 
     # Try to extract name (simple heuristic: look for capital name before "from" or "at" or "with")
     name_patterns = [
@@ -206,83 +303,143 @@ def extract_broker_info(text: str) -> Dict[str, Optional[str]]:
         match = re.search(pattern, text)
         if match:
             broker_info["name"] = match.group(1)
+            found["name"] = match.span(1)
             break
 
-    return broker_info
+    return broker_info, found
 
 
-def heuristic_parse(text: str) -> Dict:
+def heuristic_parse(text: Union[str, Transcript], speakers: Optional[Sequence[int]] = None) -> Dict:
     """
     Parse CRE deal text using regex and heuristics
 
     Args:
-        text: Raw deal text
+        text: Raw deal text, or a call Transcript
+        speakers: For a Transcript, the speakers to extract from (defaults to
+            its broker_speakers(); [] parses every speaker)
 
     Returns:
-        Dictionary with extracted deal fields
+        Dictionary with extracted deal fields. A Transcript's result also has
+        'evidence': field -> {'start', 'end', 'speaker', 'quote'}, where in
+        the call each value was said (see Transcript.locate). Fields the
+        chosen speakers never mention are taken from the whole call.
     """
+    if isinstance(text, Transcript):
+        transcript = text.for_speakers(text.broker_speakers() if speakers is None else speakers)
+        result, spans = _parse_with_spans(transcript.text)
+        evidence = {field: transcript.locate(*span) for field, span in spans.items()}
+
+        if transcript is not text:
+            # "Is this the Dallas deal?" - the other party may name what the broker only confirms
+            full_result, full_spans = _parse_with_spans(text.text)
+            for field, value in full_result.items():
+                if field != "notes" and _is_missing(result.get(field)) and not _is_missing(value):
+                    result[field] = value
+                    if field in full_spans:
+                        evidence[field] = text.locate(*full_spans[field])
+
+        result["evidence"] = {field: located for field, located in evidence.items() if located}
+        return result
+
+    return _parse_with_spans(text)[0]
+
+
+def _is_missing(value) -> bool:
+    """An unextracted field: None, or a dict of Nones (location)"""
+    if isinstance(value, dict):
+        return all(item is None for item in value.values())
+    return value is None
+
+
+def _parse_with_spans(text: str) -> Tuple[Dict, Dict[str, Span]]:
+    """heuristic_parse on text, plus the span each extracted field came from"""
+    # One dictionary pass serves property type, location and broker firm
+    hits, hit_spans = scan_deal_text_spans(text)
+    spans: Dict[str, Span] = {}
+
+    location, spans["location"] = _find_location(text, hits, hit_spans)
+    units, spans["units"] = _find_units(text)
+    square_feet, spans["square_feet"] = _find_square_feet(text)
+    deferred_maintenance, spans["deferred_maintenance"] = _find_deferred_maintenance(text)
+
     # Look for specific keywords and extract associated numbers
     result = {
-        "property_type": extract_property_type(text),
-        "location": extract_location(text),
+        "property_type": extract_property_type(text, hits),
+        "location": location,
         "purchase_price": None,
         "asking_price": None,
         "noi": None,
         "cap_rate": None,
-        "units": parse_units(text),
-        "square_feet": parse_square_feet(text),
+        "units": units,
+        "square_feet": square_feet,
         "year_built": None,
         "occupancy": None,
+        "deferred_maintenance": deferred_maintenance,
         "broker_name": None,
         "broker_email": None,
         "broker_company": None,
         "seller_name": None,
         "notes": text[:500] if text else None
     }
+    if result["property_type"]:
+        spans["property_type"] = hit_spans.get(("property_type", result["property_type"]))
 
     # Extract broker info
-    broker_info = extract_broker_info(text)
+    broker_info, broker_spans = _find_broker_info(text, hits, hit_spans)
     result["broker_name"] = broker_info["name"]
     result["broker_email"] = broker_info["email"]
     result["broker_company"] = broker_info["company"]
-
-    # NOI extraction
-    noi_match = re.search(r'NOI[^\d]*(\$?[\d,.]+\s*(?:million|M|K)?)', text, re.IGNORECASE)
+    for key, span in broker_spans.items():
+        spans[f"broker_{key}"] = span
+
+    # NOI extraction ("$1.2 million in NOI" before "NOI is running around $950K")
+    noi_match = (
+        re.search(r'(\$?\d[\d,.]*\s*(?:million|M|K)?)\s+(?:in|of)\s+NOI', text, re.IGNORECASE)
+        or re.search(r'NOI[^\d$]*(\$?[\d,.]+\s*(?:million|M|K)?)', text, re.IGNORECASE)
+    )
     if noi_match:
         result["noi"] = parse_currency(noi_match.group(1))
+        spans["noi"] = noi_match.span()
 
     # Cap rate extraction
     cap_match = re.search(r'(\d+\.?\d*)\s*%?\s*cap', text, re.IGNORECASE)
     if cap_match:
         result["cap_rate"] = float(cap_match.group(1))
+        spans["cap_rate"] = cap_match.span()
 
     # Price extraction (asking or purchase)
     asking_match = re.search(r'asking[^\d]*(\$[\d,.]+\s*(?:million|M)?)', text, re.IGNORECASE)
     if asking_match:
         result["asking_price"] = parse_currency(asking_match.group(1))
+        spans["asking_price"] = asking_match.span()
 
     # Purchase price (if not asking)
     if not result["asking_price"]:
         # Find first large currency amount
-        all_text = text
-        for sentence in all_text.split('.'):
+        position = 0
+        for sentence in text.split('.'):
             price = parse_currency(sentence)
             if price and price > 100000:  # At least $100k
                 result["purchase_price"] = price
+                spans["purchase_price"] = (position, position + len(sentence))
                 break
+            position += len(sentence) + 1
 
     # If we found asking price but not purchase, copy it
     if result["asking_price"] and not result["purchase_price"]:
         result["purchase_price"] = result["asking_price"]
+        spans["purchase_price"] = spans["asking_price"]
 
     # Occupancy
     occupancy_match = re.search(r'(\d+)\s*%\s*occup', text, re.IGNORECASE)
     if occupancy_match:
         result["occupancy"] = float(occupancy_match.group(1)) / 100.0
+        spans["occupancy"] = occupancy_match.span()
 
     # Year built
     year_match = re.search(r'built\s+(?:in\s+)?(\d{4})', text, re.IGNORECASE)
     if year_match:
         result["year_built"] = int(year_match.group(1))
+        spans["year_built"] = year_match.span()
 
-    return result
+    return result, {field: span for field, span in spans.items() if span}
@@ -0,0 +1,294 @@
+"""
+Deal deduplication - exact hashes, MinHash/LSH near-duplicate search and structured deal keys
+
+The same deal arrives from several brokers and as forwarded email chains with
+small edits. Each incoming text gets a fingerprint:
+
+    exact_hash   SHA-256 of the normalized text (quoting/headers stripped)
+    signature    MinHash over word shingles, banded for LSH candidate lookup
+    struct_key   city | size bucket | price bucket from the heuristic fields
+
+Fingerprints live in a SQLite index next to the runs, so every lookup is a
+handful of B-tree probes regardless of how many deals are stored.
+"""
+import hashlib
+import logging
+import math
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "dedup.sqlite"
+
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 16                      # 16 bands x 8 rows: candidates from ~0.7 similarity up
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+SHINGLE_WORDS = 5
+
+# Estimated Jaccard similarity needed to call an LSH candidate a near-duplicate;
+# a matching structured key lowers the bar for reworded copies of the same deal
+NEAR_DUPLICATE_THRESHOLD = 0.8
+STRUCT_MATCH_THRESHOLD = 0.5
+
+# Price buckets are ~5% wide on a log scale
+PRICE_BUCKET_RATIO = 1.05
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_permutation_rng = np.random.default_rng(20240611)  # fixed: signatures must be stable across processes
+_PERM_A = _permutation_rng.integers(1, _MERSENNE_PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _permutation_rng.integers(0, _MERSENNE_PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+
+# Forwarded / replied email noise that should not make two copies differ
+_HEADER_LINE = re.compile(
+    r"^\s*(?:from|to|cc|bcc|sent|date|subject)\s*:.*$|"
+    r"^\s*-{2,}\s*(?:original message|forwarded message)\s*-{2,}.*$|"
+    r"^\s*on .{0,120} wrote:\s*$",
+    re.IGNORECASE | re.MULTILINE
+)
+_QUOTE_PREFIX = re.compile(r"^[\s>]+", re.MULTILINE)
+_SUBJECT_PREFIX = re.compile(r"\b(?:fwd?|re)\s*:", re.IGNORECASE)
+_NON_WORD = re.compile(r"[^a-z0-9$%.]+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize deal text for hashing: drop email headers/quoting, lowercase, collapse punctuation"""
+    text = _HEADER_LINE.sub(" ", text or "")
+    text = _QUOTE_PREFIX.sub("", text)
+    text = _SUBJECT_PREFIX.sub(" ", text)
+    words = _NON_WORD.sub(" ", text.lower()).split()
+    # Trailing sentence periods are punctuation, decimal points are not
+    return " ".join(word.strip(".") for word in words if word.strip("."))
+
+
+def exact_hash(normalized: str) -> str:
+    """SHA-256 of normalized text"""
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def shingle_hashes(normalized: str, size: int = SHINGLE_WORDS) -> np.ndarray:
+    """Stable 31-bit hashes of the word shingles of normalized text"""
+    words = normalized.split()
+    if len(words) <= size:
+        shingles = {" ".join(words)} if words else set()
+    else:
+        shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little") % _MERSENNE_PRIME
+         for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles)
+    )
+
+
+def minhash_signature(normalized: str) -> np.ndarray:
+    """
+    MinHash signature over word shingles
+
+    All permutations are applied at once: (a * x + b) mod p over a
+    (permutations x shingles) array, minimized per permutation.
+    """
+    hashes = shingle_hashes(normalized)
+    if not hashes.size:
+        return np.full(NUM_PERMUTATIONS, _MERSENNE_PRIME, dtype=np.uint64)
+    permuted = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return permuted.min(axis=1)
+
+
+def estimate_similarity(signature_a: np.ndarray, signature_b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures"""
+    return float(np.mean(signature_a == signature_b))
+
+
+def band_keys(signature: np.ndarray):
+    """LSH band keys: one signed 64-bit key per band (band index mixed into the hash)"""
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(rows.tobytes(), digest_size=8, person=band.to_bytes(2, "little")).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def structured_key(fields: Optional[Dict]) -> Optional[str]:
+    """
+    Structured deal key: city | size bucket | price bucket
+
+    Returns None unless city, a size (units or SF) and a price are all known,
+    so sparse extractions never collide.
+    """
+    if not fields:
+        return None
+
+    location = fields.get("location") or {}
+    city = location.get("city") if isinstance(location, dict) else None
+    price = fields.get("purchase_price") or fields.get("asking_price")
+    units = fields.get("units")
+    square_feet = fields.get("square_feet")
+
+    if not city or not price or not (units or square_feet):
+        return None
+
+    size = f"u{int(units)}" if units else f"sf{int(round(square_feet, -3))}"
+    price_bucket = int(math.log(price) / math.log(PRICE_BUCKET_RATIO))
+    return f"{city.strip().lower()}|{size}|p{price_bucket}"
+
+
+def fingerprint(text: str, fields: Optional[Dict] = None, max_chars: Optional[int] = None) -> Dict:
+    """
+    Compute the dedup fingerprint of an incoming deal
+
+    Args:
+        text: Raw deal text
+        fields: Heuristically extracted fields (for the structured key)
+        max_chars: Shingle only this much of the normalized text, bounding the
+            cost for long documents (the exact hash still covers all of it)
+
+    Returns:
+        Dictionary with exact_hash, signature (uint64 array), bands and struct_key
+    """
+    normalized = normalize_text(text)
+    signature = minhash_signature(normalized[:max_chars] if max_chars else normalized)
+    return {
+        "exact_hash": exact_hash(normalized),
+        "signature": signature,
+        "bands": band_keys(signature),
+        "struct_key": structured_key(fields),
+    }
+
+
+class DedupIndex:
+    """SQLite-backed index of deal fingerprints"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS deals (
+                run_id TEXT PRIMARY KEY,
+                exact_hash TEXT NOT NULL,
+                struct_key TEXT,
+                signature BLOB NOT NULL,
+                created_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS deals_exact ON deals (exact_hash);
+            CREATE INDEX IF NOT EXISTS deals_struct ON deals (struct_key);
+            CREATE TABLE IF NOT EXISTS bands (
+                band_key INTEGER NOT NULL,
+                run_id TEXT NOT NULL,
+                PRIMARY KEY (band_key, run_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS bands_by_run ON bands (run_id);
+        """)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM deals").fetchone()[0]
+
+    def add(self, run_id: str, fp: Dict) -> None:
+        """Index a processed run's fingerprint"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO deals VALUES (?, ?, ?, ?, ?)",
+                (run_id, fp["exact_hash"], fp["struct_key"], fp["signature"].tobytes(),
+                 datetime.now().isoformat())
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO bands VALUES (?, ?)",
+                [(key, run_id) for key in fp["bands"]]
+            )
+
+    def _signatures(self, run_ids) -> Dict[str, np.ndarray]:
+        placeholders = ",".join("?" * len(run_ids))
+        rows = self._conn.execute(
+            f"SELECT run_id, signature FROM deals WHERE run_id IN ({placeholders})", list(run_ids)
+        ).fetchall()
+        return {run_id: np.frombuffer(blob, dtype=np.uint64) for run_id, blob in rows}
+
+    def lookup(self, fp: Dict) -> Optional[Dict]:
+        """
+        Find an already indexed run for a fingerprint
+
+        Returns:
+            {"run_id", "match", "similarity"} with match "exact", "near" or
+            "structured", or None when the deal is new
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT run_id FROM deals WHERE exact_hash = ? LIMIT 1", (fp["exact_hash"],)
+            ).fetchone()
+            if row:
+                return {"run_id": row[0], "match": "exact", "similarity": 1.0}
+
+            placeholders = ",".join("?" * len(fp["bands"]))
+            candidates = {
+                run_id for (run_id,) in self._conn.execute(
+                    f"SELECT DISTINCT run_id FROM bands WHERE band_key IN ({placeholders})", fp["bands"]
+                )
+            }
+
+            struct_matches = set()
+            if fp["struct_key"]:
+                struct_matches = {
+                    run_id for (run_id,) in self._conn.execute(
+                        "SELECT run_id FROM deals WHERE struct_key = ? LIMIT 50", (fp["struct_key"],)
+                    )
+                }
+
+            if not candidates and not struct_matches:
+                return None
+            signatures = self._signatures(candidates | struct_matches)
+
+        best = None
+        for run_id, signature in signatures.items():
+            similarity = estimate_similarity(fp["signature"], signature)
+            threshold = STRUCT_MATCH_THRESHOLD if run_id in struct_matches else NEAR_DUPLICATE_THRESHOLD
+            if similarity >= threshold and (best is None or similarity > best["similarity"]):
+                match = "near" if similarity >= NEAR_DUPLICATE_THRESHOLD else "structured"
+                best = {"run_id": run_id, "match": match, "similarity": similarity}
+        return best
+
+    def remove(self, run_id: str) -> None:
+        """Drop a run from the index (e.g. when its run record is gone)"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM deals WHERE run_id = ?", (run_id,))
+            self._conn.execute("DELETE FROM bands WHERE run_id = ?", (run_id,))
+
+
+_indexes: Dict[Path, DedupIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_dedup_index(path: Optional[Union[str, Path]] = None) -> DedupIndex:
+    """
+    Get the process-wide dedup index (default: runs/dedup.sqlite)
+
+    Args:
+        path: Index file path
+
+    Returns:
+        Shared DedupIndex for that path
+    """
+    if path is None:
+        from .storage import RUNS_DIR
+        path = RUNS_DIR / INDEX_FILENAME
+
+    path = Path(path).resolve()
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = DedupIndex(path)
+        return _indexes[path]
@@ -4,29 +4,79 @@ Deepgram client for speech-to-text transcription (v5 SDK)
 
 import logging
 import os
-from typing import Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-from deepgram import DeepgramClient as DGClient
-from deepgram.core.api_error import ApiError
+from .audio import (
+    audio_cache_key, file_cache_key, get_transcript_cache, iter_file_chunks,
+    preprocess_audio, preprocess_audio_file
+)
+from .long_audio import (
+    MAX_CHUNK_SECONDS, audio_duration, chunk_wav, find_silences, frame_energies,
+    open_pcm, plan_chunks, stitch_words, words_to_text
+)
+from .rate_limiter import RateLimiter, get_deepgram_limiter
+from .transcript import Transcript
+
+if TYPE_CHECKING:
+    from deepgram import DeepgramClient as DGClient
 
 logger = logging.getLogger(__name__)
 
+# transcribe_file switches to chunked long-audio mode above this duration
+LONG_AUDIO_SECONDS = 900.0
+
 
 class DeepgramClient:
     """Client for Deepgram speech-to-text API using the official v5 SDK."""
 
-    def __init__(self, api_key: Optional[str] = None, demo_mode: bool = False):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        demo_mode: bool = False,
+        model: str = "nova-3",
+        preprocess: bool = True,
+        codec: str = "opus",
+        use_cache: bool = True,
+        base_url: Optional[str] = None,
+        limiter: Optional[RateLimiter] = None,
+        long_audio_seconds: Optional[float] = LONG_AUDIO_SECONDS
+    ):
         """
         api_key:
             Kept for backward compatibility. If provided and DEEPGRAM_API_KEY
             is not already set, we'll set it on the environment.
         demo_mode:
             If True, never call Deepgram; always return a canned transcript.
+        model:
+            Deepgram model name.
+        preprocess:
+            If True, downmix/resample/compress audio before upload (see audio.py).
+        codec:
+            'opus' or 'flac' when ffmpeg is available for preprocessing.
+        use_cache:
+            If True, reuse transcripts of identical audio and options from the
+            local transcript cache.
+        base_url:
+            Alternative API base URL (e.g. a local fake server).
+        limiter:
+            Rate limiter for file/batch transcription (defaults to the shared
+            Deepgram limiter).
+        long_audio_seconds:
+            Recordings longer than this are transcribed in parallel chunks by
+            transcribe_file (None disables long-audio mode there).
         """
         # Allow env-based demo mode override
         env_demo = os.getenv("DEMO_MODE", "0") == "1"
         self.demo_mode = demo_mode or env_demo
-        self.client: Optional[DGClient] = None
+        self.client: Optional["DGClient"] = None
+        self.model = model
+        self.preprocess = preprocess
+        self.codec = codec
+        self.use_cache = use_cache
+        self.limiter = limiter or get_deepgram_limiter()
+        self.long_audio_seconds = long_audio_seconds
 
         # If they passed an api_key and DEEPGRAM_API_KEY isn't set, set it.
         if api_key and not os.getenv("DEEPGRAM_API_KEY"):
@@ -37,8 +87,18 @@ class DeepgramClient:
             return
 
         try:
-            # v5 SDK: no args, reads DEEPGRAM_API_KEY or DEEPGRAM_TOKEN from env
-            self.client = DGClient()
+            # Imported here so demo mode never loads the SDK
+            from deepgram import DeepgramClient as DGClient
+            from deepgram.environment import DeepgramClientEnvironment
+
+            # v5 SDK: reads DEEPGRAM_API_KEY or DEEPGRAM_TOKEN from env
+            if base_url:
+                ws_url = base_url.replace("https://", "wss://").replace("http://", "ws://")
+                self.client = DGClient(environment=DeepgramClientEnvironment(
+                    base=base_url, production=ws_url, agent=ws_url, agent_rest=base_url
+                ))
+            else:
+                self.client = DGClient()
             logger.info("Deepgram v5 client initialized successfully.")
         except Exception as e:
             logger.warning(
@@ -53,29 +113,61 @@ class DeepgramClient:
 
         Args:
             audio_bytes: Audio file bytes
-            filename: Original filename (for logging only)
+            filename: Original filename (for logging and format detection)
 
         Returns:
-            Transcribed text
+            Transcribed text (one line per speaker turn)
+        """
+        return self.transcript_from_bytes(audio_bytes, filename=filename).text
+
+    def transcript_from_bytes(self, audio_bytes: bytes, filename: str = "audio.wav") -> Transcript:
+        """
+        Transcribe audio bytes to a Transcript with word timings and speakers
+
+        Args:
+            audio_bytes: Audio file bytes
+            filename: Original filename (for logging and format detection)
+
+        Returns:
+            Transcript (the demo transcript, without timings, in demo mode or
+            on failure)
         """
         if self.demo_mode or self.client is None:
             logger.info("Using demo mode for transcription")
-            return self._demo_transcribe()
+            return Transcript.from_text(self._demo_transcribe())
+
+        from deepgram.core.api_error import ApiError
+
+        options = self._transcription_options()
+        cache_key = audio_cache_key(audio_bytes, options) if self.use_cache else None
+        if cache_key:
+            cached = get_transcript_cache().get(cache_key)
+            if cached is not None:
+                logger.info(f"Using cached transcript for {filename}")
+                return self._cached_transcript(cached)
 
         try:
+            upload = audio_bytes
+            if self.preprocess:
+                upload = preprocess_audio(audio_bytes, filename=filename, codec=self.codec)["data"]
+
             # Deepgram v5 file transcription (Listen v1 media)
             response = self.client.listen.v1.media.transcribe_file(
-                request=audio_bytes,
-                model="nova-3",
-                smart_format=True,
+                request=upload,
+                **options,
                 request_options={
                     "timeout_in_seconds": 60,
                     "max_retries": 3,
                 },
             )
 
-            transcript = response.results.channels[0].alternatives[0].transcript
-            logger.info(f"Successfully transcribed {len(audio_bytes)} bytes from {filename}")
+            transcript = self._response_transcript(response)
+            logger.info(
+                f"Successfully transcribed {len(audio_bytes)} bytes from {filename} "
+                f"({len(upload)} bytes uploaded)"
+            )
+            if cache_key:
+                get_transcript_cache().put(cache_key, transcript.to_dict(), filename=filename, options=options)
             return transcript
 
         except ApiError as e:
@@ -83,13 +175,233 @@ class DeepgramClient:
                 f"Deepgram API error {e.status_code}: {e.body}. "
                 "Falling back to demo transcript."
             )
-            return self._demo_transcribe()
+            return Transcript.from_text(self._demo_transcribe())
         except Exception as e:
             logger.error(
                 f"Deepgram transcription failed with unexpected error: {e}. "
                 "Falling back to demo transcript."
             )
-            return self._demo_transcribe()
+            return Transcript.from_text(self._demo_transcribe())
+
+    def transcribe_file(self, path: Union[str, Path]) -> str:
+        """
+        Transcribe an audio file on disk to text (see transcript_from_file)
+        """
+        return self.transcript_from_file(path).text
+
+    def transcript_from_file(self, path: Union[str, Path]) -> Transcript:
+        """
+        Transcribe an audio file on disk without loading it all into memory
+
+        The file is hashed in chunks for the cache lookup, preprocessed from
+        disk when possible, and otherwise streamed to Deepgram in chunks.
+        Throttling and transient failures are retried by the rate limiter.
+
+        Args:
+            path: Audio file path
+
+        Returns:
+            Transcript with word timings and speakers
+
+        Raises:
+            Exception: the Deepgram error once retries are exhausted (unlike
+            transcribe_bytes, there is no demo fallback)
+
+        Recordings longer than long_audio_seconds go through transcribe_long.
+        """
+        path = Path(path)
+        if self.demo_mode or self.client is None:
+            return Transcript.from_text(self._demo_transcribe())
+
+        if self.long_audio_seconds:
+            duration = audio_duration(path)
+            if duration and duration > self.long_audio_seconds:
+                try:
+                    return Transcript.from_words(self.transcribe_long(path)["words"])
+                except ValueError as e:
+                    logger.warning(f"Long-audio mode unavailable for {path.name} ({e}); sending it whole")
+
+        options = self._transcription_options()
+        cache_key = file_cache_key(path, options) if self.use_cache else None
+        if cache_key:
+            cached = get_transcript_cache().get(cache_key)
+            if cached is not None:
+                logger.info(f"Using cached transcript for {path.name}")
+                return self._cached_transcript(cached)
+
+        processed = preprocess_audio_file(path, codec=self.codec) if self.preprocess else None
+
+        def request():
+            # A fresh chunk iterator per attempt, so retries re-read the file
+            upload = processed["data"] if processed else iter_file_chunks(path)
+            return self.client.listen.v1.media.transcribe_file(
+                request=upload,
+                **options,
+                request_options={"timeout_in_seconds": 60, "max_retries": 0},
+            )
+
+        response = self.limiter.call(request)
+        transcript = self._response_transcript(response)
+        logger.info(f"Successfully transcribed {path.name}")
+
+        if cache_key:
+            get_transcript_cache().put(cache_key, transcript.to_dict(), filename=path.name, options=options)
+        return transcript
+
+    def transcribe_long(
+        self,
+        path: Union[str, Path],
+        max_chunk_seconds: float = MAX_CHUNK_SECONDS,
+        concurrency: int = 4
+    ) -> Dict:
+        """
+        Transcribe a long recording as silence-aligned chunks in parallel
+
+        The recording is memory-mapped, cut at silences into chunks of at
+        most max_chunk_seconds (see long_audio.plan_chunks), and each chunk
+        is encoded and uploaded by a worker, so wall-clock time follows the
+        slowest chunk rather than the whole call.
+
+        Args:
+            path: Audio file path (PCM WAV, or any format with ffmpeg)
+            max_chunk_seconds: Longest chunk sent in one request
+            concurrency: Chunks transcribed at once
+
+        Returns:
+            Dictionary with 'transcript', 'words' (word, start, end,
+            confidence, punctuated_word, speaker; seconds from the start of
+            the call), 'chunks' and 'duration'
+
+        Raises:
+            ValueError: the recording cannot be decoded (no ffmpeg for non-WAV input)
+            Exception: a chunk's Deepgram error once retries are exhausted
+        """
+        path = Path(path)
+        if self.demo_mode or self.client is None:
+            transcript = self._demo_transcribe()
+            return {"transcript": transcript, "words": [], "chunks": 1, "duration": None}
+
+        options = self._transcription_options()
+        cache_key = None
+        if self.use_cache:
+            # "speakers": entries cached before speaker ids were namespaced per chunk are not reused
+            cache_key = file_cache_key(path, {**options, "long_audio": max_chunk_seconds, "speakers": "per_chunk"})
+            cached = get_transcript_cache().get(cache_key)
+            if cached is not None:
+                logger.info(f"Using cached long-audio transcript for {path.name}")
+                return cached["transcript"]
+
+        with open_pcm(path) as (frames, rate):
+            duration = len(frames) / rate
+            silences = find_silences(frame_energies(frames, rate))
+            chunks = plan_chunks(duration, silences, max_chunk_seconds=max_chunk_seconds)
+            logger.info(f"Transcribing {path.name} ({duration:.0f}s) as {len(chunks)} chunks")
+
+            def transcribe_chunk(chunk: Dict) -> List[Dict]:
+                upload = chunk_wav(frames, rate, chunk)
+                response = self.limiter.call(lambda: self.client.listen.v1.media.transcribe_file(
+                    request=upload,
+                    **options,
+                    request_options={"timeout_in_seconds": 120, "max_retries": 0},
+                ))
+                return self._response_words(response)
+
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="deepgram-chunk") as pool:
+                chunk_words = list(zip(chunks, pool.map(transcribe_chunk, chunks)))
+
+        words = stitch_words(chunk_words)
+        result = {
+            "transcript": words_to_text(words),
+            "words": words,
+            "chunks": len(chunks),
+            "duration": duration,
+        }
+        if cache_key:
+            get_transcript_cache().put(cache_key, result, filename=path.name, options=options)
+        return result
+
+    def transcribe_many(
+        self,
+        paths: Iterable[Union[str, Path]],
+        concurrency: int = 4
+    ) -> Iterator[Tuple[str, Optional[Transcript]]]:
+        """
+        Transcribe many recordings concurrently, yielding results as they finish
+
+        Paths are consumed lazily and at most 2 x concurrency files are in
+        flight, so a day's export can be piped straight into deal processing.
+
+        Args:
+            paths: Audio file paths
+            concurrency: Worker threads (the shared limiter may admit fewer calls)
+
+        Yields:
+            (path, Transcript) in completion order; the transcript is None
+            when the file failed after retries (the error is logged)
+        """
+        paths = iter(paths)
+        pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="deepgram")
+        pending = {}
+
+        def submit_next() -> bool:
+            path = next(paths, None)
+            if path is None:
+                return False
+            pending[pool.submit(self.transcript_from_file, path)] = str(path)
+            return True
+
+        try:
+            while len(pending) < 2 * concurrency and submit_next():
+                pass
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    try:
+                        transcript = future.result()
+                    except Exception as e:
+                        logger.error(f"Transcription of {path} failed: {e}")
+                        transcript = None
+                    submit_next()
+                    yield path, transcript
+        finally:
+            # Consumer stopped early: drop queued files, let running uploads finish
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _response_words(response) -> List[Dict]:
+        """Word timings of the first channel's best alternative as plain dicts"""
+        words = response.results.channels[0].alternatives[0].words or []
+        return [
+            {
+                "word": word.word,
+                "start": float(word.start),
+                "end": float(word.end),
+                "confidence": getattr(word, "confidence", None),
+                "punctuated_word": getattr(word, "punctuated_word", None),
+                "speaker": getattr(word, "speaker", None),
+            }
+            for word in words
+        ]
+
+    @classmethod
+    def _response_transcript(cls, response) -> Transcript:
+        """Transcript from a response's words, or its flat text if it has none"""
+        words = cls._response_words(response)
+        if words:
+            return Transcript.from_words(words)
+        return Transcript.from_text(response.results.channels[0].alternatives[0].transcript)
+
+    @staticmethod
+    def _cached_transcript(cached: Dict) -> Transcript:
+        value = cached["transcript"]
+        # Entries written before word timings were kept hold plain text
+        return Transcript.from_text(value) if isinstance(value, str) else Transcript.from_dict(value)
+
+    def _transcription_options(self) -> Dict:
+        """Model options sent with each request (also part of the cache key)"""
+        return {"model": self.model, "smart_format": True, "diarize": True}
 
     def _demo_transcribe(self) -> str:
         """Demo/fallback transcription - returns realistic CRE deal transcript."""
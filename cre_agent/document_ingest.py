@@ -0,0 +1,249 @@
+"""
+Long-document ingestion - streams offering memorandums in section-aware chunks,
+prefilters them by keyword density and reconciles per-chunk extractions
+"""
+import logging
+import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from .deal_parser import heuristic_parse
+
+logger = logging.getLogger(__name__)
+
+# Documents longer than this go through the chunked pipeline instead of a single parse
+LONG_DOCUMENT_CHARS = 20_000
+
+DEFAULT_CHUNK_CHARS = 4_000
+DEFAULT_OVERLAP_CHARS = 200
+
+# Minimum keyword hits per 1,000 characters for a chunk to reach the extractors
+DEFAULT_MIN_DENSITY = 0.5
+
+KEYWORD_PATTERN = re.compile(
+    r"\bNOI\b|net operating income|cap(?:italization)?\s+rate|\bcap\b|rent\s+roll|"
+    r"occupan|occupied|asking|purchase price|\bunits?\b|square feet|\bSF\b|"
+    r"year built|built in|broker",
+    re.IGNORECASE
+)
+
+# Headings: markdown, numbered ("3. Financial Overview", "IV. Rent Roll") or short ALL CAPS lines
+HEADING_PATTERN = re.compile(
+    r"^\s*(?:#{1,6}\s+\S.*|(?:\d+(?:\.\d+)*|[IVXLC]+)\.\s+[A-Z].{0,80}|[A-Z][A-Z0-9 &/,\-]{3,80})\s*$"
+)
+
+# Fields that are per-document free text rather than extractable facts
+SKIP_FIELDS = {"notes"}
+
+
+def keyword_density(text: str) -> float:
+    """Underwriting keyword hits per 1,000 characters"""
+    if not text:
+        return 0.0
+    return len(KEYWORD_PATTERN.findall(text)) * 1000 / len(text)
+
+
+def iter_chunks(
+    lines: Iterable[str],
+    max_chars: int = DEFAULT_CHUNK_CHARS,
+    overlap_chars: int = DEFAULT_OVERLAP_CHARS
+) -> Iterator[Dict]:
+    """
+    Split a line stream into section-aware chunks
+
+    A new chunk starts at every heading, and long sections are split at
+    paragraph or line boundaries once they reach max_chars, carrying a small
+    overlap so facts straddling a boundary are not lost. Only the current
+    chunk is held in memory.
+
+    Args:
+        lines: Any iterable of text lines (an open file works)
+        max_chars: Target maximum chunk size
+        overlap_chars: Characters carried over when a section is split
+
+    Yields:
+        Chunk dictionaries with 'index', 'section', 'offset' and 'text'
+    """
+    index = 0
+    offset = 0
+    chunk_offset = 0
+    section = None
+    buffer: List[str] = []
+    size = 0
+    has_new_text = False  # False while the buffer holds only carried-over overlap
+
+    def _emit():
+        return {
+            "index": index,
+            "section": section,
+            "offset": chunk_offset,
+            "text": "".join(buffer),
+        }
+
+    for line in lines:
+        if not line.endswith("\n"):
+            line += "\n"
+        stripped = line.strip()
+        is_heading = bool(stripped) and len(stripped) <= 90 and HEADING_PATTERN.match(stripped)
+
+        if is_heading and has_new_text:
+            yield _emit()
+            index += 1
+        if is_heading:
+            buffer, size, has_new_text, chunk_offset = [], 0, False, offset
+            section = stripped.lstrip("#").strip()
+
+        # Split long sections at a paragraph break, or hard-split past 1.5x the target
+        if size >= max_chars and (not stripped or size >= max_chars * 1.5):
+            yield _emit()
+            index += 1
+            tail = "".join(buffer)[-overlap_chars:] if overlap_chars else ""
+            buffer, size = ([tail], len(tail)) if tail else ([], 0)
+            has_new_text = False
+            chunk_offset = offset - len(tail)
+
+        buffer.append(line)
+        size += len(line)
+        offset += len(line)
+        has_new_text = has_new_text or bool(stripped)
+
+    if has_new_text:
+        yield _emit()
+
+
+def iter_relevant_chunks(
+    chunks: Iterable[Dict],
+    min_density: float = DEFAULT_MIN_DENSITY
+) -> Iterator[Dict]:
+    """Yield only chunks dense enough in underwriting keywords to be worth extracting"""
+    for chunk in chunks:
+        density = keyword_density(chunk["text"])
+        if density >= min_density:
+            chunk["density"] = density
+            yield chunk
+
+
+def _hashable(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+
+def reconcile_candidates(candidates: Dict[str, List[Dict]]) -> Tuple[Dict, Dict]:
+    """
+    Pick one value per field from the per-chunk candidates
+
+    Each occurrence counts once plus a bonus for the keyword density of its
+    chunk (capped, so a tiny dense chunk cannot outvote repeated mentions);
+    ties go to the earliest occurrence.
+
+    Args:
+        candidates: field -> list of {'value', 'chunk', 'section', 'offset', 'density'}
+
+    Returns:
+        Tuple of (fields, provenance) where provenance maps each field to the
+        winning candidate's chunk/section/offset and the number of agreeing chunks
+    """
+    fields = {}
+    provenance = {}
+
+    for field, field_candidates in candidates.items():
+        weights: Dict = defaultdict(float)
+        first_seen: Dict = {}
+        support: Dict = defaultdict(int)
+
+        for candidate in field_candidates:
+            key = _hashable(candidate["value"])
+            weights[key] += 1.0 + min(candidate.get("density", 0.0), 10.0) / 10.0
+            support[key] += 1
+            first_seen.setdefault(key, candidate)
+
+        best = max(weights, key=lambda k: (weights[k], -first_seen[k]["offset"]))
+        winner = first_seen[best]
+        fields[field] = winner["value"]
+        provenance[field] = {
+            "chunk": winner["chunk"],
+            "section": winner["section"],
+            "offset": winner["offset"],
+            "support": support[best],
+            "alternatives": len(weights) - 1,
+        }
+
+    return fields, provenance
+
+
+def extract_document(
+    lines: Iterable[str],
+    extractor: Callable[[str], Dict] = heuristic_parse,
+    workers: int = 4,
+    max_chars: int = DEFAULT_CHUNK_CHARS,
+    min_density: float = DEFAULT_MIN_DENSITY
+) -> Tuple[Dict, Dict]:
+    """
+    Extract deal fields from a long document with bounded memory
+
+    Chunks are streamed, prefiltered by keyword density and extracted in
+    parallel; at most 2 x workers chunks are in flight at any time.
+
+    Args:
+        lines: Line iterable (e.g. an open OM text file)
+        extractor: Function mapping chunk text to a field dictionary
+        workers: Parallel chunk extractions
+        max_chars: Target chunk size
+        min_density: Keyword density threshold for relevant chunks
+
+    Returns:
+        Tuple of (fields, provenance) - see reconcile_candidates
+    """
+    candidates: Dict[str, List[Dict]] = defaultdict(list)
+    stats = {"chunks": 0}
+
+    def _counted(chunks):
+        for chunk in chunks:
+            stats["chunks"] += 1
+            yield chunk
+
+    def _collect(chunk: Dict, extracted: Dict) -> None:
+        for field, value in extracted.items():
+            if field in SKIP_FIELDS or value is None:
+                continue
+            if isinstance(value, dict) and not any(v is not None for v in value.values()):
+                continue
+            candidates[field].append({
+                "value": value,
+                "chunk": chunk["index"],
+                "section": chunk["section"],
+                "offset": chunk["offset"],
+                "density": chunk.get("density", 0.0),
+            })
+
+    relevant = iter_relevant_chunks(_counted(iter_chunks(lines, max_chars)), min_density)
+    extracted_count = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight: List = []
+        for chunk in relevant:
+            in_flight.append((chunk, pool.submit(extractor, chunk["text"])))
+            if len(in_flight) >= workers * 2:
+                done_chunk, future = in_flight.pop(0)
+                _collect(done_chunk, future.result())
+                extracted_count += 1
+
+        for done_chunk, future in in_flight:
+            _collect(done_chunk, future.result())
+            extracted_count += 1
+
+    fields, provenance = reconcile_candidates(candidates)
+    logger.info(
+        f"Document ingestion: {stats['chunks']} chunks, {extracted_count} relevant, "
+        f"{len(fields)} fields reconciled"
+    )
+    return fields, provenance
+
+
+def extract_document_text(text: str, **kwargs) -> Tuple[Dict, Dict]:
+    """Convenience wrapper running extract_document over an in-memory string"""
+    return extract_document(text.splitlines(keepends=True), **kwargs)
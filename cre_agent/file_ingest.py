@@ -0,0 +1,240 @@
+"""
+File ingestion - streaming readers for OM PDFs and rent-roll CSV/XLSX files
+"""
+import csv
+import io
+import logging
+import re
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Union
+
+from .deal_parser import heuristic_parse
+from .document_ingest import extract_document
+
+logger = logging.getLogger(__name__)
+
+Source = Union[str, Path, BinaryIO]
+
+RENT_ROLL_SUFFIXES = {".csv", ".xlsx", ".xlsm"}
+DOCUMENT_SUFFIXES = {".pdf", ".txt"}
+
+# Normalized rent-roll column -> header spellings seen in broker exports
+COLUMN_ALIASES = {
+    "unit": ["unit", "unit #", "unit no", "unit number", "apt", "apartment", "suite", "space"],
+    "status": ["status", "occupancy", "occupancy status", "lease status", "unit status"],
+    "tenant": ["tenant", "tenant name", "resident", "resident name", "lessee"],
+    "rent": ["rent", "current rent", "in-place rent", "in place rent", "actual rent",
+             "contract rent", "monthly rent", "lease rent"],
+    "market_rent": ["market rent", "market", "asking rent", "pro forma rent"],
+    "square_feet": ["sf", "sqft", "sq ft", "square feet", "size", "unit size", "rsf", "nrsf"],
+    "lease_start": ["lease start", "move in", "move-in", "lease from", "commencement"],
+    "lease_end": ["lease end", "lease expiration", "expiration", "lease to", "move out", "expires"],
+}
+
+_HEADER_LOOKUP = {
+    alias: column for column, aliases in COLUMN_ALIASES.items() for alias in aliases
+}
+
+# Status/tenant words marking a unit as not producing rent (notice-to-vacate units still pay)
+VACANT_WORDS = ("vacant", "vacancy", "down", "model", "unrented", "available")
+
+
+@contextmanager
+def _open_binary(source: Source) -> Iterator[BinaryIO]:
+    """Open a path (closing it afterwards) or pass a caller-owned file object through"""
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            yield f
+    else:
+        yield source
+
+
+def _suffix(source: Source, filename: Optional[str] = None) -> str:
+    name = filename or (str(source) if isinstance(source, (str, Path)) else getattr(source, "name", ""))
+    return Path(name).suffix.lower()
+
+
+def normalize_header(header) -> Optional[str]:
+    """Map a raw rent-roll column header to its normalized column name"""
+    if header is None:
+        return None
+    key = re.sub(r"[^a-z0-9#\- ]", "", str(header).strip().lower())
+    key = re.sub(r"\s+", " ", key)
+    return _HEADER_LOOKUP.get(key)
+
+
+def parse_number(value) -> Optional[float]:
+    """Parse spreadsheet cell values like '$1,250.00', '(50)', 950 -> float"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().replace(",", "").replace("$", "")
+    negative = text.startswith("(") and text.endswith(")")
+    text = text.strip("()")
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    return -number if negative else number
+
+
+def iter_pdf_pages(source: Source) -> Iterator[str]:
+    """
+    Yield the text of a PDF one page at a time
+
+    Requires the optional pypdf package. Pages are extracted lazily, so only
+    one page of text is held in memory.
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError as e:
+        raise ImportError("PDF ingestion requires pypdf (pip install pypdf)") from e
+
+    with _open_binary(source) as f:
+        reader = PdfReader(f)
+        for page in reader.pages:
+            yield page.extract_text() or ""
+
+
+def iter_pdf_lines(source: Source) -> Iterator[str]:
+    """Yield text lines of a PDF across pages (input for document_ingest.extract_document)"""
+    for page_text in iter_pdf_pages(source):
+        yield from page_text.splitlines(keepends=True)
+        yield "\n"
+
+
+def _iter_rows_with_header(rows: Iterable) -> Iterator[Dict]:
+    """Find the header row (first row with a recognized unit/rent column) and map later rows"""
+    columns = None
+    for row in rows:
+        if columns is None:
+            normalized = [normalize_header(cell) for cell in row]
+            if "unit" in normalized or "rent" in normalized:
+                columns = normalized
+            continue
+
+        if not any(cell not in (None, "") for cell in row):
+            continue
+
+        record = {}
+        for column, cell in zip(columns, row):
+            if column and column not in record:
+                record[column] = cell
+        # Skip subtotal/total lines that some exports append
+        if str(record.get("unit") or "").strip().lower().startswith("total"):
+            continue
+        yield record
+
+
+def iter_rent_roll_rows(source: Source, filename: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Stream normalized rent-roll rows from a CSV or XLSX file
+
+    XLSX files are opened in openpyxl's read-only mode, which streams rows
+    from the sheet XML instead of loading the workbook into memory.
+
+    Yields:
+        Dictionaries keyed by normalized column names (unit, status, rent, ...)
+    """
+    suffix = _suffix(source, filename)
+
+    if suffix == ".csv":
+        with _open_binary(source) as f:
+            text = io.TextIOWrapper(f, encoding="utf-8-sig", newline="")
+            try:
+                yield from _iter_rows_with_header(csv.reader(text))
+            finally:
+                # Don't let the wrapper close a caller-owned file object
+                text.detach()
+    elif suffix in (".xlsx", ".xlsm"):
+        try:
+            from openpyxl import load_workbook
+        except ImportError as e:
+            raise ImportError("XLSX ingestion requires openpyxl (pip install openpyxl)") from e
+
+        with _open_binary(source) as f:
+            workbook = load_workbook(f, read_only=True, data_only=True)
+            try:
+                yield from _iter_rows_with_header(workbook.active.iter_rows(values_only=True))
+            finally:
+                workbook.close()
+    else:
+        raise ValueError(f"Unsupported rent roll format: {suffix or 'unknown'}")
+
+
+def is_occupied(row: Dict) -> bool:
+    """Decide whether a rent-roll row is an occupied unit"""
+    status = str(row.get("status") or "").strip().lower()
+    if status:
+        return not any(word in status for word in VACANT_WORDS)
+    tenant = str(row.get("tenant") or "").strip().lower()
+    if tenant:
+        return not any(word in tenant for word in VACANT_WORDS)
+    rent = parse_number(row.get("rent"))
+    return bool(rent and rent > 0)
+
+
+def rent_roll_fields(summary: Dict) -> Dict:
+    """Map a rent-roll summary onto heuristic_parse field names"""
+    fields = {
+        "units": summary.get("units") or None,
+        "occupancy": summary.get("occupancy"),
+        "square_feet": summary.get("square_feet"),
+    }
+    return {key: value for key, value in fields.items() if value is not None}
+
+
+def ingest_file(source: Source, filename: Optional[str] = None, workers: int = 4) -> Dict:
+    """
+    Ingest an OM (PDF/TXT) or rent roll (CSV/XLSX) into heuristic_parse-shaped fields
+
+    Args:
+        source: Path or binary file object
+        filename: Original filename, used to detect the format for file objects
+        workers: Parallel chunk extractions for documents
+
+    Returns:
+        Dictionary with:
+            - kind: "document" or "rent_roll"
+            - fields: heuristic_parse-style deal fields
+            - provenance: per-field chunk provenance (documents)
+            - rent_roll: aggregate summary (rent rolls)
+    """
+    suffix = _suffix(source, filename)
+    template = heuristic_parse("")
+
+    if suffix in RENT_ROLL_SUFFIXES:
+        # Imported here: rent_roll depends on this module's row helpers (and on numpy)
+        from .rent_roll import analyze_rent_roll, unit_arrays_from_rows
+
+        summary = analyze_rent_roll(unit_arrays_from_rows(iter_rent_roll_rows(source, filename)))
+        logger.info(f"Ingested rent roll: {summary['units']} units, occupancy {summary['occupancy']}")
+        return {
+            "kind": "rent_roll",
+            "fields": {**template, **rent_roll_fields(summary), "rent_roll": summary},
+            "provenance": {},
+            "rent_roll": summary,
+        }
+
+    if suffix not in DOCUMENT_SUFFIXES:
+        raise ValueError(f"Unsupported file format: {suffix or 'unknown'}")
+
+    if suffix == ".pdf":
+        fields, provenance = extract_document(iter_pdf_lines(source), workers=workers)
+    else:
+        with _open_binary(source) as f:
+            text = io.TextIOWrapper(f, encoding="utf-8", errors="replace")
+            try:
+                fields, provenance = extract_document(text, workers=workers)
+            finally:
+                text.detach()
+
+    logger.info(f"Ingested document: {len(fields)} fields extracted")
+    return {
+        "kind": "document",
+        "fields": {**template, **fields},
+        "provenance": provenance,
+        "rent_roll": None,
+    }
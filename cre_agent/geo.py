@@ -0,0 +1,180 @@
+"""
+Geographic gazetteer - US places and submarkets -> county -> MSA, with alias resolution
+
+The place table (data/us_places.tsv) is memory-mapped and indexed on first
+use: a single scan records the byte offset of every name and alias, and a
+lookup parses only the line it needs. "Plano", "Round Rock" and "the Domain"
+resolve to the Dallas and Austin markets in one dictionary probe.
+"""
+import logging
+import mmap
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+PLACES_PATH = Path(__file__).parent / "data" / "us_places.tsv"
+
+US_STATES = {
+    "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas", "CA": "California",
+    "CO": "Colorado", "CT": "Connecticut", "DE": "Delaware", "DC": "District of Columbia",
+    "FL": "Florida", "GA": "Georgia", "HI": "Hawaii", "ID": "Idaho", "IL": "Illinois",
+    "IN": "Indiana", "IA": "Iowa", "KS": "Kansas", "KY": "Kentucky", "LA": "Louisiana",
+    "ME": "Maine", "MD": "Maryland", "MA": "Massachusetts", "MI": "Michigan", "MN": "Minnesota",
+    "MS": "Mississippi", "MO": "Missouri", "MT": "Montana", "NE": "Nebraska", "NV": "Nevada",
+    "NH": "New Hampshire", "NJ": "New Jersey", "NM": "New Mexico", "NY": "New York",
+    "NC": "North Carolina", "ND": "North Dakota", "OH": "Ohio", "OK": "Oklahoma", "OR": "Oregon",
+    "PA": "Pennsylvania", "RI": "Rhode Island", "SC": "South Carolina", "SD": "South Dakota",
+    "TN": "Tennessee", "TX": "Texas", "UT": "Utah", "VT": "Vermont", "VA": "Virginia",
+    "WA": "Washington", "WV": "West Virginia", "WI": "Wisconsin", "WY": "Wyoming",
+}
+_STATE_CODES = {name.lower(): code for code, name in US_STATES.items()}
+
+_COLUMNS = ("name", "kind", "state", "county", "msa", "market", "aliases", "text_match")
+_PUNCTUATION = re.compile(r"[.']")
+_WHITESPACE = re.compile(r"[\s\-]+")
+
+
+def normalize_place_name(name: str) -> str:
+    """Lookup key for a place name: case, punctuation, 'the' and 'Saint' insensitive"""
+    key = _WHITESPACE.sub(" ", _PUNCTUATION.sub("", name.lower())).strip()
+    if key.startswith("the "):
+        key = key[4:]
+    if key.startswith("saint "):
+        key = "st " + key[6:]
+    return key
+
+
+def normalize_state(state: Optional[str]) -> Optional[str]:
+    """Two-letter state code for a code or full state name, else None"""
+    if not state:
+        return None
+    state = state.strip()
+    if state.upper() in US_STATES:
+        return state.upper()
+    return _STATE_CODES.get(state.lower())
+
+
+class Gazetteer:
+    """Memory-mapped place table indexed by normalized name and alias"""
+
+    def __init__(self, path: Union[str, Path] = PLACES_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._mm: Optional[mmap.mmap] = None
+        self._offsets: Dict[str, List[int]] = {}
+        self._rows = 0
+
+    def _load(self) -> None:
+        """Map the file and record line offsets per name/alias (once)"""
+        if self._mm is not None:
+            return
+        with self._lock:
+            if self._mm is not None:
+                return
+            with open(self.path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            offsets: Dict[str, List[int]] = {}
+            rows = 0
+            header_seen = False
+            pos = 0
+            for line in iter(mm.readline, b""):
+                start, pos = pos, pos + len(line)
+                if line.startswith(b"#") or not line.strip():
+                    continue
+                if not header_seen:
+                    header_seen = True
+                    continue
+                fields = line.decode("utf-8").rstrip("\r\n").split("\t")
+                names = [fields[0]] + [alias for alias in fields[6].split("|") if alias]
+                for name in names:
+                    offsets.setdefault(normalize_place_name(name), []).append(start)
+                rows += 1
+
+            self._offsets = offsets
+            self._rows = rows
+            self._mm = mm
+            logger.debug(f"Indexed {rows} places from {self.path}")
+
+    def __len__(self) -> int:
+        self._load()
+        return self._rows
+
+    def _row(self, offset: int) -> Dict:
+        end = self._mm.find(b"\n", offset)
+        line = self._mm[offset:end if end != -1 else len(self._mm)].decode("utf-8").rstrip("\r")
+        row = dict(zip(_COLUMNS, line.split("\t")))
+        row["aliases"] = [alias for alias in row["aliases"].split("|") if alias]
+        row["text_match"] = row["text_match"] == "1"
+        return row
+
+    def lookup(self, name: str, state: Optional[str] = None) -> Optional[Dict]:
+        """
+        Look up a place, submarket or alias
+
+        Args:
+            name: Place name ("Plano", "the Domain", "NYC")
+            state: Optional state code or name to pick between same-named places
+
+        Returns:
+            Row dict (name, kind, state, county, msa, market, aliases,
+            text_match), or None if unknown. Without a matching state the
+            first listed place of that name is returned.
+        """
+        if not name:
+            return None
+        self._load()
+        offsets = self._offsets.get(normalize_place_name(name))
+        if not offsets:
+            return None
+
+        code = normalize_state(state)
+        if code and len(offsets) > 1:
+            for offset in offsets:
+                row = self._row(offset)
+                if row["state"] == code:
+                    return row
+        return self._row(offsets[0])
+
+    def rows(self) -> Iterator[Dict]:
+        """Iterate all rows in file order"""
+        self._load()
+        seen = set()
+        for offsets in self._offsets.values():
+            seen.update(offsets)
+        for offset in sorted(seen):
+            yield self._row(offset)
+
+
+_gazetteer: Optional[Gazetteer] = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer:
+    """Get the process-wide gazetteer (mapped and indexed on first lookup)"""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer()
+    return _gazetteer
+
+
+@lru_cache(maxsize=8192)
+def market_of(name: Optional[str], state: Optional[str] = None) -> Optional[str]:
+    """
+    Market a place belongs to ("Plano" -> "Dallas", "Round Rock" -> "Austin")
+
+    Args:
+        name: Place, submarket or alias
+        state: Optional state code or name
+
+    Returns:
+        Market name, or None when the place is not in the gazetteer
+    """
+    row = get_gazetteer().lookup(name, state)
+    return row["market"] if row else None
@@ -0,0 +1,373 @@
+"""
+Job queue - durable SQLite queue of deal-processing jobs
+
+Jobs are rows in runs/jobs.sqlite, so they outlive browser sessions and
+process restarts. Workers (see worker.py), in any number of processes on
+the host, claim jobs atomically under a lease:
+
+    queued  -> running    claimed by a worker; the lease is renewed while it works
+    running -> succeeded  result stored with the job
+    running -> queued     handler failed and attempts remain
+    running -> failed     attempts exhausted (or the last lease expired)
+    queued  -> cancelled  cancelled before a worker picked it up
+
+A job whose worker died (lease expired) is claimed again by the next
+worker, so a crash never loses work.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+JOBS_FILENAME = "jobs.sqlite"
+
+DEAL_JOB = "deal"
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_LEASE_SECONDS = 120.0
+
+ACTIVE_STATUSES = ("queued", "running")
+FINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+_COLUMNS = (
+    "job_id", "kind", "status", "payload", "result", "error", "progress", "message",
+    "attempts", "max_attempts", "worker_id", "lease_expires", "created_at", "started_at",
+    "finished_at", "updated_at"
+)
+
+
+class JobQueue:
+    """SQLite-backed job queue shared by the app and worker processes"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit; claims open their own IMMEDIATE transaction so
+        # concurrent workers in other processes can't claim the same job
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=False, isolation_level=None, timeout=30.0
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                progress REAL NOT NULL DEFAULT 0,
+                message TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                worker_id TEXT,
+                lease_expires REAL,
+                created_at TEXT NOT NULL,
+                started_at TEXT,
+                finished_at TEXT,
+                updated_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+        """)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @staticmethod
+    def _job(row: Optional[sqlite3.Row], with_payload: bool = True) -> Optional[Dict]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"]) if with_payload else None
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def enqueue(self, kind: str, payload: Dict, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> str:
+        """
+        Add a job to the queue
+
+        Args:
+            kind: Job handler name (see worker.JOB_HANDLERS)
+            payload: JSON-serializable handler arguments
+            max_attempts: Times the job is tried before it is marked failed
+
+        Returns:
+            Job ID
+        """
+        job_id = uuid.uuid4().hex[:12]
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, kind, status, payload, max_attempts, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload, default=str), max_attempts, now, now)
+            )
+        logger.info(f"Queued {kind} job {job_id}")
+        return job_id
+
+    def claim(self, worker_id: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[Dict]:
+        """
+        Atomically take the oldest runnable job
+
+        Queued jobs and running jobs whose lease expired (their worker died)
+        are runnable. A job that already used all its attempts is marked
+        failed instead of being handed out again.
+
+        Args:
+            worker_id: Claiming worker
+            lease_seconds: How long the claim holds without a heartbeat
+
+        Returns:
+            The claimed job (with payload), or None when nothing is runnable
+        """
+        with self._lock:
+            while True:
+                now = time.time()
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    row = self._conn.execute(
+                        "SELECT * FROM jobs WHERE status = 'queued' "
+                        "OR (status = 'running' AND lease_expires < ?) "
+                        "ORDER BY created_at LIMIT 1",
+                        (now,)
+                    ).fetchone()
+                    if row is None:
+                        self._conn.execute("COMMIT")
+                        return None
+
+                    stamp = datetime.now().isoformat()
+                    if row["attempts"] >= row["max_attempts"]:
+                        self._conn.execute(
+                            "UPDATE jobs SET status = 'failed', error = ?, lease_expires = NULL, "
+                            "finished_at = ?, updated_at = ? WHERE job_id = ?",
+                            (row["error"] or f"Worker {row['worker_id']} stopped responding",
+                             stamp, stamp, row["job_id"])
+                        )
+                        self._conn.execute("COMMIT")
+                        logger.warning(f"Job {row['job_id']} failed: no attempts left")
+                        continue
+
+                    if row["status"] == "running":
+                        logger.warning(f"Reclaiming job {row['job_id']} from unresponsive worker {row['worker_id']}")
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', worker_id = ?, lease_expires = ?, "
+                        "attempts = attempts + 1, started_at = ?, updated_at = ? WHERE job_id = ?",
+                        (worker_id, now + lease_seconds, stamp, stamp, row["job_id"])
+                    )
+                    claimed = self._conn.execute(
+                        "SELECT * FROM jobs WHERE job_id = ?", (row["job_id"],)
+                    ).fetchone()
+                    self._conn.execute("COMMIT")
+                    return self._job(claimed)
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+
+    def heartbeat(
+        self,
+        job_id: str,
+        worker_id: str,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        progress: Optional[float] = None,
+        message: Optional[str] = None
+    ) -> bool:
+        """
+        Renew a claim and optionally report progress
+
+        Returns:
+            False if the job is no longer held by this worker (lease lost)
+        """
+        stamp = datetime.now().isoformat()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires = ?, progress = COALESCE(?, progress), "
+                "message = COALESCE(?, message), updated_at = ? "
+                "WHERE job_id = ? AND worker_id = ? AND status = 'running'",
+                (time.time() + lease_seconds, progress, message, stamp, job_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, result: Any) -> bool:
+        """Store a job's result and mark it succeeded (False if the lease was lost)"""
+        stamp = datetime.now().isoformat()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'succeeded', result = ?, error = NULL, progress = 1, "
+                "message = 'Done', lease_expires = NULL, finished_at = ?, updated_at = ? "
+                "WHERE job_id = ? AND worker_id = ? AND status = 'running'",
+                (json.dumps(result, default=str), stamp, stamp, job_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> Optional[str]:
+        """
+        Record a failed attempt
+
+        Returns:
+            The job's new status ('queued' to retry, 'failed' when attempts
+            are used up), or None if the lease was lost
+        """
+        stamp = datetime.now().isoformat()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+                "error = ?, lease_expires = NULL, worker_id = NULL, "
+                "finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE ? END, updated_at = ? "
+                "WHERE job_id = ? AND worker_id = ? AND status = 'running'",
+                (error, stamp, stamp, job_id, worker_id)
+            )
+            if cursor.rowcount != 1:
+                return None
+            return self._conn.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()[0]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that no worker has started (False if it already started)"""
+        stamp = datetime.now().isoformat()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ?, updated_at = ? "
+                "WHERE job_id = ? AND status = 'queued'",
+                (stamp, stamp, job_id)
+            )
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str, with_payload: bool = False) -> Optional[Dict]:
+        """
+        Current state of a job
+
+        Returns:
+            Job dict (status, progress, message, attempts, result, error,
+            timestamps; payload only if with_payload), or None if unknown
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._job(row, with_payload=with_payload)
+
+    def result(self, job_id: str) -> Any:
+        """
+        Result of a finished job
+
+        Raises:
+            KeyError: unknown job
+            RuntimeError: the job failed or was cancelled
+            ValueError: the job has not finished yet
+        """
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if job["status"] == "succeeded":
+            return job["result"]
+        if job["status"] in FINAL_STATUSES:
+            raise RuntimeError(f"Job {job_id} {job['status']}: {job['error'] or 'no result'}")
+        raise ValueError(f"Job {job_id} is still {job['status']}")
+
+    def wait(self, job_id: str, timeout: Optional[float] = None, poll_interval: float = 0.5) -> Dict:
+        """
+        Block until a job reaches a final status
+
+        Raises:
+            KeyError: unknown job
+            TimeoutError: still active after timeout seconds
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                raise KeyError(job_id)
+            if job["status"] in FINAL_STATUSES:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Job {job_id} still {job['status']} after {timeout}s")
+            time.sleep(poll_interval)
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """Most recent jobs first, without payloads or results"""
+        query = (
+            "SELECT job_id, kind, status, progress, message, error, attempts, max_attempts, worker_id, "
+            "created_at, started_at, finished_at, updated_at FROM jobs"
+        )
+        params: List[Any] = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params)]
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in ACTIVE_STATUSES + FINAL_STATUSES}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def purge(self, older_than_days: float = 30.0) -> int:
+        """Delete finished jobs older than the cutoff; returns the number removed"""
+        cutoff = datetime.fromtimestamp(time.time() - older_than_days * 86400).isoformat()
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({','.join('?' * len(FINAL_STATUSES))}) AND finished_at < ?",
+                (*FINAL_STATUSES, cutoff)
+            )
+        return cursor.rowcount
+
+
+_queues: Dict[Path, JobQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_job_queue(path: Optional[Union[str, Path]] = None) -> JobQueue:
+    """
+    Get the process-wide job queue (default: runs/jobs.sqlite)
+
+    Args:
+        path: Queue database path
+
+    Returns:
+        Shared JobQueue for that path
+    """
+    if path is None:
+        from .storage import RUNS_DIR
+        path = RUNS_DIR / JOBS_FILENAME
+
+    path = Path(path).resolve()
+    with _queues_lock:
+        if path not in _queues:
+            _queues[path] = JobQueue(path)
+        return _queues[path]
+
+
+def enqueue_deal(
+    raw_text: str,
+    buybox: Dict,
+    known_fields: Optional[Dict] = None,
+    transcript: Optional[Dict] = None,
+    queue: Optional[JobQueue] = None
+) -> str:
+    """
+    Queue a run_deal_agent job
+
+    Args:
+        raw_text: Raw deal text
+        buybox: Buy-box criteria
+        known_fields: Fields from structured sources (see run_deal_agent)
+        transcript: Transcript.to_dict() of the call raw_text came from
+        queue: Queue to use (default: get_job_queue())
+
+    Returns:
+        Job ID; the job's result is the run payload
+    """
+    payload = {"raw_text": raw_text, "buybox": buybox, "known_fields": known_fields, "transcript": transcript}
+    return (queue or get_job_queue()).enqueue(DEAL_JOB, payload)
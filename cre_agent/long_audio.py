@@ -0,0 +1,291 @@
+"""
+Long-audio mode - silence-aware chunking of multi-hour recordings and transcript stitching
+
+A long call is decoded to PCM on disk and memory-mapped, never loaded as a
+whole. Frame energies (an energy VAD) locate silences, the recording is cut
+at silences into bounded chunks (hard cuts with an overlap only when a
+window has no usable silence), chunks are transcribed independently, and
+the word timings are shifted back onto the call's timeline. Each chunk owns
+the words that start inside its own span, so overlapping audio is never
+transcribed twice into the result.
+"""
+import logging
+import shutil
+import struct
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .audio import TARGET_SAMPLE_RATE, encode_wav, resample
+from .transcript import SPEAKERS_PER_SEGMENT
+
+logger = logging.getLogger(__name__)
+
+MAX_CHUNK_SECONDS = 600.0
+MIN_CHUNK_SECONDS = 120.0
+HARD_CUT_OVERLAP_SECONDS = 2.0
+
+# Energy VAD: 30ms frames; silence is quieter than the noise floor + margin for at least MIN_SILENCE_SECONDS
+VAD_FRAME_SECONDS = 0.03
+VAD_MARGIN_DB = 8.0
+MIN_SILENCE_SECONDS = 0.4
+
+# Analysis frames reduced per block when scanning the memory map
+_ENERGY_BLOCK_FRAMES = 4096
+
+_PCM_DTYPES = {(1, 8): np.uint8, (1, 16): np.dtype("<i2"), (1, 32): np.dtype("<i4"), (3, 32): np.dtype("<f4")}
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def _wav_layout(path: Path) -> Optional[Dict]:
+    """Locate the fmt and data chunks of a WAV file; None if not a memory-mappable PCM WAV"""
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+
+        layout = {}
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if chunk_id == b"fmt ":
+                fmt = f.read(size)
+                format_tag, channels, rate = struct.unpack("<HHI", fmt[:8])
+                bits = struct.unpack("<H", fmt[14:16])[0]
+                if format_tag == _WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                    format_tag = struct.unpack("<H", fmt[24:26])[0]
+                layout.update(format_tag=format_tag, channels=channels, rate=rate, bits=bits)
+                if size % 2:
+                    f.seek(1, 1)
+            elif chunk_id == b"data":
+                if "format_tag" not in layout:
+                    return None
+                layout["offset"] = f.tell()
+                # Streaming writers leave the size at 0 or 0xFFFFFFFF; use the rest of the file
+                file_size = path.stat().st_size
+                layout["size"] = size if 0 < size <= file_size - layout["offset"] else file_size - layout["offset"]
+                dtype = _PCM_DTYPES.get((layout["format_tag"], layout["bits"]))
+                if dtype is None:
+                    return None
+                layout["dtype"] = dtype
+                return layout
+            else:
+                f.seek(size + (size % 2), 1)
+
+
+@contextmanager
+def open_pcm(path: Union[str, Path]) -> Iterator[Tuple[np.ndarray, int]]:
+    """
+    Memory-map a recording as PCM frames
+
+    PCM WAVs are mapped in place; other formats are decoded by ffmpeg to a
+    temporary 16kHz mono file first.
+
+    Yields:
+        (frames, sample_rate) where frames is a (samples, channels) memmap
+
+    Raises:
+        ValueError: not a PCM WAV and ffmpeg is not available
+    """
+    path = Path(path)
+    layout = _wav_layout(path)
+    if layout:
+        width = np.dtype(layout["dtype"]).itemsize
+        count = layout["size"] // (width * layout["channels"])
+        if not count:
+            yield np.zeros((0, layout["channels"]), dtype=layout["dtype"]), layout["rate"]
+            return
+        frames = np.memmap(
+            path, dtype=layout["dtype"], mode="r", offset=layout["offset"],
+            shape=(count, layout["channels"])
+        )
+        yield frames, layout["rate"]
+        return
+
+    if not shutil.which("ffmpeg"):
+        raise ValueError(f"Long-audio mode needs a PCM WAV or ffmpeg to decode {path.name}")
+
+    with tempfile.NamedTemporaryFile(suffix=".pcm") as decoded:
+        command = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+            "-i", str(path), "-vn", "-ac", "1", "-ar", str(TARGET_SAMPLE_RATE),
+            "-f", "s16le", decoded.name,
+        ]
+        result = subprocess.run(command, capture_output=True)
+        if result.returncode != 0:
+            raise ValueError(f"ffmpeg could not decode {path.name}: {result.stderr.decode(errors='replace')[:200]}")
+        count = Path(decoded.name).stat().st_size // 2
+        frames = np.memmap(decoded.name, dtype="<i2", mode="r", shape=(count, 1)) if count else np.zeros((0, 1), "<i2")
+        yield frames, TARGET_SAMPLE_RATE
+
+
+def audio_duration(path: Union[str, Path]) -> Optional[float]:
+    """Duration in seconds from the WAV header or ffprobe; None if unknown"""
+    path = Path(path)
+    layout = _wav_layout(path)
+    if layout:
+        width = np.dtype(layout["dtype"]).itemsize
+        return layout["size"] / (width * layout["channels"] * layout["rate"])
+
+    if not shutil.which("ffprobe"):
+        return None
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(path)],
+        capture_output=True
+    )
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+
+def to_float_mono(frames: np.ndarray) -> np.ndarray:
+    """Convert a block of PCM frames to mono float32 in [-1, 1]"""
+    if frames.dtype == np.uint8:
+        data = (frames.astype(np.float32) - 128.0) / 128.0
+    elif frames.dtype.kind == "f":
+        data = frames.astype(np.float32)
+    else:
+        data = frames.astype(np.float32) / float(np.iinfo(frames.dtype).max + 1)
+    return data.mean(axis=1) if data.shape[1] > 1 else data[:, 0]
+
+
+def frame_energies(frames: np.ndarray, rate: int, frame_seconds: float = VAD_FRAME_SECONDS) -> np.ndarray:
+    """
+    Per-frame energy in dB for the whole recording
+
+    The memory map is reduced block by block, so only one block of samples
+    is resident at a time.
+    """
+    frame_len = max(1, int(rate * frame_seconds))
+    n_frames = len(frames) // frame_len
+    energies = np.empty(n_frames, dtype=np.float32)
+    block = frame_len * _ENERGY_BLOCK_FRAMES
+
+    for start in range(0, n_frames * frame_len, block):
+        samples = to_float_mono(frames[start:min(start + block, n_frames * frame_len)])
+        power = np.square(samples).reshape(-1, frame_len).mean(axis=1)
+        first = start // frame_len
+        energies[first:first + power.size] = 10.0 * np.log10(power + 1e-10)
+    return energies
+
+
+def find_silences(
+    energies: np.ndarray,
+    frame_seconds: float = VAD_FRAME_SECONDS,
+    min_silence_seconds: float = MIN_SILENCE_SECONDS,
+    margin_db: float = VAD_MARGIN_DB
+) -> List[Tuple[float, float]]:
+    """
+    Silent stretches from frame energies
+
+    The threshold adapts to the recording: its noise floor (10th percentile
+    frame energy) plus margin_db.
+
+    Returns:
+        List of (start_seconds, end_seconds)
+    """
+    if not energies.size:
+        return []
+    threshold = np.percentile(energies, 10) + margin_db
+    quiet = np.concatenate(([False], energies < threshold, [False]))
+    edges = np.flatnonzero(np.diff(quiet.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    keep = (ends - starts) * frame_seconds >= min_silence_seconds
+    return [(float(s * frame_seconds), float(e * frame_seconds)) for s, e in zip(starts[keep], ends[keep])]
+
+
+def plan_chunks(
+    duration: float,
+    silences: Sequence[Tuple[float, float]],
+    max_chunk_seconds: float = MAX_CHUNK_SECONDS,
+    min_chunk_seconds: float = MIN_CHUNK_SECONDS,
+    overlap_seconds: float = HARD_CUT_OVERLAP_SECONDS
+) -> List[Dict]:
+    """
+    Split a recording into bounded chunks, cutting in the middle of silences
+
+    Each chunk is cut at the latest silence between min and max chunk
+    length; without one, it is hard-cut at max length and its audio overlaps
+    the next chunk by overlap_seconds.
+
+    Returns:
+        List of {'start', 'end'} (audio to transcribe) and {'own_start',
+        'own_end'} (span whose words the chunk contributes), in seconds
+    """
+    midpoints = np.array([(s + e) / 2.0 for s, e in silences])
+    chunks = []
+    position = 0.0
+
+    while duration - position > max_chunk_seconds:
+        lo, hi = position + min_chunk_seconds, position + max_chunk_seconds
+        # Prefer cuts that leave the final chunk at least min_chunk_seconds long
+        hi_preferred = min(hi, duration - min_chunk_seconds)
+        if hi_preferred >= lo and midpoints.size and ((midpoints >= lo) & (midpoints <= hi_preferred)).any():
+            hi = hi_preferred
+        candidates = midpoints[(midpoints >= lo) & (midpoints <= hi)] if midpoints.size else midpoints
+        if candidates.size:
+            cut = float(candidates.max())
+            chunks.append({"start": position, "end": cut, "own_start": position, "own_end": cut})
+        else:
+            cut = hi
+            chunks.append({"start": position, "end": min(duration, cut + overlap_seconds),
+                           "own_start": position, "own_end": cut})
+        position = cut
+
+    # The last chunk owns everything to the end (word timings can run past the nominal duration)
+    chunks.append({"start": position, "end": duration, "own_start": position, "own_end": float("inf")})
+
+    # Chunks after a hard cut start overlap_seconds early so a word straddling the cut is heard whole
+    for previous, chunk in zip(chunks, chunks[1:]):
+        if previous["end"] > chunk["own_start"]:
+            chunk["start"] = max(0.0, chunk["own_start"] - overlap_seconds)
+    return chunks
+
+
+def chunk_wav(frames: np.ndarray, rate: int, chunk: Dict) -> bytes:
+    """Encode one chunk as a 16kHz mono 16-bit WAV"""
+    first, last = int(chunk["start"] * rate), int(chunk["end"] * rate)
+    samples = to_float_mono(frames[first:last])
+    target_rate = min(rate, TARGET_SAMPLE_RATE)
+    return encode_wav(resample(samples, rate, target_rate), target_rate)
+
+
+def stitch_words(chunk_words: Sequence[Tuple[Dict, List[Dict]]]) -> List[Dict]:
+    """
+    Merge per-chunk words onto the recording's timeline
+
+    Args:
+        chunk_words: (chunk, words) pairs; word 'start'/'end' are relative
+            to the chunk audio
+
+    Returns:
+        Words with absolute 'start'/'end', each taken from the chunk whose
+        own span contains the word's start, in time order. Diarization labels
+        are per request, so a 'speaker' becomes chunk index *
+        SPEAKERS_PER_SEGMENT + label
+    """
+    merged = []
+    for index, (chunk, words) in enumerate(chunk_words):
+        offset = chunk["start"]
+        for word in words:
+            start = word["start"] + offset
+            if not chunk["own_start"] <= start < chunk["own_end"]:
+                continue
+            stitched = {**word, "start": start, "end": word["end"] + offset}
+            if word.get("speaker") is not None:
+                stitched["speaker"] = index * SPEAKERS_PER_SEGMENT + word["speaker"]
+            merged.append(stitched)
+    merged.sort(key=lambda w: w["start"])
+    return merged
+
+
+def words_to_text(words: Sequence[Dict]) -> str:
+    """Transcript text from (punctuated) words"""
+    return " ".join(word.get("punctuated_word") or word["word"] for word in words)
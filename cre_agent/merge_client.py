@@ -2,7 +2,6 @@
 Merge CRM client for creating contacts, notes, and tasks
 """
 import logging
-import requests
 from typing import Optional, Dict
 from datetime import datetime, timedelta
 
@@ -57,6 +56,8 @@ class MergeClient:
             logger.info(f"Demo mode: Would create contact {name} ({email}) at {company}")
             return f"contact_demo_{hash(email or name or 'unknown') % 100000}"
 
+        import requests
+
         try:
             # First, search for existing contact by email
             if email:
@@ -121,6 +122,8 @@ class MergeClient:
             logger.info(f"Demo mode: Would create note for contact {contact_id}")
             return f"note_demo_{hash(contact_id) % 100000}"
 
+        import requests
+
         try:
             create_url = f"{self.base_url}/notes"
             payload = {
@@ -170,6 +173,8 @@ class MergeClient:
             logger.info(f"Demo mode: Would create task '{title}' for contact {contact_id}")
             return f"task_demo_{hash(contact_id + title) % 100000}"
 
+        import requests
+
         try:
             # Default due date: 3 days from now
             if not due_date:
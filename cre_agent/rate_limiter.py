@@ -0,0 +1,392 @@
+"""
+Client-side rate limiting for Bedrock and Deepgram calls - token bucket + AIMD concurrency + circuit breaker
+"""
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Error codes that mean "slow down" rather than "this request is bad"
+THROTTLE_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceQuotaExceededException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+}
+
+
+class ServiceDegradedError(Exception):
+    """Raised when a call is rejected because the service is throttling or the circuit is open"""
+
+
+# HTTP statuses (e.g. Deepgram ApiError.status_code) that are worth retrying
+THROTTLE_STATUS_CODES = {429, 502, 503, 504}
+
+# Transient transport failures (httpx, botocore) retried like throttling
+TRANSIENT_ERROR_NAMES = {
+    "ConnectError",
+    "ConnectTimeout",
+    "ReadTimeout",
+    "WriteTimeout",
+    "RemoteProtocolError",
+    "EndpointConnectionError",
+    "ConnectTimeoutError",
+    "ReadTimeoutError",
+}
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """Check whether an exception (botocore ClientError, HTTP API error) is a throttling or transient failure"""
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code") in THROTTLE_ERROR_CODES
+    if getattr(error, "status_code", None) in THROTTLE_STATUS_CODES:
+        return True
+    name = type(error).__name__
+    return name in THROTTLE_ERROR_CODES or name in TRANSIENT_ERROR_NAMES
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the sustained request rate"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Take one token, waiting for a refill if necessary
+
+        Returns:
+            True if a token was taken, False if the timeout expired first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit
+
+    The limit grows by roughly one slot per window of successful calls below
+    the latency target, and halves on throttling or slow responses (at most
+    once per cooldown so one burst of errors is a single decrease).
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        latency_target: float = 10.0,
+        backoff_ratio: float = 0.5,
+        cooldown: float = 1.0
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff_ratio = backoff_ratio
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self, latency: Optional[float] = None, throttled: bool = False) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            overloaded = throttled or (latency is not None and latency > self.latency_target)
+
+            if overloaded:
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+                    self._last_decrease = now
+            elif latency is not None:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures and lets one probe through after a reset timeout"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def release_probe(self) -> None:
+        """Hand back a half-open probe that never reached the service"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Circuit breaker opened after repeated failures")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+class RateLimiter:
+    """
+    Shared limiter wrapping remote calls with rate, concurrency, retry and circuit-breaker control
+    """
+
+    def __init__(
+        self,
+        rate: float = 5.0,
+        max_concurrency: int = 16,
+        max_retries: int = 4,
+        base_backoff: float = 0.5,
+        max_backoff: float = 20.0,
+        acquire_timeout: float = 60.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0
+    ):
+        self.bucket = TokenBucket(rate)
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            initial_limit=min(4, max_concurrency),
+            max_limit=max_concurrency
+        )
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.acquire_timeout = acquire_timeout
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "throttled": 0,
+            "retries": 0,
+            "rejected": 0,
+            "total_latency": 0.0,
+        }
+
+    def _count(self, **increments) -> None:
+        with self._stats_lock:
+            for key, value in increments.items():
+                self._stats[key] += value
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter keeps retrying clients from re-synchronizing
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """
+        Run fn under the limiter, retrying throttled attempts with jittered backoff
+
+        Raises:
+            ServiceDegradedError: circuit open, limiter saturated, or throttling persisted
+            Exception: non-throttling errors from fn are re-raised unchanged
+        """
+        self._count(calls=1)
+
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self._count(rejected=1)
+                raise ServiceDegradedError("Circuit breaker open - service degraded")
+
+            if not self.bucket.acquire(self.acquire_timeout) or not self.concurrency.acquire(self.acquire_timeout):
+                # Nothing was sent, so a half-open probe must not stay claimed
+                self.breaker.release_probe()
+                self._count(rejected=1)
+                raise ServiceDegradedError("Timed out waiting for rate limiter capacity")
+
+            start = time.monotonic()
+            error: Optional[Exception] = None
+            finished = False
+            try:
+                result = fn()
+                finished = True
+            except Exception as e:
+                error = e
+                finished = True
+            finally:
+                latency = time.monotonic() - start
+                throttled = error is not None and is_throttle_error(error)
+                # An interrupted call (KeyboardInterrupt, SystemExit) still gives back its slot and probe
+                self.concurrency.release(latency=latency if finished and not throttled else None, throttled=throttled)
+                if not finished:
+                    self.breaker.release_probe()
+
+            if error is not None:
+                if not throttled:
+                    # The service answered; the request itself was bad (validation, 4xx),
+                    # which says nothing about the service's health
+                    self.breaker.record_success()
+                    self._count(failures=1)
+                    raise error
+
+                self.breaker.record_failure()
+
+                self._count(throttled=1)
+                if attempt == self.max_retries:
+                    self._count(failures=1)
+                    raise ServiceDegradedError(f"Throttled after {attempt + 1} attempts: {error}") from error
+
+                self._count(retries=1)
+                delay = self._backoff(attempt)
+                logger.info(f"Throttled, retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            self._count(successes=1, total_latency=latency)
+            return result
+
+        raise ServiceDegradedError("Retries exhausted")
+
+    def configure(self, rate: Optional[float] = None, max_concurrency: Optional[int] = None) -> None:
+        """Change the sustained rate and/or the concurrency ceiling in place"""
+        if rate is not None and rate != self.bucket.rate:
+            with self.bucket._lock:
+                self.bucket._refill()
+                self.bucket.rate = rate
+                self.bucket.capacity = max(1.0, rate)
+                self.bucket._tokens = min(self.bucket._tokens, self.bucket.capacity)
+        if max_concurrency is not None and max_concurrency != self.concurrency.max_limit:
+            with self.concurrency._cond:
+                self.concurrency.max_limit = max_concurrency
+                self.concurrency.limit = min(self.concurrency.limit, float(max_concurrency))
+                self.concurrency._cond.notify_all()
+
+    @property
+    def status(self) -> str:
+        """'healthy' when the circuit is closed, otherwise 'degraded'"""
+        return "healthy" if self.breaker.state == CircuitBreaker.CLOSED else "degraded"
+
+    def stats(self) -> Dict:
+        """Snapshot of limiter counters and current limits"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+
+        total_latency = stats.pop("total_latency")
+        stats["avg_latency"] = round(total_latency / stats["successes"], 3) if stats["successes"] else None
+        stats.update({
+            "status": self.status,
+            "circuit_state": self.breaker.state,
+            "concurrency_limit": int(self.concurrency.limit),
+            "in_flight": self.concurrency.in_flight,
+            "rate_limit": self.bucket.rate,
+        })
+        return stats
+
+
+_bedrock_limiter: Optional[RateLimiter] = None
+_bedrock_limiter_lock = threading.Lock()
+
+
+def get_bedrock_limiter(rate: Optional[float] = None, max_concurrency: Optional[int] = None) -> RateLimiter:
+    """
+    Get the process-wide Bedrock limiter (created on first use)
+
+    All BedrockClient instances share it so the account quota is budgeted once per process.
+
+    Args:
+        rate: Requests per second (default: BEDROCK_MAX_RPS from settings)
+        max_concurrency: Concurrent requests ceiling (default: BEDROCK_MAX_CONCURRENCY)
+
+    Explicit limits that differ from the existing limiter's reconfigure it,
+    so a caller asking for stats first cannot pin the defaults.
+    """
+    global _bedrock_limiter
+    with _bedrock_limiter_lock:
+        if _bedrock_limiter is None:
+            if rate is None or max_concurrency is None:
+                from .config import load_settings
+                settings = load_settings()
+                rate = settings.bedrock_max_rps if rate is None else rate
+                max_concurrency = settings.bedrock_max_concurrency if max_concurrency is None else max_concurrency
+            _bedrock_limiter = RateLimiter(rate=rate, max_concurrency=max_concurrency)
+        else:
+            _bedrock_limiter.configure(rate, max_concurrency)
+        return _bedrock_limiter
+
+
+_deepgram_limiter: Optional[RateLimiter] = None
+_deepgram_limiter_lock = threading.Lock()
+
+
+def get_deepgram_limiter(rate: float = 10.0, max_concurrency: int = 16) -> RateLimiter:
+    """
+    Get the process-wide Deepgram limiter (created on first use)
+
+    Batch transcriptions share it so concurrent uploads stay within the account's limits.
+    """
+    global _deepgram_limiter
+    with _deepgram_limiter_lock:
+        if _deepgram_limiter is None:
+            _deepgram_limiter = RateLimiter(rate=rate, max_concurrency=max_concurrency)
+        return _deepgram_limiter
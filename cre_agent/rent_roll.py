@@ -0,0 +1,169 @@
+"""
+Vectorized rent-roll analytics - occupancy, loss-to-lease, expiration ladder and WALT
+"""
+from array import array
+from datetime import date, datetime
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from .file_ingest import is_occupied, parse_number
+
+# Lease expiration ladder buckets in months remaining; last bucket is open-ended
+LADDER_EDGES_MONTHS = [0, 12, 24, 36, 48, 60]
+LADDER_LABELS = ["Expired/MTM", "0-12 mo", "12-24 mo", "24-36 mo", "36-48 mo", "48-60 mo", "60+ mo"]
+
+_EPOCH = date(1970, 1, 1)
+_NO_DATE = np.iinfo(np.int64).min
+
+
+def parse_date_value(value) -> Optional[date]:
+    """Parse a lease date cell (datetime, ISO or US formatted string)"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for fmt in ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(str(value).strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def unit_arrays_from_rows(rows: Iterable[Dict]) -> Dict[str, np.ndarray]:
+    """
+    Convert streamed rent-roll rows into compact column arrays
+
+    Cell parsing is inherently per row; values go straight into typed
+    buffers, so no row dictionaries are retained.
+
+    Args:
+        rows: Normalized rows (e.g. from file_ingest.iter_rent_roll_rows)
+
+    Returns:
+        Dictionary of equal-length arrays: occupied (bool), rent, market_rent,
+        square_feet (float, NaN when missing) and lease_end (datetime64[D], NaT when missing)
+    """
+    occupied = array("b")
+    rent = array("d")
+    market_rent = array("d")
+    square_feet = array("d")
+    lease_end = array("q")
+    nan = float("nan")
+
+    for row in rows:
+        occupied.append(1 if is_occupied(row) else 0)
+
+        value = parse_number(row.get("rent"))
+        rent.append(value if value is not None else nan)
+        value = parse_number(row.get("market_rent"))
+        market_rent.append(value if value is not None else nan)
+        value = parse_number(row.get("square_feet"))
+        square_feet.append(value if value is not None else nan)
+
+        end = parse_date_value(row.get("lease_end"))
+        lease_end.append((end - _EPOCH).days if end else _NO_DATE)
+
+    lease_end_days = np.frombuffer(lease_end, dtype=np.int64) if len(lease_end) else np.empty(0, dtype=np.int64)
+    lease_end_dates = lease_end_days.astype("datetime64[D]")
+    lease_end_dates[lease_end_days == _NO_DATE] = np.datetime64("NaT")
+
+    return {
+        "occupied": np.frombuffer(occupied, dtype=np.int8).astype(bool) if len(occupied) else np.empty(0, dtype=bool),
+        "rent": np.frombuffer(rent, dtype=np.float64) if len(rent) else np.empty(0),
+        "market_rent": np.frombuffer(market_rent, dtype=np.float64) if len(market_rent) else np.empty(0),
+        "square_feet": np.frombuffer(square_feet, dtype=np.float64) if len(square_feet) else np.empty(0),
+        "lease_end": lease_end_dates,
+    }
+
+
+def _nan_mean(values: np.ndarray) -> Optional[float]:
+    valid = values[~np.isnan(values)]
+    return float(valid.mean()) if valid.size else None
+
+
+def analyze_rent_roll(units: Dict[str, np.ndarray], as_of: Optional[date] = None) -> Dict:
+    """
+    Compute rent-roll analytics with column operations over unit arrays
+
+    Args:
+        units: Column arrays from unit_arrays_from_rows
+        as_of: Analysis date for lease terms (default: today)
+
+    Returns:
+        Dictionary with:
+            - units, occupied_units, occupancy (physical)
+            - economic_occupancy: in-place rent / market rent over all units
+            - avg_in_place_rent, avg_market_rent (monthly, per unit)
+            - monthly_in_place_rent, annual_in_place_rent
+            - loss_to_lease (annual dollars) and loss_to_lease_pct
+            - walt_years: rent-weighted average remaining lease term
+            - expiration_ladder: list of {bucket, units, annual_rent}
+            - square_feet
+    """
+    as_of = as_of or date.today()
+    occupied = units["occupied"]
+    rent = units["rent"]
+    market = units["market_rent"]
+    total_units = int(occupied.size)
+
+    if total_units == 0:
+        return {
+            "units": 0, "occupied_units": 0, "occupancy": None, "economic_occupancy": None,
+            "avg_in_place_rent": None, "avg_market_rent": None,
+            "monthly_in_place_rent": 0.0, "annual_in_place_rent": 0.0,
+            "loss_to_lease": 0.0, "loss_to_lease_pct": None, "walt_years": None,
+            "expiration_ladder": [], "square_feet": None,
+        }
+
+    occupied_count = int(occupied.sum())
+    in_place = np.where(occupied & ~np.isnan(rent), rent, 0.0)
+    monthly_in_place = float(in_place.sum())
+
+    # Loss-to-lease: market minus in-place rent over occupied units with both figures
+    comparable = occupied & ~np.isnan(rent) & ~np.isnan(market)
+    market_comparable = float(market[comparable].sum())
+    monthly_loss = float((market[comparable] - rent[comparable]).sum())
+
+    market_total = float(np.nansum(market))
+    has_market = bool((~np.isnan(market)).any())
+
+    # Remaining lease term in months for occupied units with a lease end date
+    months_remaining = (units["lease_end"] - np.datetime64(as_of, "D")).astype("timedelta64[D]").astype(np.float64) / 30.4375
+    has_end = occupied & ~np.isnat(units["lease_end"])
+    term = np.where(has_end, np.clip(months_remaining, 0.0, None), np.nan)
+
+    walt_weights = np.where(has_end, in_place, 0.0)
+    walt_years = (
+        float(np.nansum(term * walt_weights) / walt_weights.sum() / 12.0)
+        if walt_weights.sum() > 0 else None
+    )
+
+    # Expired / month-to-month units land in bucket 0, everything else by months remaining
+    bucket = np.digitize(np.where(has_end, months_remaining, -1.0), LADDER_EDGES_MONTHS)
+    ladder_units = np.bincount(bucket[has_end], minlength=len(LADDER_LABELS))
+    ladder_rent = np.bincount(bucket[has_end], weights=in_place[has_end], minlength=len(LADDER_LABELS))
+
+    square_feet = float(np.nansum(units["square_feet"]))
+
+    return {
+        "units": total_units,
+        "occupied_units": occupied_count,
+        "occupancy": occupied_count / total_units,
+        "economic_occupancy": monthly_in_place / market_total if has_market and market_total else None,
+        "avg_in_place_rent": _nan_mean(np.where(occupied, rent, np.nan)),
+        "avg_market_rent": _nan_mean(market),
+        "monthly_in_place_rent": monthly_in_place,
+        "annual_in_place_rent": monthly_in_place * 12,
+        "loss_to_lease": monthly_loss * 12,
+        "loss_to_lease_pct": monthly_loss / market_comparable if market_comparable else None,
+        "walt_years": walt_years,
+        "expiration_ladder": [
+            {"bucket": label, "units": int(count), "annual_rent": float(total) * 12}
+            for label, count, total in zip(LADDER_LABELS, ladder_units, ladder_rent)
+        ],
+        "square_feet": int(square_feet) if square_feet else None,
+    }
@@ -0,0 +1,454 @@
+"""
+Run index - SQLite index of run summaries for filtered, sorted, paginated queries
+
+Summary records in RUNS_DIR stay the source of truth; the index mirrors their
+fixed-schema fields (plus the score metrics the buy-box sweep needs) in
+runs/index.sqlite, so history pages, top-deal rankings and the daily summary
+are index range scans instead of reads of every run file.
+
+Pages use keyset pagination: the cursor encodes the sort key of the last row
+returned, so page 1,000 costs the same as page 1. Missing sort values are
+stored as sentinels ('' for timestamps, -1 for numbers) to keep every sort
+key a plain, totally ordered tuple - they sort last when descending.
+"""
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .geo import market_of
+from .storage import _parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "index.sqlite"
+
+# Sort name -> key columns; ties fall back to the most recent run, then run_id
+SORT_KEYS = {
+    "timestamp": ("timestamp", "run_id"),
+    "score": ("score", "timestamp", "run_id"),
+    "price": ("price", "timestamp", "run_id"),
+    "cap_rate": ("cap_rate", "timestamp", "run_id"),
+}
+
+MISSING_NUMBER = -1
+
+_COLUMNS = (
+    "run_id", "timestamp", "property_type", "city", "state", "market", "verdict",
+    "score", "price", "cap_rate", "mtime_ns", "summary", "metrics",
+)
+
+
+def encode_cursor(key: Tuple) -> str:
+    """Opaque, URL-safe page cursor for a sort key"""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    if not isinstance(key, list):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    return key
+
+
+def _number(value) -> float:
+    return MISSING_NUMBER if value is None else float(value)
+
+
+def _as_list(value) -> Optional[List[str]]:
+    if value is None:
+        return None
+    return [value] if isinstance(value, str) else [str(v) for v in value]
+
+
+def _where(filters: Optional[Dict]) -> Tuple[List[str], List[Any]]:
+    """
+    SQL conditions for run filters
+
+    Supported filters (all optional; text matches are case-insensitive):
+        market: market or list of markets; a run's market is its city's MSA
+            market ("Plano" is in "Dallas"), or the city itself
+        city, property_type, verdict: value or list of values
+        min_score / max_score, min_price / max_price: inclusive bounds
+            (runs without the value never match)
+        since / until: datetime, date or ISO string (inclusive; a bare date
+            for until covers the whole day)
+    """
+    filters = filters or {}
+    clauses: List[str] = []
+    params: List[Any] = []
+
+    for column, value in (
+        ("market", filters.get("market")),
+        ("city", filters.get("city")),
+        ("property_type", filters.get("property_type")),
+        ("verdict", filters.get("verdict")),
+    ):
+        values = _as_list(value)
+        if values is not None:
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+
+    for column, low, high in (
+        ("score", filters.get("min_score"), filters.get("max_score")),
+        ("price", filters.get("min_price"), filters.get("max_price")),
+    ):
+        if low is not None or high is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(max(float(low), 0.0) if low is not None else 0.0)
+        if high is not None:
+            clauses.append(f"{column} <= ?")
+            params.append(float(high))
+
+    since = _parse_timestamp(filters.get("since"))
+    until = filters.get("until")
+    if isinstance(until, datetime):
+        until_is_day = False
+    else:
+        until_is_day = isinstance(until, date) or (isinstance(until, str) and len(until) == 10)
+    until = _parse_timestamp(until)
+    if since is not None or until is not None:
+        clauses.append("timestamp != ''")
+    if since is not None:
+        clauses.append("timestamp >= ?")
+        params.append(since.isoformat())
+    if until is not None:
+        if until_is_day:
+            # Everything before the start of the next day
+            clauses.append("timestamp < ?")
+            params.append((datetime(until.year, until.month, until.day) + timedelta(days=1)).isoformat())
+        else:
+            clauses.append("timestamp <= ?")
+            params.append(until.isoformat())
+
+    return clauses, params
+
+
+def _market(city: Optional[str], state: Optional[str]) -> Optional[str]:
+    return market_of(city, state) or city
+
+
+def _row(summary: Dict, metrics: Optional[Dict], mtime_ns: int) -> Tuple:
+    timestamp = _parse_timestamp(summary.get("timestamp"))
+    return (
+        summary["run_id"],
+        timestamp.isoformat() if timestamp else "",
+        summary.get("property_type"),
+        summary.get("city"),
+        summary.get("state"),
+        _market(summary.get("city"), summary.get("state")),
+        summary.get("verdict"),
+        _number(summary.get("score")),
+        _number(summary.get("price")),
+        _number(summary.get("cap_rate")),
+        mtime_ns,
+        json.dumps(summary, default=str),
+        json.dumps(metrics, default=str) if metrics is not None else None,
+    )
+
+
+class RunIndex:
+    """SQLite-backed index of run summary records"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                timestamp TEXT NOT NULL,
+                property_type TEXT COLLATE NOCASE,
+                city TEXT COLLATE NOCASE,
+                state TEXT,
+                market TEXT COLLATE NOCASE,
+                verdict TEXT COLLATE NOCASE,
+                score REAL NOT NULL,
+                price REAL NOT NULL,
+                cap_rate REAL NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                summary TEXT NOT NULL,
+                metrics TEXT
+            );
+            CREATE INDEX IF NOT EXISTS runs_by_timestamp ON runs (timestamp, run_id);
+            CREATE INDEX IF NOT EXISTS runs_by_score ON runs (score, timestamp, run_id);
+            CREATE INDEX IF NOT EXISTS runs_by_price ON runs (price, timestamp, run_id);
+            CREATE INDEX IF NOT EXISTS runs_by_cap_rate ON runs (cap_rate, timestamp, run_id);
+            CREATE INDEX IF NOT EXISTS runs_by_city ON runs (city, timestamp);
+            CREATE INDEX IF NOT EXISTS runs_by_verdict ON runs (verdict, timestamp);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        self._add_market_column()
+        self._conn.execute("CREATE INDEX IF NOT EXISTS runs_by_market ON runs (market, timestamp)")
+
+    def _add_market_column(self) -> None:
+        """Add and fill the market column in an index created before it existed"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(runs)")}
+        if "market" in columns:
+            return
+        with self._conn:
+            self._conn.execute("ALTER TABLE runs ADD COLUMN market TEXT COLLATE NOCASE")
+            rows = self._conn.execute("SELECT run_id, city, state FROM runs").fetchall()
+            self._conn.executemany(
+                "UPDATE runs SET market = ? WHERE run_id = ?",
+                [(_market(city, state), run_id) for run_id, city, state in rows]
+            )
+        logger.info(f"Added market column to run index ({len(rows)} runs)")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    @property
+    def synced_at(self) -> Optional[str]:
+        """When the index was last rebuilt from the run files (None: never)"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'synced_at'").fetchone()
+        return row[0] if row else None
+
+    def _upsert_many(self, rows: List[Tuple]) -> None:
+        updates = ", ".join(
+            f"{column} = excluded.{column}" for column in _COLUMNS if column not in ("run_id", "metrics")
+        )
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO runs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))}) "
+                f"ON CONFLICT (run_id) DO UPDATE SET {updates}, "
+                f"metrics = COALESCE(excluded.metrics, runs.metrics)",
+                rows
+            )
+
+    def upsert(self, summary: Dict, metrics: Optional[Dict] = None, mtime_ns: int = 0) -> None:
+        """
+        Index (or re-index) a run's summary record
+
+        Args:
+            summary: Hot summary record (see storage.build_run_summary)
+            metrics: Score metrics for the buy-box sweep (kept if None)
+            mtime_ns: Modification time of the summary file, for sync()
+        """
+        self._upsert_many([_row(summary, metrics, mtime_ns)])
+
+    def remove(self, run_id: str) -> None:
+        """Drop a run from the index"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+
+    def page(
+        self,
+        filters: Optional[Dict] = None,
+        sort: str = "timestamp",
+        descending: bool = True,
+        limit: int = 25,
+        cursor: Optional[str] = None
+    ) -> Dict:
+        """
+        One page of run summaries
+
+        Args:
+            filters: See _where
+            sort: Sort key, one of SORT_KEYS
+            descending: Largest / newest first
+            limit: Page size
+            cursor: next_cursor of the previous page (None for the first page)
+
+        Returns:
+            {"runs": summary records, "next_cursor": cursor of the next page,
+            or None on the last page}
+
+        Raises:
+            ValueError: Unknown sort or invalid cursor
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Cannot sort by '{sort}'; choose one of {', '.join(SORT_KEYS)}")
+        key_columns = SORT_KEYS[sort]
+        clauses, params = _where(filters)
+
+        if cursor is not None:
+            key = decode_cursor(cursor)
+            if len(key) != len(key_columns):
+                raise ValueError(f"Cursor does not match sort '{sort}'")
+            # Row-value comparison seeks straight to the position in the sort index
+            clauses.append(
+                f"({', '.join(key_columns)}) {'<' if descending else '>'} ({', '.join('?' * len(key))})"
+            )
+            params.extend(key)
+
+        direction = "DESC" if descending else "ASC"
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = (
+            f"SELECT {', '.join(key_columns)}, summary FROM runs {where} "
+            f"ORDER BY {', '.join(f'{column} {direction}' for column in key_columns)} LIMIT ?"
+        )
+        with self._lock:
+            rows = self._conn.execute(query, [*params, limit + 1]).fetchall()
+
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            "runs": [json.loads(row[-1]) for row in rows],
+            "next_cursor": encode_cursor(rows[-1][:-1]) if more and rows else None,
+        }
+
+    def count(self, filters: Optional[Dict] = None) -> int:
+        """Number of runs matching filters"""
+        clauses, params = _where(filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM runs {where}", params).fetchone()[0]
+
+    def stats(self, filters: Optional[Dict] = None) -> Dict:
+        """
+        Aggregates over matching runs
+
+        Returns:
+            {"deal_count", "scored", "avg_score" (None if nothing is scored),
+            "verdicts": {verdict: count}}
+        """
+        clauses, params = _where(filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            deal_count, scored, avg_score = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(score >= 0), 0), AVG(CASE WHEN score >= 0 THEN score END) "
+                f"FROM runs {where}", params
+            ).fetchone()
+            verdicts = dict(self._conn.execute(
+                f"SELECT verdict, COUNT(*) FROM runs {where} GROUP BY verdict", params
+            ).fetchall())
+        verdicts.pop(None, None)
+        return {"deal_count": deal_count, "scored": scored, "avg_score": avg_score, "verdicts": verdicts}
+
+    def scoring_inputs(self, filters: Optional[Dict] = None) -> List[Dict]:
+        """
+        Stored deals in the shape scoring.deal_features reads, without loading payloads
+
+        Returns:
+            [{"run_id", "structured_deal": {"location", "property_type"},
+            "score_data": {"metrics"}}] for runs with an extracted deal
+        """
+        clauses, params = _where(filters)
+        clauses.append("metrics IS NOT NULL")
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT run_id, city, state, property_type, metrics FROM runs WHERE {' AND '.join(clauses)}",
+                params
+            ).fetchall()
+        return [
+            {
+                "run_id": run_id,
+                "structured_deal": {"location": {"city": city, "state": state}, "property_type": property_type},
+                "score_data": {"metrics": json.loads(metrics)},
+            }
+            for run_id, city, state, property_type, metrics in rows
+        ]
+
+    def sync(self, full: bool = False) -> Dict:
+        """
+        Bring the index up to date with the summary files in RUNS_DIR
+
+        Files whose mtime matches the index are skipped unless full is set;
+        runs whose file is gone are dropped.
+
+        Returns:
+            {"indexed": files (re)read, "removed": runs dropped, "total": runs indexed}
+        """
+        from .storage import RUNS_DIR, _read_summary_file, load_run, load_run_blob
+
+        with self._lock:
+            known = dict(self._conn.execute("SELECT run_id, mtime_ns FROM runs"))
+
+        seen = set()
+        batch: List[Tuple] = []
+        indexed = 0
+        if RUNS_DIR.exists():
+            with os.scandir(RUNS_DIR) as entries:
+                for entry in entries:
+                    if not entry.is_file() or not entry.name.endswith(".json"):
+                        continue
+                    run_id = entry.name[:-len(".json")]
+                    seen.add(run_id)
+                    mtime_ns = entry.stat().st_mtime_ns
+                    if not full and known.get(run_id) == mtime_ns:
+                        continue
+                    try:
+                        summary = _read_summary_file(Path(entry.path))
+                        if summary.get("legacy"):
+                            payload = load_run(run_id) or {}
+                            score_data = payload.get("score_data") if payload.get("structured_deal") else None
+                        elif "structured_deal" in summary.get("blobs", {}):
+                            score_data = load_run_blob(summary, "score_data")
+                        else:
+                            score_data = None
+                    except Exception as e:
+                        logger.warning(f"Failed to index {entry.path}: {e}")
+                        continue
+                    summary["run_id"] = run_id
+                    metrics = (score_data or {}).get("metrics")
+                    batch.append(_row(summary, metrics, mtime_ns))
+                    if len(batch) >= 500:
+                        self._upsert_many(batch)
+                        indexed += len(batch)
+                        batch = []
+        if batch:
+            self._upsert_many(batch)
+            indexed += len(batch)
+
+        removed = [run_id for run_id in known if run_id not in seen]
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM runs WHERE run_id = ?", [(run_id,) for run_id in removed])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('synced_at', ?)", (datetime.now().isoformat(),)
+            )
+
+        total = len(self)
+        logger.info(f"Run index synced: {indexed} indexed, {len(removed)} removed, {total} total")
+        return {"indexed": indexed, "removed": len(removed), "total": total}
+
+
+_indexes: Dict[Path, RunIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_run_index(path: Optional[Union[str, Path]] = None) -> RunIndex:
+    """
+    Get the process-wide run index (default: runs/index.sqlite)
+
+    A new index is filled from the existing run files on first use; after
+    that storage keeps it current as runs are written.
+
+    Args:
+        path: Index file path
+
+    Returns:
+        Shared RunIndex for that path
+    """
+    if path is None:
+        from .storage import RUNS_DIR
+        path = RUNS_DIR / INDEX_FILENAME
+
+    path = Path(path).resolve()
+    with _indexes_lock:
+        if path not in _indexes:
+            index = RunIndex(path)
+            if index.synced_at is None:
+                index.sync()
+            _indexes[path] = index
+        return _indexes[path]
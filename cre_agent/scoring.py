@@ -1,7 +1,27 @@
 """
 CRE deal scoring and buy-box evaluation
 """
-from typing import Dict, List, Optional
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .simulation import simulate_deal
+from .text_matcher import resolve_market
+from .underwriting import DEFAULT_ASSUMPTIONS, underwrite_deal
+
+
+@lru_cache(maxsize=256)
+def _preferred_market_set(preferred_markets: Tuple[str, ...]) -> FrozenSet[str]:
+    return frozenset(resolve_market(market) or market for market in preferred_markets)
+
+
+def _in_preferred_market(city: str, preferred_markets: Sequence[str], state: Optional[str] = None) -> bool:
+    """Exact list match, else compare markets via the gazetteer (Plano -> Dallas, Brickell -> Miami)"""
+    if city in preferred_markets:
+        return True
+    market = resolve_market(city, state)
+    return market is not None and market in _preferred_market_set(tuple(preferred_markets))
 
 
 def score_deal(struct: Dict, buybox: Dict) -> Dict:
@@ -14,10 +34,18 @@ def score_deal(struct: Dict, buybox: Dict) -> Dict:
             - min_cap_rate: float
             - max_cap_rate: float (optional)
             - max_ltv: float (as decimal, e.g., 0.75 for 75%)
-            - preferred_markets: list of city names
+            - preferred_markets: list of city names (suburbs and submarkets count toward their market)
             - min_deal_size: float (dollars)
             - max_deal_size: float (dollars)
             - preferred_property_types: list of property types (optional)
+            - min_occupancy: float (as decimal, optional)
+            - min_dscr: float (optional, e.g., 1.25)
+            - min_debt_yield: float (as decimal, optional)
+            - min_levered_irr: float (as decimal, optional)
+            - underwriting: dict of underwriting assumption overrides (optional)
+            - simulation_paths: int, run a Monte Carlo risk simulation (optional)
+            - simulation_seed: int (optional, default 0)
+            - max_probability_of_loss: float (as decimal, optional; needs simulation_paths)
 
     Returns:
         Dictionary with:
@@ -25,6 +53,7 @@ def score_deal(struct: Dict, buybox: Dict) -> Dict:
             - verdict: str ("Pass", "Watch", "Hard Pass")
             - reasons: list of str
             - metrics: dict with computed metrics
+            - simulation: Monte Carlo risk summary (only when simulation_paths is set)
     """
     score = 100
     reasons = []
@@ -36,10 +65,17 @@ def score_deal(struct: Dict, buybox: Dict) -> Dict:
     cap_rate = struct.get("cap_rate")
     location = struct.get("location", {})
     city = location.get("city") if isinstance(location, dict) else None
+    state = location.get("state") if isinstance(location, dict) else None
     property_type = struct.get("property_type")
     units = struct.get("units")
     square_feet = struct.get("square_feet")
 
+    # Rent-roll analytics, when available, replace the occupancy quoted in the text
+    rent_roll = struct.get("rent_roll") or {}
+    occupancy = rent_roll.get("occupancy")
+    if occupancy is None:
+        occupancy = struct.get("occupancy")
+
     # Compute derived metrics
     if purchase_price and noi and not cap_rate:
         cap_rate = (noi / purchase_price) * 100
@@ -54,6 +90,12 @@ def score_deal(struct: Dict, buybox: Dict) -> Dict:
     metrics["cap_rate"] = cap_rate
     metrics["deal_size"] = purchase_price
 
+    if occupancy is not None:
+        metrics["occupancy"] = occupancy
+    for key in ("economic_occupancy", "loss_to_lease", "loss_to_lease_pct", "walt_years"):
+        if rent_roll.get(key) is not None:
+            metrics[key] = rent_roll[key]
+
     # Buy-box evaluation
     min_cap = buybox.get("min_cap_rate", 0)
     max_cap = buybox.get("max_cap_rate", 100)
@@ -62,6 +104,7 @@ def score_deal(struct: Dict, buybox: Dict) -> Dict:
     min_size = buybox.get("min_deal_size", 0)
     max_size = buybox.get("max_deal_size", float('inf'))
     preferred_types = buybox.get("preferred_property_types", [])
+    min_occupancy = buybox.get("min_occupancy")
 
     # 1. Cap Rate Check
     if cap_rate:
@@ -97,12 +140,14 @@ def score_deal(struct: Dict, buybox: Dict) -> Dict:
 
     # 3. Market Check
     if preferred_markets and city:
-        if city not in preferred_markets:
+        if not _in_preferred_market(city, preferred_markets, state):
             penalty = 15
             score -= penalty
             reasons.append(f"Market {city} not in preferred list (−{penalty} pts)")
-        else:
+        elif city in preferred_markets:
             reasons.append(f"✓ Market {city} is preferred")
+        else:
+            reasons.append(f"✓ Market {city} ({resolve_market(city, state)}) is preferred")
     elif preferred_markets and not city:
         score -= 10
         reasons.append("Missing location data (−10 pts)")
@@ -117,10 +162,15 @@ def score_deal(struct: Dict, buybox: Dict) -> Dict:
             reasons.append(f"✓ Property type {property_type} is preferred")
 
     # 5. LTV Check (if we can compute it)
-    # For simplicity, assume 75% of purchase price is debt if NOI exists
+    # Leverage comes from the underwriting assumptions (75% LTV unless overridden)
+    underwriting = underwrite_deal(struct, buybox.get("underwriting")) if noi else None
+    if underwriting:
+        for key in ("levered_irr", "unlevered_irr", "equity_multiple", "dscr", "debt_yield",
+                    "loan_amount", "annual_debt_service", "exit_cap_rate"):
+            metrics[key] = underwriting[key]
+
     if noi and purchase_price:
-        assumed_debt = purchase_price * 0.75
-        ltv = assumed_debt / purchase_price
+        ltv = underwriting["ltv"] if underwriting else DEFAULT_ASSUMPTIONS["ltv"]
         metrics["assumed_ltv"] = ltv
 
         if ltv > max_ltv:
@@ -131,6 +181,77 @@ def score_deal(struct: Dict, buybox: Dict) -> Dict:
         else:
             metrics["ltv_flag"] = False
 
+    # 6. Occupancy Check (only when the buy-box sets a floor)
+    if min_occupancy is not None and occupancy is not None:
+        if occupancy < min_occupancy:
+            penalty = min(15, (min_occupancy - occupancy) * 100)
+            score -= penalty
+            reasons.append(f"Occupancy {occupancy:.1%} below minimum {min_occupancy:.1%} (−{penalty:.0f} pts)")
+        else:
+            reasons.append(f"✓ Occupancy {occupancy:.1%} meets minimum")
+
+    # 7. Debt and return checks (only when the buy-box sets a threshold)
+    if underwriting:
+        min_dscr = buybox.get("min_dscr")
+        dscr = underwriting["dscr"]
+        if min_dscr is not None and dscr is not None:
+            if dscr < min_dscr:
+                penalty = min(15, (min_dscr - dscr) * 50)
+                score -= penalty
+                reasons.append(f"DSCR {dscr:.2f}x below minimum {min_dscr:.2f}x (−{penalty:.0f} pts)")
+            else:
+                reasons.append(f"✓ DSCR {dscr:.2f}x meets minimum")
+
+        min_debt_yield = buybox.get("min_debt_yield")
+        debt_yield = underwriting["debt_yield"]
+        if min_debt_yield is not None and debt_yield is not None:
+            if debt_yield < min_debt_yield:
+                penalty = min(10, (min_debt_yield - debt_yield) * 500)
+                score -= penalty
+                reasons.append(f"Debt yield {debt_yield:.1%} below minimum {min_debt_yield:.1%} (−{penalty:.0f} pts)")
+            else:
+                reasons.append(f"✓ Debt yield {debt_yield:.1%} meets minimum")
+
+        min_irr = buybox.get("min_levered_irr")
+        levered_irr = underwriting["levered_irr"]
+        if min_irr is not None:
+            if levered_irr is None or levered_irr < min_irr:
+                penalty = 15 if levered_irr is None else min(15, (min_irr - levered_irr) * 300)
+                score -= penalty
+                irr_text = f"{levered_irr:.1%}" if levered_irr is not None else "N/A"
+                reasons.append(f"Levered IRR {irr_text} below target {min_irr:.1%} (−{penalty:.0f} pts)")
+            else:
+                reasons.append(f"✓ Levered IRR {levered_irr:.1%} meets target")
+
+    # 8. Monte Carlo risk (only when the buy-box asks for a simulation)
+    simulation = None
+    if underwriting and buybox.get("simulation_paths"):
+        simulation = simulate_deal(
+            struct,
+            n_paths=int(buybox["simulation_paths"]),
+            seed=buybox.get("simulation_seed", 0),
+            assumptions=buybox.get("underwriting"),
+            target_irr=buybox.get("min_levered_irr")
+        )
+
+    if simulation:
+        metrics["probability_of_loss"] = simulation["probability_of_loss"]
+        metrics["irr_p5"] = simulation["irr"]["p5"]
+        metrics["irr_p50"] = simulation["irr"]["p50"]
+        metrics["irr_p95"] = simulation["irr"]["p95"]
+
+        max_loss = buybox.get("max_probability_of_loss")
+        probability_of_loss = simulation["probability_of_loss"]
+        if max_loss is not None:
+            if probability_of_loss > max_loss:
+                penalty = min(20, (probability_of_loss - max_loss) * 100)
+                score -= penalty
+                reasons.append(
+                    f"Probability of loss {probability_of_loss:.1%} exceeds max {max_loss:.1%} (−{penalty:.0f} pts)"
+                )
+            else:
+                reasons.append(f"✓ Probability of loss {probability_of_loss:.1%} within tolerance")
+
     # Ensure score stays in bounds
     score = max(0, min(100, score))
 
@@ -142,12 +263,15 @@ def score_deal(struct: Dict, buybox: Dict) -> Dict:
     else:
         verdict = "Hard Pass"
 
-    return {
+    result = {
         "score": int(score),
         "verdict": verdict,
         "reasons": reasons,
         "metrics": metrics
     }
+    if simulation:
+        result["simulation"] = simulation
+    return result
 
 
 def get_default_buybox() -> Dict:
@@ -166,3 +290,209 @@ def get_default_buybox() -> Dict:
         "max_deal_size": 50_000_000,
         "preferred_property_types": ["multifamily", "industrial"]
     }
+
+
+# Buy-box parameters sweep_buybox can vary; each is a numeric threshold of one scoring rule
+SWEEPABLE_PARAMS = (
+    "min_cap_rate", "max_cap_rate", "max_ltv", "min_deal_size", "max_deal_size",
+    "min_occupancy", "min_dscr", "min_debt_yield", "min_levered_irr", "max_probability_of_loss",
+)
+
+
+def _nan(value) -> float:
+    return np.nan if value is None else float(value)
+
+
+def deal_features(deals: List[Dict], buybox: Dict) -> Dict[str, np.ndarray]:
+    """
+    Collect the scoring inputs of a deal set into column arrays
+
+    Args:
+        deals: Run payloads (with 'structured_deal' and 'score_data') or structured deals
+        buybox: Buy-box used to score deals that have no stored metrics
+
+    Returns:
+        Dictionary of per-deal arrays (NaN where a value is missing) plus
+        'run_id', 'city', 'state' and 'property_type' lists
+    """
+    # Metrics that depend on the buy-box thresholds are not needed, only the inputs
+    feature_buybox = {key: value for key, value in buybox.items() if key != "simulation_paths"}
+
+    columns: Dict[str, List] = {
+        "cap_rate": [], "deal_size": [], "ltv": [], "occupancy": [], "dscr": [],
+        "debt_yield": [], "levered_irr": [], "probability_of_loss": [], "has_underwriting": [],
+    }
+    run_ids, cities, states, property_types = [], [], [], []
+
+    for deal in deals:
+        struct = deal.get("structured_deal", deal)
+        metrics = (deal.get("score_data") or {}).get("metrics")
+        if metrics is None:
+            metrics = score_deal(struct, feature_buybox)["metrics"]
+
+        location = struct.get("location") or {}
+        run_ids.append(deal.get("run_id"))
+        cities.append(location.get("city") if isinstance(location, dict) else None)
+        states.append(location.get("state") if isinstance(location, dict) else None)
+        property_types.append(struct.get("property_type"))
+
+        columns["cap_rate"].append(_nan(metrics.get("cap_rate")))
+        columns["deal_size"].append(_nan(metrics.get("deal_size")))
+        columns["ltv"].append(_nan(metrics.get("assumed_ltv")))
+        columns["occupancy"].append(_nan(metrics.get("occupancy")))
+        columns["dscr"].append(_nan(metrics.get("dscr")))
+        columns["debt_yield"].append(_nan(metrics.get("debt_yield")))
+        columns["levered_irr"].append(_nan(metrics.get("levered_irr")))
+        columns["probability_of_loss"].append(_nan(metrics.get("probability_of_loss")))
+        columns["has_underwriting"].append(metrics.get("annual_debt_service") is not None)
+
+    features = {key: np.asarray(values, dtype=np.float64) for key, values in columns.items()}
+    features["has_underwriting"] = features["has_underwriting"].astype(bool)
+    features.update({"run_id": run_ids, "city": cities, "state": states, "property_type": property_types})
+    return features
+
+
+def _below(value: np.ndarray, threshold, scale: float, cap: float) -> np.ndarray:
+    """Penalty min(cap, (threshold - value) * scale) where value < threshold, else 0"""
+    with np.errstate(invalid="ignore"):
+        return np.where(value < threshold, np.minimum(cap, (threshold - value) * scale), 0.0)
+
+
+def _above(value: np.ndarray, threshold, scale: float, cap: float) -> np.ndarray:
+    with np.errstate(invalid="ignore"):
+        return np.where(value > threshold, np.minimum(cap, (value - threshold) * scale), 0.0)
+
+
+def score_features(features: Dict[str, np.ndarray], buybox: Dict) -> np.ndarray:
+    """
+    Vectorized score_deal over a feature set
+
+    Any numeric buy-box value may be an array of shape (V, 1), which scores
+    every deal at every value at once and returns shape (V, n_deals).
+    Rules and penalties mirror score_deal.
+
+    Returns:
+        Integer scores (0-100)
+    """
+    cap_rate = features["cap_rate"]
+    deal_size = features["deal_size"]
+    has_cap = ~np.isnan(cap_rate)
+    has_size = ~np.isnan(deal_size)
+    with np.errstate(invalid="ignore"):
+        has_cap &= cap_rate != 0
+        has_size &= deal_size != 0
+
+    penalties = []
+
+    # 1. Cap rate
+    min_cap = buybox.get("min_cap_rate", 0)
+    max_cap = buybox.get("max_cap_rate", 100)
+    cap_penalty = np.where(
+        cap_rate < min_cap, _below(cap_rate, min_cap, 5, 30), _above(cap_rate, max_cap, 3, 20)
+    )
+    penalties.append(np.where(has_cap, cap_penalty, 10.0))
+
+    # 2. Deal size
+    min_size = buybox.get("min_deal_size", 0)
+    max_size = buybox.get("max_deal_size", float("inf"))
+    size_penalty = np.where(deal_size < min_size, 20.0, np.where(deal_size > max_size, 25.0, 0.0))
+    penalties.append(np.where(has_size, size_penalty, 15.0))
+
+    # 3. Market and 4. property type (list criteria, constant across numeric sweeps)
+    preferred_markets = buybox.get("preferred_markets", [])
+    preferred_types = buybox.get("preferred_property_types", [])
+    market_penalty = [
+        (0.0 if _in_preferred_market(city, preferred_markets, state) else 15.0) if city else 10.0
+        for city, state in zip(features["city"], features["state"])
+    ] if preferred_markets else [0.0] * len(features["city"])
+    type_penalty = [
+        10.0 if preferred_types and property_type and property_type not in preferred_types else 0.0
+        for property_type in features["property_type"]
+    ]
+    penalties.append(np.asarray(market_penalty))
+    penalties.append(np.asarray(type_penalty))
+
+    # 5. LTV
+    penalties.append(_above(features["ltv"], buybox.get("max_ltv", 1.0), 100, 20))
+
+    # 6. Occupancy
+    if buybox.get("min_occupancy") is not None:
+        penalties.append(_below(features["occupancy"], buybox["min_occupancy"], 100, 15))
+
+    # 7. Debt and return checks
+    underwritten = features["has_underwriting"]
+    if buybox.get("min_dscr") is not None:
+        penalties.append(_below(features["dscr"], buybox["min_dscr"], 50, 15))
+    if buybox.get("min_debt_yield") is not None:
+        penalties.append(_below(features["debt_yield"], buybox["min_debt_yield"], 500, 10))
+    if buybox.get("min_levered_irr") is not None:
+        irr = features["levered_irr"]
+        missing_irr = underwritten & np.isnan(irr)
+        penalties.append(np.where(missing_irr, 15.0, _below(irr, buybox["min_levered_irr"], 300, 15)))
+
+    # 8. Monte Carlo probability of loss (only deals that were simulated)
+    if buybox.get("max_probability_of_loss") is not None:
+        penalties.append(_above(features["probability_of_loss"], buybox["max_probability_of_loss"], 100, 20))
+
+    score = np.full(np.broadcast(*penalties).shape, 100.0)
+    for penalty in penalties:
+        score = score - penalty
+    return np.clip(score, 0, 100).astype(int)
+
+
+def verdicts_from_scores(scores: np.ndarray) -> np.ndarray:
+    """Map scores to verdict labels (same thresholds as score_deal)"""
+    return np.where(scores >= 75, "Pass", np.where(scores >= 50, "Watch", "Hard Pass"))
+
+
+def sweep_buybox(
+    deals: List[Dict],
+    param: str,
+    values: Sequence[float],
+    buybox: Optional[Dict] = None
+) -> Dict:
+    """
+    Score a deal set across a grid of values for one buy-box parameter
+
+    Deal inputs are gathered once, then every (value, deal) pair is scored
+    in a single vectorized pass - score_deal is never re-run per grid point.
+
+    Args:
+        deals: Run payloads (with 'structured_deal' and 'score_data') or structured deals
+        param: Buy-box key to sweep (see SWEEPABLE_PARAMS)
+        values: Grid of values for param
+        buybox: Base buy-box for the other criteria (default: get_default_buybox())
+
+    Returns:
+        Dictionary with:
+            - param, values
+            - verdict_counts: {"Pass": [...], "Watch": [...], "Hard Pass": [...]} per value
+            - mean_score: list of average scores per value
+            - scores: per-value lists of deal scores
+            - run_ids: deal identifiers in score order
+    """
+    if param not in SWEEPABLE_PARAMS:
+        raise ValueError(f"Cannot sweep '{param}'; choose one of {', '.join(SWEEPABLE_PARAMS)}")
+
+    buybox = dict(buybox or get_default_buybox())
+    features = deal_features(deals, buybox)
+    grid = np.asarray(values, dtype=np.float64)
+
+    if not features["run_id"]:
+        scores = np.zeros((grid.size, 0), dtype=int)
+    else:
+        scores = score_features(features, {**buybox, param: grid[:, None]})
+        scores = np.broadcast_to(scores, (grid.size, len(features["run_id"])))
+
+    verdicts = verdicts_from_scores(scores)
+    return {
+        "param": param,
+        "values": grid.tolist(),
+        "verdict_counts": {
+            verdict: (verdicts == verdict).sum(axis=1).tolist()
+            for verdict in ("Pass", "Watch", "Hard Pass")
+        },
+        "mean_score": scores.mean(axis=1).tolist() if scores.shape[1] else [None] * grid.size,
+        "scores": scores.tolist(),
+        "run_ids": features["run_id"],
+    }
@@ -0,0 +1,282 @@
+"""
+HTTP API - ASGI service for submitting, scoring and looking up deals
+
+    uvicorn cre_agent.server:app --host 0.0.0.0 --port 8000
+    python -m cre_agent.server --port 8000 --workers 2
+
+The event loop only parses requests and awaits results. Pipeline runs,
+storage reads and queue writes execute on a bounded thread pool shared by
+all requests, and every blocking call has a request-level timeout. Async
+submissions go to the durable job queue (see jobs.py), drained by this
+process's worker threads and any `python -m cre_agent.worker` processes.
+"""
+import argparse
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Literal, Optional
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from pydantic import BaseModel, Field
+
+from .agent_orchestrator import rescore_run, run_deal_agent, unknown_run_record
+from .config import Settings, load_settings
+from .jobs import enqueue_deal, get_job_queue
+from .scoring import get_default_buybox
+from .run_index import get_run_index
+from .storage import load_run, load_run_summary, run_daily_summary_job
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 500
+MAX_RESCORE_PAGE = 1000
+
+
+class DealRequest(BaseModel):
+    raw_text: str = Field(..., min_length=1, description="Deal text (email, OM text, call transcript)")
+    buybox: Optional[Dict[str, Any]] = Field(None, description="Buy-box criteria (default buy-box if omitted)")
+    known_fields: Optional[Dict[str, Any]] = Field(None, description="Fields from structured sources")
+
+
+class BatchRequest(BaseModel):
+    deals: List[DealRequest] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+    wait: bool = Field(False, description="Process inline and return results instead of job IDs")
+
+
+class RescoreRequest(BaseModel):
+    buybox: Optional[Dict[str, Any]] = None
+    run_ids: Optional[List[str]] = Field(
+        None, max_length=MAX_RESCORE_PAGE, description="Runs to rescore (default: all stored runs, page by page)"
+    )
+    limit: int = Field(200, ge=1, le=MAX_RESCORE_PAGE, description="Runs per page when rescoring all runs")
+    cursor: Optional[str] = Field(None, description="next_cursor of the previous page")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = load_settings()
+    app.state.settings = settings
+    app.state.executor = ThreadPoolExecutor(
+        max_workers=settings.api_max_concurrency, thread_name_prefix="api"
+    )
+    worker = None
+    if settings.job_workers > 0:
+        from .worker import get_local_worker
+        worker = get_local_worker(settings.job_workers)
+    logger.info(
+        f"Deal API ready: {settings.api_max_concurrency} pipeline threads, "
+        f"{settings.job_workers} job workers, {settings.api_request_timeout:.0f}s request timeout"
+    )
+    try:
+        yield
+    finally:
+        if worker is not None:
+            worker.stop()
+        app.state.executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(title="CRE Deal Agent API", version="1.0.0", lifespan=lifespan)
+
+
+async def run_blocking(request: Request, fn: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking call on the shared pool under the request timeout
+
+    Raises:
+        HTTPException 504: the call did not finish in time (if it had not
+        started yet it is dropped from the pool's queue)
+    """
+    settings: Settings = request.app.state.settings
+    loop = asyncio.get_running_loop()
+    call = loop.run_in_executor(request.app.state.executor, functools.partial(fn, *args, **kwargs))
+    try:
+        return await asyncio.wait_for(call, timeout=settings.api_request_timeout)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Timed out after {settings.api_request_timeout:.0f}s")
+
+
+def _job_view(job: Dict) -> Dict:
+    job = {key: value for key, value in job.items() if key not in ("payload", "lease_expires")}
+    job["status_url"] = f"/jobs/{job['job_id']}"
+    return job
+
+
+@app.get("/health")
+async def health(request: Request) -> Dict:
+    counts = await run_blocking(request, get_job_queue().counts)
+    return {"status": "ok", "jobs": counts}
+
+
+@app.post("/deals")
+async def submit_deal(deal: DealRequest, request: Request) -> Dict:
+    """Process a deal and return its run payload"""
+    return await run_blocking(
+        request, run_deal_agent, deal.raw_text, deal.buybox or get_default_buybox(),
+        request.app.state.settings, known_fields=deal.known_fields
+    )
+
+
+@app.post("/deals/async", status_code=202)
+async def submit_deal_async(deal: DealRequest, request: Request) -> Dict:
+    """Queue a deal; poll GET /jobs/{job_id} for the run payload"""
+    job_id = await run_blocking(
+        request, enqueue_deal, deal.raw_text, deal.buybox or get_default_buybox(), deal.known_fields
+    )
+    return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+
+
+@app.post("/deals/batch", status_code=202)
+async def submit_batch(batch: BatchRequest, request: Request) -> Dict:
+    """
+    Submit many deals at once
+
+    Queued as jobs by default; with wait=true they are processed
+    concurrently and each result is the run payload or an error.
+    """
+    if not batch.wait:
+        job_ids = await asyncio.gather(*(
+            run_blocking(request, enqueue_deal, deal.raw_text, deal.buybox or get_default_buybox(), deal.known_fields)
+            for deal in batch.deals
+        ))
+        return {"jobs": [{"job_id": job_id, "status_url": f"/jobs/{job_id}"} for job_id in job_ids]}
+
+    outcomes = await asyncio.gather(
+        *(submit_deal(deal, request) for deal in batch.deals), return_exceptions=True
+    )
+    results = []
+    for outcome in outcomes:
+        if isinstance(outcome, HTTPException):
+            results.append({"error": outcome.detail})
+        elif isinstance(outcome, Exception):
+            results.append({"error": f"{type(outcome).__name__}: {outcome}"})
+        else:
+            results.append({"run": outcome})
+    return {"results": results}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request) -> Dict:
+    job = await run_blocking(request, get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return _job_view(job)
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, request: Request) -> Dict:
+    queue = get_job_queue()
+    if not await run_blocking(request, queue.cancel, job_id):
+        job = await run_blocking(request, queue.get, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is already {job['status']}")
+    return {"job_id": job_id, "status": "cancelled"}
+
+
+@app.post("/rescore")
+async def rescore(body: RescoreRequest, request: Request) -> Dict:
+    """
+    Score stored runs against a buy-box without reprocessing them
+
+    Named runs are loaded directly. Otherwise one page of stored runs (newest
+    first) is rescored per request; pass next_cursor back for the next page.
+    """
+    buybox = body.buybox or get_default_buybox()
+
+    def rescore_named() -> Dict:
+        results = []
+        for run_id in body.run_ids:
+            summary = load_run_summary(run_id)
+            if summary is None:
+                results.append(unknown_run_record(run_id))
+            else:
+                results.append(rescore_run(summary, buybox))
+        return {"results": results, "next_cursor": None}
+
+    def rescore_page() -> Dict:
+        page = get_run_index().page(sort="timestamp", limit=body.limit, cursor=body.cursor)
+        return {
+            "results": [rescore_run(summary, buybox) for summary in page["runs"]],
+            "next_cursor": page["next_cursor"],
+        }
+
+    if body.run_ids:
+        return await run_blocking(request, rescore_named)
+    try:
+        return await run_blocking(request, rescore_page)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/runs")
+async def list_runs(
+    request: Request,
+    order: Literal["recent", "top"] = "recent",
+    limit: int = Query(10, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    market: Optional[str] = None,
+    property_type: Optional[str] = None,
+    verdict: Optional[str] = None,
+    min_score: Optional[int] = None,
+    max_score: Optional[int] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None
+) -> Dict:
+    """Stored run summaries, newest or best-scoring first, one page at a time"""
+    filters = {
+        key: value for key, value in {
+            "market": market, "property_type": property_type, "verdict": verdict,
+            "min_score": min_score, "max_score": max_score, "since": since, "until": until,
+        }.items() if value is not None
+    }
+    if order == "top":
+        # Unscored runs are not ranked
+        filters.setdefault("min_score", 0)
+    sort = "timestamp" if order == "recent" else "score"
+
+    def lookup() -> Dict:
+        return get_run_index().page(filters, sort=sort, limit=limit, cursor=cursor)
+
+    try:
+        return await run_blocking(request, lookup)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/runs/{run_id}")
+async def get_run(run_id: str, request: Request) -> Dict:
+    run = await run_blocking(request, load_run, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Unknown run {run_id}")
+    return run
+
+
+@app.get("/summary")
+async def summary(request: Request) -> Dict:
+    """Daily summary over all stored runs"""
+    return await run_blocking(request, run_daily_summary_job)
+
+
+def main(argv=None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the CRE deal agent HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="Server processes (they share the job queue)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    uvicorn.run(
+        "cre_agent.server:app", host=args.host, port=args.port, workers=args.workers,
+        log_level=args.log_level, backlog=2048,
+        # Longer than queued clients wait, so pooled keep-alive connections aren't closed under them
+        timeout_keep_alive=75
+    )
+
+
+if __name__ == "__main__":
+    main()
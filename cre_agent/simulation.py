@@ -0,0 +1,244 @@
+"""
+Monte Carlo risk simulation - correlated market scenarios run through the underwriting model
+"""
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+
+from .underwriting import DEFAULT_ASSUMPTIONS, annual_debt_service, deal_inputs, irr, loan_balance
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATHS = 100_000
+
+# Risk factors: mean and standard deviation of each draw
+# rent_growth: annual NOI growth; vacancy: stabilized economic vacancy;
+# exit_cap_spread: exit cap minus going-in cap; interest_rate: fixed rate at close
+RISK_FACTORS = ("rent_growth", "vacancy", "exit_cap_spread", "interest_rate")
+
+DEFAULT_RISK_MODEL = {
+    "mean": {"rent_growth": 0.03, "vacancy": 0.06, "exit_cap_spread": 0.005, "interest_rate": 0.065},
+    "std": {"rent_growth": 0.015, "vacancy": 0.03, "exit_cap_spread": 0.0075, "interest_rate": 0.01},
+    # Correlations in RISK_FACTORS order: weak rent growth comes with higher vacancy
+    # and wider exit caps; higher rates push exit caps out
+    "correlation": [
+        [1.0, -0.5, -0.3, 0.1],
+        [-0.5, 1.0, 0.3, 0.1],
+        [-0.3, 0.3, 1.0, 0.6],
+        [0.1, 0.1, 0.6, 1.0],
+    ],
+}
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def merge_risk_model(risk_model: Optional[Dict] = None, mean: Optional[Dict] = None) -> Dict:
+    """
+    Lay risk-model overrides over DEFAULT_RISK_MODEL, factor by factor
+
+    Args:
+        risk_model: Overrides ('mean' and 'std' may name only some factors)
+        mean: Factor means to use ahead of the defaults (e.g. from the
+            underwriting assumptions); explicit risk_model means still win
+
+    Returns:
+        Complete risk model with every factor's mean and std
+    """
+    overrides = risk_model or {}
+    return {
+        "mean": {**DEFAULT_RISK_MODEL["mean"], **(mean or {}), **overrides.get("mean", {})},
+        "std": {**DEFAULT_RISK_MODEL["std"], **overrides.get("std", {})},
+        "correlation": overrides.get("correlation", DEFAULT_RISK_MODEL["correlation"]),
+    }
+
+
+def draw_risk_factors(rng: np.random.Generator, n_paths: int, risk_model: Optional[Dict] = None) -> Dict[str, np.ndarray]:
+    """
+    Draw correlated risk-factor samples
+
+    Standard normals are correlated with the Cholesky factor of the
+    correlation matrix, then scaled by each factor's mean and deviation.
+
+    Returns:
+        Dictionary of RISK_FACTORS name -> array of n_paths draws
+    """
+    model = merge_risk_model(risk_model)
+    mean = np.array([model["mean"][name] for name in RISK_FACTORS])
+    std = np.array([model["std"][name] for name in RISK_FACTORS])
+    cholesky = np.linalg.cholesky(np.asarray(model["correlation"], dtype=np.float64))
+
+    draws = mean + (rng.standard_normal((n_paths, len(RISK_FACTORS))) @ cholesky.T) * std
+
+    return {
+        "rent_growth": draws[:, 0],
+        "vacancy": np.clip(draws[:, 1], 0.0, 0.6),
+        "exit_cap_spread": draws[:, 2],
+        "interest_rate": np.clip(draws[:, 3], 0.005, None),
+    }
+
+
+def _simulate_paths(
+    seed: np.random.SeedSequence,
+    n_paths: int,
+    deal: Dict,
+    assumptions: Dict,
+    risk_model: Optional[Dict]
+) -> Dict[str, np.ndarray]:
+    """Simulate one block of paths; module-level so process pools can pickle it"""
+    rng = np.random.default_rng(seed)
+    factors = draw_risk_factors(rng, n_paths, risk_model)
+
+    price = deal["purchase_price"]
+    years = int(assumptions["hold_years"])
+    ltv = assumptions["ltv"]
+
+    # In-place NOI is re-based from today's vacancy to each path's stabilized vacancy
+    base_vacancy = deal["vacancy"]
+    occupancy_factor = (1.0 - factors["vacancy"]) / (1.0 - base_vacancy)
+    t = np.arange(years + 1, dtype=np.float64)
+    noi_path = deal["noi"] * occupancy_factor[:, None] * (1.0 + factors["rent_growth"][:, None]) ** t
+
+    reserves = deal["reserves"] * (1.0 + assumptions["reserves_growth"]) ** t[:years]
+    reserves[0] += deal["capex"]
+
+    loan = price * ltv
+    debt_service = annual_debt_service(loan, factors["interest_rate"], assumptions["amortization_years"])
+    balance = loan_balance(loan, factors["interest_rate"], assumptions["amortization_years"], years)
+    equity = price * (1.0 - ltv) + price * assumptions["closing_costs"]
+
+    exit_cap = np.maximum(deal["going_in_cap"] + factors["exit_cap_spread"], 0.02)
+    sale = noi_path[:, years] / exit_cap * (1.0 - assumptions["selling_costs"])
+
+    cash_flows = np.empty((n_paths, years + 1))
+    cash_flows[:, 0] = -equity
+    cash_flows[:, 1:] = noi_path[:, :years] - reserves - debt_service[:, None]
+    cash_flows[:, years] += sale - balance
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        min_dscr = noi_path[:, :years].min(axis=1) / debt_service
+
+    return {
+        "irr": irr(cash_flows),
+        "dscr": noi_path[:, 0] / debt_service,
+        "min_dscr": min_dscr,
+        "equity_multiple": cash_flows[:, 1:].sum(axis=1) / equity,
+    }
+
+
+def _summarize(values: np.ndarray) -> Dict:
+    finite = values[np.isfinite(values)]
+    if not finite.size:
+        return {"mean": None, **{f"p{p}": None for p in PERCENTILES}}
+    percentiles = np.percentile(finite, PERCENTILES)
+    return {
+        "mean": float(finite.mean()),
+        **{f"p{p}": float(value) for p, value in zip(PERCENTILES, percentiles)},
+    }
+
+
+def simulate_deal(
+    struct: Dict,
+    n_paths: int = DEFAULT_PATHS,
+    seed: Optional[int] = 0,
+    workers: int = 1,
+    assumptions: Optional[Dict] = None,
+    risk_model: Optional[Dict] = None,
+    target_irr: Optional[float] = None
+) -> Optional[Dict]:
+    """
+    Run a Monte Carlo risk simulation for a structured deal
+
+    Each path draws correlated rent growth, vacancy, exit cap and interest
+    rate, then evaluates the full hold-period cash flows; all paths are
+    computed together as NumPy arrays.
+
+    Args:
+        struct: Structured deal data (needs purchase/asking price and NOI)
+        n_paths: Number of simulated paths
+        seed: Seed for reproducible results (None for fresh entropy)
+        workers: Processes to spread the paths across (1 runs inline)
+        assumptions: Underwriting assumption overrides (see underwriting.DEFAULT_ASSUMPTIONS)
+        risk_model: Overrides for DEFAULT_RISK_MODEL ('mean', 'std', 'correlation');
+            rent growth, exit cap spread and interest rate are otherwise
+            centred on the underwriting assumptions
+        target_irr: Optional IRR hurdle for probability_below_target
+
+    Returns:
+        Dictionary with irr/dscr/min_dscr/equity_multiple distributions
+        (mean and percentiles), probability_of_loss (equity multiple < 1),
+        probability_dscr_below_1 and paths, or None when the deal cannot be
+        underwritten (see underwriting.deal_inputs).
+        Results are reproducible for the same seed and worker count.
+    """
+    inputs = deal_inputs(struct)
+    if inputs is None:
+        return None
+
+    a = {**DEFAULT_ASSUMPTIONS, **(assumptions or {})}
+    if inputs["units"]:
+        reserves = a["reserves_per_unit"] * inputs["units"]
+    elif inputs["square_feet"]:
+        reserves = a["reserves_per_sf"] * inputs["square_feet"]
+    else:
+        reserves = 0.0
+
+    occupancy = (struct.get("rent_roll") or {}).get("occupancy") or struct.get("occupancy")
+    if occupancy and occupancy > 1:
+        # Quoted as a percent (92 rather than 0.92)
+        occupancy = occupancy / 100.0
+    going_in_cap = inputs["noi"] / inputs["purchase_price"]
+    deal = {
+        "purchase_price": inputs["purchase_price"],
+        "noi": inputs["noi"],
+        "going_in_cap": going_in_cap,
+        "vacancy": min(1.0 - occupancy, 0.9) if occupancy else DEFAULT_RISK_MODEL["mean"]["vacancy"],
+        "reserves": reserves,
+        "capex": inputs["capex"],
+    }
+
+    # Centre the market draws on the same assumptions underwrite_deal uses
+    risk_model = merge_risk_model(risk_model, mean={
+        "rent_growth": a["rent_growth"],
+        "exit_cap_spread": a["exit_cap_rate"] - going_in_cap if a["exit_cap_rate"] else a["exit_cap_spread"],
+        "interest_rate": a["interest_rate"],
+    })
+
+    # One child seed per block keeps blocks independent and the run reproducible
+    blocks = max(1, workers)
+    seeds = np.random.SeedSequence(seed).spawn(blocks)
+    sizes = [n_paths // blocks + (1 if i < n_paths % blocks else 0) for i in range(blocks)]
+
+    if blocks == 1:
+        results = [_simulate_paths(seeds[0], sizes[0], deal, a, risk_model)]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=blocks) as pool:
+            results = list(pool.map(
+                _simulate_paths, seeds, sizes,
+                [deal] * blocks, [a] * blocks, [risk_model] * blocks
+            ))
+
+    samples = {key: np.concatenate([r[key] for r in results]) for key in results[0]}
+    irrs = samples["irr"]
+
+    summary = {
+        "paths": n_paths,
+        "seed": seed,
+        "irr": _summarize(irrs),
+        "dscr": _summarize(samples["dscr"]),
+        "min_dscr": _summarize(samples["min_dscr"]),
+        "equity_multiple": _summarize(samples["equity_multiple"]),
+        "probability_of_loss": float((samples["equity_multiple"] < 1.0).mean()),
+        "probability_dscr_below_1": float((samples["min_dscr"] < 1.0).mean()),
+    }
+    if target_irr is not None:
+        # Paths without an IRR lost everything, so they count as below target
+        summary["probability_below_target"] = float((~(irrs >= target_irr)).mean())
+
+    logger.info(
+        f"Simulated {n_paths} paths: median IRR {summary['irr']['p50']}, "
+        f"P(loss) {summary['probability_of_loss']:.1%}"
+    )
+    return summary
@@ -1,41 +1,457 @@
 """
 Storage layer - local JSON logging + S3 + evidence generation + daily summary
+
+Local runs are persisted in two tiers:
+    runs/<run_id>.json          hot summary record (small, fixed schema)
+    runs/blobs/<xx>/<sha>.json  cold content-addressed blobs (raw text, memo, structs)
+
+Every hot record is mirrored into runs/index.sqlite (see run_index.py), which
+serves listings, rankings and summaries; cold blobs are loaded on demand.
 """
 import json
 import logging
 import os
 import hashlib
-from datetime import datetime
-from typing import Dict, Optional, List
+import heapq
+import tempfile
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, Optional, List, Union
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+RUNS_DIR = Path("./runs")
+BLOBS_DIRNAME = "blobs"
+
+# Bumped whenever the hot record layout changes; legacy full-payload files have no version
+RUN_SUMMARY_SCHEMA_VERSION = 2
+
+# Large payload fields that live in cold blobs instead of the hot record
+COLD_FIELDS = ("raw_text", "ic_summary", "structured_deal", "score_data", "buybox")
+
+
+def _blob_path(digest: str) -> Path:
+    """Path of a content-addressed blob, fanned out by the first two hex chars"""
+    return RUNS_DIR / BLOBS_DIRNAME / digest[:2] / f"{digest}.json"
+
+
+def _write_text_atomic(path: Path, text: str) -> None:
+    """Write to a temp file and rename it into place so readers never see partial files"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A unique temp file per call - threads and processes may write the same path at once
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def put_blob(value: Any) -> str:
+    """
+    Store a value as a content-addressed blob
+
+    Identical content (e.g. the same broker text resent) maps to the same
+    digest and is only written once.
+
+    Args:
+        value: JSON-serializable value
+
+    Returns:
+        SHA-256 hex digest of the canonical JSON encoding
+    """
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha256(encoded.encode()).hexdigest()
+
+    path = _blob_path(digest)
+    if not path.exists():
+        try:
+            _write_text_atomic(path, encoded)
+        except OSError:
+            # Another writer stored the same content first
+            if not path.exists():
+                raise
+
+    return digest
+
+
+def get_blob(digest: str) -> Any:
+    """
+    Load a content-addressed blob
+
+    Args:
+        digest: Blob digest returned by put_blob
+
+    Returns:
+        Decoded JSON value
+    """
+    with open(_blob_path(digest)) as f:
+        return json.load(f)
+
+
+def build_run_summary(payload: Dict) -> Dict:
+    """
+    Build the hot summary record for a run payload
+
+    Args:
+        payload: Complete run payload
+
+    Returns:
+        Fixed-schema summary dictionary (no blob references)
+    """
+    structured = payload.get("structured_deal") or {}
+    score_data = payload.get("score_data") or {}
+    metrics = score_data.get("metrics") or {}
+    location = structured.get("location") or {}
+    if not isinstance(location, dict):
+        location = {}
+
+    return {
+        "schema_version": RUN_SUMMARY_SCHEMA_VERSION,
+        "run_id": payload.get("run_id"),
+        "timestamp": payload.get("timestamp"),
+        "property_type": structured.get("property_type"),
+        "city": location.get("city"),
+        "state": location.get("state"),
+        "price": structured.get("purchase_price") or structured.get("asking_price"),
+        "cap_rate": metrics.get("cap_rate"),
+        "units": structured.get("units"),
+        "square_feet": structured.get("square_feet"),
+        "score": score_data.get("score"),
+        "verdict": score_data.get("verdict"),
+        "local_path": payload.get("local_path"),
+        "s3_uri": payload.get("s3_uri"),
+        "blobs": {},
+    }
+
 
 def log_run_local(run_id: str, payload: Dict) -> str:
     """
-    Log a deal run to local JSON file
+    Log a deal run locally as a hot summary record plus cold blobs
 
     Args:
         run_id: Unique run identifier
         payload: Run data to log
 
     Returns:
-        Path to the saved file
+        Path to the saved summary record
     """
-    # Create runs directory if it doesn't exist
-    runs_dir = Path("./runs")
-    runs_dir.mkdir(exist_ok=True)
+    file_path = RUNS_DIR / f"{run_id}.json"
 
-    # Save to JSON file
-    file_path = runs_dir / f"{run_id}.json"
-    with open(file_path, "w") as f:
-        json.dump(payload, f, indent=2, default=str)
+    summary = build_run_summary({**payload, "run_id": run_id})
+    summary["local_path"] = str(file_path)
+
+    # Everything not covered by the summary or a dedicated blob goes into one "extra" blob
+    extra = {
+        key: value for key, value in payload.items()
+        if key not in COLD_FIELDS and key not in ("run_id", "timestamp", "local_path")
+    }
+
+    for field in COLD_FIELDS:
+        if field in payload:
+            summary["blobs"][field] = put_blob(payload[field])
+    if extra:
+        summary["blobs"]["extra"] = put_blob(extra)
+
+    _write_text_atomic(file_path, json.dumps(summary, indent=2, default=str))
+    metrics = (payload.get("score_data") or {}).get("metrics") if payload.get("structured_deal") else None
+    _index_run(file_path, summary, metrics)
 
     logger.info(f"Logged run to {file_path}")
     return str(file_path)
 
 
+def _index_run(file_path: Path, summary: Dict, metrics: Optional[Dict] = None) -> None:
+    """Mirror a written summary record into the run index (the record file stays authoritative)"""
+    from .run_index import get_run_index
+
+    try:
+        get_run_index().upsert(summary, metrics, mtime_ns=file_path.stat().st_mtime_ns)
+    except Exception as e:
+        logger.warning(
+            f"Could not index run {summary.get('run_id')}: {e}; "
+            "rebuild the index with `python -m cre_agent reindex`"
+        )
+
+
+def _is_summary_record(data: Dict) -> bool:
+    return data.get("schema_version") == RUN_SUMMARY_SCHEMA_VERSION and "blobs" in data
+
+
+def load_run_summary(run_id: str) -> Optional[Dict]:
+    """
+    Load the hot summary record for a run
+
+    Legacy full-payload files are summarized on the fly.
+
+    Args:
+        run_id: Run identifier
+
+    Returns:
+        Summary dictionary, or None if the run does not exist
+    """
+    file_path = RUNS_DIR / f"{run_id}.json"
+    if not file_path.exists():
+        return None
+    return _read_summary_file(file_path)
+
+
+def _read_summary_file(file_path: Path) -> Dict:
+    with open(file_path) as f:
+        data = json.load(f)
+
+    if _is_summary_record(data):
+        return data
+
+    summary = build_run_summary(data)
+    summary["local_path"] = summary["local_path"] or str(file_path)
+    summary["legacy"] = True
+    return summary
+
+
+def iter_run_summaries() -> Iterator[Dict]:
+    """
+    Iterate over the hot summary records of all stored runs
+
+    Yields:
+        Summary dictionaries (cold blobs are never read)
+    """
+    if not RUNS_DIR.exists():
+        return
+
+    for run_file in RUNS_DIR.glob("*.json"):
+        try:
+            yield _read_summary_file(run_file)
+        except Exception as e:
+            logger.warning(f"Failed to load {run_file}: {e}")
+
+
+def runs_version() -> int:
+    """
+    Cache key for queries over stored runs
+
+    Summary records are only ever written by renaming a file into RUNS_DIR,
+    which bumps the directory's mtime, so the mtime changes whenever any
+    run is added, updated or removed.
+
+    Returns:
+        RUNS_DIR modification time in nanoseconds (0 if it does not exist)
+    """
+    try:
+        return RUNS_DIR.stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def load_run_blob(summary: Dict, field: str) -> Any:
+    """
+    Lazily load one cold field of a run
+
+    Args:
+        summary: Hot summary record
+        field: Cold field name (e.g. "raw_text", "structured_deal")
+
+    Returns:
+        Field value, or None if the run has no such blob
+    """
+    digest = summary.get("blobs", {}).get(field)
+    if digest is None:
+        return None
+    return get_blob(digest)
+
+
+def load_run(run_id: str) -> Optional[Dict]:
+    """
+    Load and reassemble the complete payload of a run
+
+    Args:
+        run_id: Run identifier
+
+    Returns:
+        Full run payload, or None if the run does not exist
+    """
+    file_path = RUNS_DIR / f"{run_id}.json"
+    if not file_path.exists():
+        return None
+
+    with open(file_path) as f:
+        data = json.load(f)
+
+    if not _is_summary_record(data):
+        return data
+
+    payload = {"run_id": data["run_id"], "timestamp": data["timestamp"]}
+    for field, digest in data["blobs"].items():
+        if field == "extra":
+            payload.update(get_blob(digest))
+        else:
+            payload[field] = get_blob(digest)
+
+    payload["local_path"] = data.get("local_path")
+    if data.get("s3_uri"):
+        payload["s3_uri"] = data["s3_uri"]
+    return payload
+
+
+def update_run_summary(run_id: str, **fields) -> Optional[Dict]:
+    """
+    Update fields of a stored hot summary record (e.g. s3_uri after upload)
+
+    Args:
+        run_id: Run identifier
+        **fields: Summary fields to set
+
+    Returns:
+        Updated summary, or None if the run is missing or a legacy file
+    """
+    summary = load_run_summary(run_id)
+    if summary is None or summary.get("legacy"):
+        return None
+
+    summary.update(fields)
+    file_path = RUNS_DIR / f"{run_id}.json"
+    _write_text_atomic(file_path, json.dumps(summary, indent=2, default=str))
+    _index_run(file_path, summary)
+    return summary
+
+
+def _parse_timestamp(value: Union[str, date, datetime, None]) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _as_set(value) -> Optional[set]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return {value.lower()}
+    return {str(v).lower() for v in value}
+
+
+def _summary_filter(filters: Optional[Dict]):
+    """
+    Build a predicate over hot summary records
+
+    Supported filters (all optional):
+        market: market or list of markets (a city's MSA market, e.g. Plano
+            is in Dallas, or the city itself)
+        city: city name or list of names
+        property_type: type or list of types
+        verdict: verdict or list of verdicts
+        since / until: datetime, date or ISO string (inclusive; a bare date
+            for until covers the whole day)
+        min_score: minimum score
+    """
+    from .geo import market_of
+
+    filters = filters or {}
+    markets = _as_set(filters.get("market"))
+    cities = _as_set(filters.get("city"))
+    property_types = _as_set(filters.get("property_type"))
+    verdicts = _as_set(filters.get("verdict"))
+    since = _parse_timestamp(filters.get("since"))
+    until = filters.get("until")
+    if isinstance(until, datetime):
+        until_is_day = False
+    else:
+        until_is_day = isinstance(until, date) or (isinstance(until, str) and len(until) == 10)
+    until = _parse_timestamp(until)
+    min_score = filters.get("min_score")
+
+    def matches(summary: Dict) -> bool:
+        city = summary.get("city")
+        if cities is not None and (city or "").lower() not in cities:
+            return False
+        if markets is not None and (market_of(city, summary.get("state")) or city or "").lower() not in markets:
+            return False
+        if property_types is not None and (summary.get("property_type") or "").lower() not in property_types:
+            return False
+        if verdicts is not None and (summary.get("verdict") or "").lower() not in verdicts:
+            return False
+        if min_score is not None and (summary.get("score") is None or summary["score"] < min_score):
+            return False
+        if since is not None or until is not None:
+            timestamp = _parse_timestamp(summary.get("timestamp"))
+            if timestamp is None:
+                return False
+            if since is not None and timestamp < since:
+                return False
+            if until is not None:
+                if until_is_day and timestamp.date() > until.date():
+                    return False
+                if not until_is_day and timestamp > until:
+                    return False
+        return True
+
+    return matches
+
+
+def top_deals(
+    k: int = 3,
+    filters: Optional[Dict] = None,
+    summaries: Optional[Iterable[Dict]] = None
+) -> List[Dict]:
+    """
+    Highest-scoring stored runs
+
+    Stored runs are read off the run index's score order. Explicitly given
+    summaries are ranked with a bounded heap instead (O(n log k)).
+
+    Args:
+        k: Number of runs to return
+        filters: See _summary_filter (market, property_type, verdict, since, until, min_score)
+        summaries: Summary records to rank (default: all stored runs)
+
+    Returns:
+        Up to k summary records, best score first (ties: most recent first)
+    """
+    if summaries is None:
+        if k <= 0 or not RUNS_DIR.exists():
+            return []
+        from .run_index import get_run_index
+
+        scored = {**(filters or {}), "min_score": (filters or {}).get("min_score") or 0}
+        return get_run_index().page(scored, sort="score", limit=k)["runs"]
+
+    matches = _summary_filter(filters)
+    candidates = (
+        summary for summary in summaries
+        if summary.get("score") is not None and matches(summary)
+    )
+    return heapq.nlargest(k, candidates, key=lambda s: (s["score"], s.get("timestamp") or ""))
+
+
+def recent(k: int = 10, filters: Optional[Dict] = None) -> List[Dict]:
+    """
+    Most recent stored runs
+
+    Args:
+        k: Number of runs to return
+        filters: See run_index._where (market, property_type, verdict, score
+            and price ranges, since, until)
+
+    Returns:
+        Up to k summary records, newest first
+    """
+    if k <= 0 or not RUNS_DIR.exists():
+        return []
+    from .run_index import get_run_index
+
+    return get_run_index().page(filters, sort="timestamp", limit=k)["runs"]
+
+
 def log_run_s3(run_id: str, payload: Dict, bucket: str, region: str = "us-east-1") -> Optional[str]:
     """
     Log a deal run to S3
@@ -148,6 +564,35 @@ def send_to_vanta(evidence: Dict) -> Dict:
     }
 
 
+def evidence_s3_key(run_id: str, timestamp: str) -> str:
+    """
+    Build the S3 key for an evidence packet
+
+    Format: evidence/YYYY/MM/DD/run_id_timestamp.json, so packets are
+    partitioned by day and can be listed per date and run_id prefix.
+    """
+    safe_timestamp = timestamp.replace(':', '-').replace('.', '-')
+    date_parts = timestamp.split("T")[0].split("-")
+    if len(date_parts) == 3:
+        year, month, day = date_parts
+        return f"evidence/{year}/{month}/{day}/{run_id}_{safe_timestamp}.json"
+    return f"evidence/{run_id}_{safe_timestamp}.json"
+
+
+def parse_evidence_s3_key(key: str) -> Dict[str, Optional[str]]:
+    """
+    Split an evidence key back into its partition date and run_id
+
+    Returns:
+        Dictionary with 'date' (YYYY-MM-DD or None) and 'run_id' keys
+    """
+    parts = key.split("/")
+    run_id = parts[-1].split("_", 1)[0] if parts[-1] else None
+    if len(parts) == 5 and parts[0] == "evidence":
+        return {"date": f"{parts[1]}-{parts[2]}-{parts[3]}", "run_id": run_id}
+    return {"date": None, "run_id": run_id}
+
+
 def upload_evidence_to_s3(evidence: Dict, bucket: str, region: str = "us-east-1") -> Optional[str]:
     """
     Upload evidence packet to S3
@@ -171,15 +616,7 @@ def upload_evidence_to_s3(evidence: Dict, bucket: str, region: str = "us-east-1"
         
         run_id = evidence.get("run_id", "unknown")
         timestamp = evidence.get("timestamp", datetime.now().isoformat())
-        
-        # Create key with organized structure
-        # Format: evidence/YYYY/MM/DD/run_id_timestamp.json
-        date_parts = timestamp.split("T")[0].split("-")
-        if len(date_parts) == 3:
-            year, month, day = date_parts
-            key = f"evidence/{year}/{month}/{day}/{run_id}_{timestamp.replace(':', '-').replace('.', '-')}.json"
-        else:
-            key = f"evidence/{run_id}_{timestamp.replace(':', '-').replace('.', '-')}.json"
+        key = evidence_s3_key(run_id, timestamp)
         
         # Upload to S3
         s3_client.put_object(
@@ -243,64 +680,44 @@ def run_daily_summary_job() -> Dict:
     Returns:
         Summary dictionary with stats and top deals
     """
-    runs_dir = Path("./runs")
-
-    if not runs_dir.exists():
+    if not RUNS_DIR.exists():
         return {
             "status": "no_data",
             "message": "No runs directory found",
             "deal_count": 0
         }
 
-    # Load all run files
-    run_files = list(runs_dir.glob("*.json"))
-    run_files = [f for f in run_files if f.name != "evidence_log.jsonl"]
+    # Aggregates and the top 3 come straight from the run index
+    from .run_index import get_run_index
+
+    index = get_run_index()
+    stats = index.stats()
+    deal_count = stats["deal_count"]
 
-    if not run_files:
+    if not deal_count:
         return {
             "status": "no_data",
             "message": "No deal runs found",
             "deal_count": 0
         }
 
-    deals = []
-    for run_file in run_files:
-        try:
-            with open(run_file) as f:
-                data = json.load(f)
-                deals.append(data)
-        except Exception as e:
-            logger.warning(f"Failed to load {run_file}: {e}")
-
-    # Compute statistics
-    deal_count = len(deals)
-
-    scores = []
-    for deal in deals:
-        score_data = deal.get("score_data", {})
-        score = score_data.get("score")
-        if score is not None:
-            scores.append((score, deal))
-
-    avg_score = sum(s[0] for s in scores) / len(scores) if scores else 0
-
-    # Top 3 deals by score
-    scores.sort(reverse=True, key=lambda x: x[0])
-    top_deals = []
-
-    for score, deal in scores[:3]:
-        structured = deal.get("structured_deal", {})
-        location = structured.get("location", {})
-        city = location.get("city", "Unknown") if isinstance(location, dict) else "Unknown"
-        prop_type = structured.get("property_type", "Unknown")
+    avg_score = stats["avg_score"] or 0
+    verdicts = {
+        "pass": stats["verdicts"].get("Pass", 0),
+        "watch": stats["verdicts"].get("Watch", 0),
+        "hard_pass": stats["verdicts"].get("Hard Pass", 0),
+    }
+    best = top_deals(3)
 
-        top_deals.append({
+    top = []
+    for deal in best:
+        top.append({
             "run_id": deal.get("run_id"),
-            "score": score,
-            "verdict": deal.get("score_data", {}).get("verdict"),
-            "property_type": prop_type,
-            "location": city,
-            "price": structured.get("purchase_price") or structured.get("asking_price")
+            "score": deal["score"],
+            "verdict": deal.get("verdict"),
+            "property_type": deal.get("property_type") or "Unknown",
+            "location": deal.get("city") or "Unknown",
+            "price": deal.get("price")
         })
 
     summary = {
@@ -308,12 +725,8 @@ def run_daily_summary_job() -> Dict:
         "job_run_time": datetime.now().isoformat(),
         "deal_count": deal_count,
         "avg_score": round(avg_score, 1),
-        "top_deals": top_deals,
-        "verdicts": {
-            "pass": sum(1 for d in deals if d.get("score_data", {}).get("verdict") == "Pass"),
-            "watch": sum(1 for d in deals if d.get("score_data", {}).get("verdict") == "Watch"),
-            "hard_pass": sum(1 for d in deals if d.get("score_data", {}).get("verdict") == "Hard Pass"),
-        }
+        "top_deals": top,
+        "verdicts": verdicts
     }
 
     logger.info(f"Daily summary job completed: {deal_count} deals analyzed")
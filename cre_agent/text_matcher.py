@@ -0,0 +1,317 @@
+"""
+Keyword matcher - compiled-regex multi-keyword search over the deal-text dictionaries
+
+Property types, markets (cities, states and the gazetteer's places and
+submarkets) and broker firms are compiled into one trie-shaped regular
+expression anchored at word starts, so re's C loop scans the text once
+instead of testing each dictionary entry in turn.
+
+Entries from the original keyword lists keep their plain substring
+semantics ("unit" still matches "units"); newer entries match whole words
+only so short names don't fire inside other words ("Reno" in "Renovated"),
+and gazetteer names match with their exact capitalization.
+"""
+import logging
+import re
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .geo import US_STATES, get_gazetteer, market_of, normalize_state
+
+logger = logging.getLogger(__name__)
+
+# Checked in order: the first type with any keyword in the text wins
+PROPERTY_TYPE_KEYWORDS = {
+    "multifamily": ["multifamily", "multi-family", "apartment", "unit"],
+    "office": ["office"],
+    "industrial": ["industrial", "warehouse", "distribution"],
+    "retail": ["retail", "shopping center", "mall"],
+    "mixed_use": ["mixed use", "mixed-use"],
+}
+
+# Cities recognized without a state, substring matched, in priority order
+COMMON_CITIES = [
+    "Austin", "Dallas", "Houston", "San Antonio", "Phoenix", "Los Angeles",
+    "San Francisco", "Seattle", "Portland", "Denver", "Atlanta", "Miami",
+    "New York", "Boston", "Chicago", "Philadelphia"
+]
+
+# Broker firms, substring matched, in priority order; later firms whole-word
+COMMON_FIRMS = ["JLL", "CBRE", "Cushman", "Colliers", "Marcus & Millichap", "Newmark"]
+OTHER_FIRMS = [
+    "Berkadia", "Walker & Dunlop", "Eastdil Secured", "Northmarq", "Avison Young",
+    "Institutional Property Advisors", "Kidder Mathews", "Lee & Associates",
+    "Savills", "Greystone"
+]
+
+
+def _lower_same_length(text: str) -> str:
+    """Lowercase text without changing character offsets"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # A few characters (e.g. 'İ') lowercase to two; leave those as-is
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+def _trie_regex(keywords: Iterable[str]) -> str:
+    """
+    Regex alternation of keywords factored into a trie
+
+    Each character position is a single branch on the next letter rather
+    than a test of every keyword, and the greedy optional groups make the
+    longest keyword at a position win.
+    """
+    trie: Dict[str, Dict] = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node: Dict) -> str:
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+
+class KeywordMatcher:
+    """
+    Case-insensitive multi-keyword search
+
+    Whole-word keywords are compiled into one trie regex tried only at word
+    starts; the longest keyword found at each start also reports the
+    shorter keywords that prefix it. Substring keywords (a short legacy
+    list that may start mid-word) are found with str.find. Add keywords
+    with a payload, then iterate matches; the pattern is compiled on first
+    use and again if more keywords are added.
+    """
+
+    def __init__(self, keywords: Optional[Iterable[Tuple[str, Any]]] = None):
+        # Lowercased keyword -> (keyword, payload, whole_word, case_sensitive) entries
+        self._whole_word: Dict[str, List[Tuple[str, Any, bool, bool]]] = {}
+        self._substring: Dict[str, List[Tuple[str, Any, bool, bool]]] = {}
+        self._pattern: Optional[re.Pattern] = None
+        self._prefixes: Dict[str, List[str]] = {}
+        self._count = 0
+        for keyword, payload in keywords or ():
+            self.add(keyword, payload)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, keyword: str, payload: Any, whole_word: bool = False, case_sensitive: bool = False) -> None:
+        """
+        Add a keyword
+
+        Args:
+            keyword: Text to find
+            payload: Value reported with each match
+            whole_word: Only match when not surrounded by letters or digits
+            case_sensitive: Only match the keyword's exact capitalization
+        """
+        if not keyword:
+            return
+        table = self._whole_word if whole_word else self._substring
+        table.setdefault(_lower_same_length(keyword), []).append((keyword, payload, whole_word, case_sensitive))
+        self._count += 1
+        self._pattern = None
+
+    def build(self) -> None:
+        """Compile the whole-word pattern and each keyword's list of keyword prefixes"""
+        keys = self._whole_word
+        # Not preceded by a letter or digit, then the longest keyword starting here
+        self._pattern = re.compile(r"(?<![^\W_])(?=(" + _trie_regex(keys) + "))")
+        self._prefixes = {
+            key: [key[:i] for i in range(len(key), 0, -1) if key[:i] in keys]
+            for key in keys
+        }
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """
+        Find every keyword occurrence
+
+        Yields:
+            (start, end, payload) per match, ordered by start offset
+        """
+        return iter(self.find_all(text))
+
+    def find_all(self, text: str) -> List[Tuple[int, int, Any]]:
+        """All matches as a list (see iter_matches)"""
+        if not text:
+            return []
+        if self._pattern is None:
+            self.build()
+
+        lowered = _lower_same_length(text)
+        n = len(text)
+        matches = []
+
+        def accept(start: int, end: int, entries: List[Tuple[str, Any, bool, bool]]) -> None:
+            for keyword, payload, whole_word, case_sensitive in entries:
+                if case_sensitive and text[start:end] != keyword:
+                    continue
+                if whole_word and end < n and text[end].isalnum():
+                    continue
+                matches.append((start, end, payload))
+
+        if self._whole_word:
+            whole_word, prefixes = self._whole_word, self._prefixes
+            for match in self._pattern.finditer(lowered):
+                start = match.start()
+                for key in prefixes[match.group(1)]:
+                    accept(start, start + len(key), whole_word[key])
+
+        for key, entries in self._substring.items():
+            start = lowered.find(key)
+            while start >= 0:
+                accept(start, start + len(key), entries)
+                start = lowered.find(key, start + 1)
+
+        matches.sort(key=lambda m: (m[0], m[1]))
+        return matches
+
+
+def _compile_deal_matcher() -> KeywordMatcher:
+    """
+    Compile the deal-text dictionaries
+
+    Payloads are (kind, priority, value, nestable); nestable hits are dropped
+    when they sit inside a longer place name ("Mesa" in "Costa Mesa").
+    """
+    matcher = KeywordMatcher()
+
+    priority = 0
+    for prop_type, keywords in PROPERTY_TYPE_KEYWORDS.items():
+        for keyword in keywords:
+            matcher.add(keyword, ("property_type", priority, prop_type, False))
+        priority += 1
+
+    for priority, city in enumerate(COMMON_CITIES):
+        matcher.add(city, ("city", priority, city, False))
+
+    # Gazetteer places and submarkets rank after the common cities, in file order
+    for priority, row in enumerate(get_gazetteer().rows(), start=len(COMMON_CITIES)):
+        if row["kind"] == "submarket":
+            payload = ("submarket", priority, row["market"], True)
+        else:
+            payload = ("city", priority, row["name"], True)
+        names = ([row["name"]] if row["text_match"] else []) + row["aliases"]
+        for name in names:
+            matcher.add(name, payload, whole_word=True, case_sensitive=True)
+
+    for priority, state in enumerate(US_STATES.values()):
+        matcher.add(state, ("state", priority, state, True), whole_word=True)
+
+    for priority, firm in enumerate(COMMON_FIRMS):
+        matcher.add(firm, ("firm", priority, firm, False))
+    for priority, firm in enumerate(OTHER_FIRMS, start=len(COMMON_FIRMS)):
+        matcher.add(firm, ("firm", priority, firm, False), whole_word=True)
+
+    matcher.build()
+    logger.debug(f"Compiled deal keyword matcher with {len(matcher)} keywords")
+    return matcher
+
+
+_deal_matcher: Optional[KeywordMatcher] = None
+_deal_matcher_lock = threading.Lock()
+
+
+def get_deal_matcher() -> KeywordMatcher:
+    """Get the process-wide deal keyword matcher (compiled on first use)"""
+    global _deal_matcher
+    if _deal_matcher is None:
+        with _deal_matcher_lock:
+            if _deal_matcher is None:
+                _deal_matcher = _compile_deal_matcher()
+    return _deal_matcher
+
+
+def scan_deal_text(text: str) -> Dict[str, List[str]]:
+    """
+    Find all dictionary hits in deal text with a single pass
+
+    Args:
+        text: Raw deal text
+
+    Returns:
+        Dictionary of kind ('property_type', 'city', 'state', 'submarket',
+        'firm') -> distinct matched values in priority order (submarket hits
+        are reported as their market)
+    """
+    return scan_deal_text_spans(text)[0]
+
+
+def scan_deal_text_spans(text: str) -> Tuple[Dict[str, List[str]], Dict[Tuple[str, str], Tuple[int, int]]]:
+    """
+    scan_deal_text, plus where each value first occurs
+
+    Returns:
+        Tuple of (hits, spans) where hits is the scan_deal_text result and
+        spans maps (kind, value) to the (start, end) of its first occurrence
+    """
+    hits = get_deal_matcher().find_all(text or "")
+
+    # Longest place name wins: drop nestable hits covered by a longer place hit
+    places = sorted(
+        ((start, end) for start, end, payload in hits if payload[0] in ("city", "state", "submarket")),
+        key=lambda span: (span[0], -span[1])
+    )
+    covered = set()
+    cover_start, cover_end = -1, -1
+    for start, end in places:
+        if end < cover_end or (end == cover_end and start > cover_start):
+            covered.add((start, end))
+        elif end > cover_end:
+            cover_start, cover_end = start, end
+
+    found: Dict[str, Dict[str, int]] = {
+        "property_type": {}, "city": {}, "state": {}, "submarket": {}, "firm": {}
+    }
+    spans: Dict[Tuple[str, str], Tuple[int, int]] = {}
+    for start, end, (kind, priority, value, nestable) in hits:
+        if nestable and (start, end) in covered:
+            continue
+        seen = found[kind]
+        if value not in seen or priority < seen[value]:
+            seen[value] = priority
+        if (kind, value) not in spans or start < spans[(kind, value)][0]:
+            spans[(kind, value)] = (start, end)
+
+    return {kind: sorted(values, key=values.get) for kind, values in found.items()}, spans
+
+
+@lru_cache(maxsize=8192)
+def resolve_market(name: Optional[str], state: Optional[str] = None) -> Optional[str]:
+    """
+    Resolve a city, submarket or alias to its market
+
+    Exact gazetteer names resolve with one lookup ("Plano" -> "Dallas",
+    "the Domain" -> "Austin"); otherwise the name is scanned for a known
+    place ("North Dallas" -> "Dallas", "austin" -> "Austin").
+
+    Args:
+        name: City or submarket name
+        state: Optional state code or name to pick between same-named places
+
+    Returns:
+        Market name, or None when nothing matches
+    """
+    if not name:
+        return None
+    market = market_of(name, normalize_state(state))
+    if market:
+        return market
+
+    hits = scan_deal_text(name)
+    if hits["city"]:
+        city = hits["city"][0]
+        return market_of(city, normalize_state(state)) or city
+    if hits["submarket"]:
+        return hits["submarket"][0]
+    return None
@@ -0,0 +1,280 @@
+"""
+Transcript model - word timings and diarized speaker turns in compact arrays
+
+A call transcript is one text string plus parallel NumPy arrays, one entry
+per word: character span in the text, start/end time, speaker and
+confidence. Consecutive words of the same speaker form a turn (one line of
+the text). Any character offset in the text maps back to an audio offset,
+so extracted deal fields can point at the moment the broker said them.
+"""
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+NO_SPEAKER = -1
+
+# Long recordings are diarized chunk by chunk, and a label only names the same
+# person within one request: speaker ids there are chunk * SPEAKERS_PER_SEGMENT
+# + label (see long_audio.stitch_words), so labels of different chunks never merge
+SPEAKERS_PER_SEGMENT = 100
+
+# Figures and terms a broker pitching a deal says; the speaker saying the most is the broker
+_DEAL_CUES = re.compile(
+    r"\$|\d+\s*%|percent|\bcap\b|\bNOI\b|\basking\b|\bunits?\b|\bbuilt\b|\boccup|\bsquare feet\b|\bSF\b|"
+    r"\bmillion\b|\boffers?\b|\bOM\b",
+    re.IGNORECASE
+)
+
+
+class Transcript:
+    """
+    Timestamped, speaker-labelled transcript
+
+    Attributes:
+        text: Transcript text; words are space separated and each speaker
+            turn starts a new line
+        char_starts, char_ends: int32 character span of each word in text
+        starts, ends: float32 seconds from the start of the call (NaN when
+            the source had no timings)
+        speakers: int16 diarized speaker per word (NO_SPEAKER when unknown)
+        confidences: float32 recognition confidence per word (NaN when unknown)
+    """
+
+    __slots__ = ("text", "char_starts", "char_ends", "starts", "ends", "speakers", "confidences")
+
+    def __init__(
+        self,
+        text: str,
+        char_starts: np.ndarray,
+        char_ends: np.ndarray,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        speakers: np.ndarray,
+        confidences: np.ndarray
+    ):
+        self.text = text
+        self.char_starts = np.asarray(char_starts, dtype=np.int32)
+        self.char_ends = np.asarray(char_ends, dtype=np.int32)
+        self.starts = np.asarray(starts, dtype=np.float32)
+        self.ends = np.asarray(ends, dtype=np.float32)
+        self.speakers = np.asarray(speakers, dtype=np.int16)
+        self.confidences = np.asarray(confidences, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return int(self.char_starts.size)
+
+    def __repr__(self) -> str:
+        return f"Transcript({len(self)} words, {len(self.turns())} turns, {self.duration or 0:.0f}s)"
+
+    @classmethod
+    def from_words(cls, words: Sequence[Dict]) -> "Transcript":
+        """
+        Build from Deepgram-style word dicts
+
+        Args:
+            words: Dicts with 'word', 'start', 'end' and optional
+                'punctuated_word', 'speaker', 'confidence'
+
+        Returns:
+            Transcript with one line per speaker turn
+        """
+        def number(value, default):
+            return default if value is None else value
+
+        return cls._from_tokens(
+            [word.get("punctuated_word") or word["word"] for word in words],
+            np.array([number(word.get("start"), np.nan) for word in words], dtype=np.float32),
+            np.array([number(word.get("end"), np.nan) for word in words], dtype=np.float32),
+            np.array([number(word.get("speaker"), NO_SPEAKER) for word in words], dtype=np.int16),
+            np.array([number(word.get("confidence"), np.nan) for word in words], dtype=np.float32),
+        )
+
+    @classmethod
+    def from_text(cls, text: str) -> "Transcript":
+        """Wrap plain text (no timings or speakers); the text is kept verbatim"""
+        text = text or ""
+        spans = np.array([match.span() for match in re.finditer(r"\S+", text)], dtype=np.int32).reshape(-1, 2)
+        count = len(spans)
+        return cls(
+            text, spans[:, 0], spans[:, 1],
+            np.full(count, np.nan), np.full(count, np.nan),
+            np.full(count, NO_SPEAKER), np.full(count, np.nan)
+        )
+
+    @classmethod
+    def _from_tokens(
+        cls,
+        tokens: Sequence[str],
+        starts: np.ndarray,
+        ends: np.ndarray,
+        speakers: np.ndarray,
+        confidences: np.ndarray
+    ) -> "Transcript":
+        """Join tokens into text, starting a new line at every speaker change"""
+        lengths = np.fromiter((len(token) for token in tokens), dtype=np.int32, count=len(tokens))
+        separators = np.ones(len(tokens), dtype=np.int32)
+        if len(tokens):
+            separators[0] = 0
+        char_starts = np.cumsum(lengths + separators, dtype=np.int32) - lengths
+
+        changes = set(np.flatnonzero(np.diff(speakers)) + 1)
+        parts = []
+        for index, token in enumerate(tokens):
+            if index:
+                parts.append("\n" if index in changes else " ")
+            parts.append(token)
+        return cls("".join(parts), char_starts, char_starts + lengths, starts, ends, speakers, confidences)
+
+    def to_dict(self) -> Dict:
+        """JSON-serializable form (for the transcript cache and run payloads)"""
+        return {
+            "text": self.text,
+            "char_starts": self.char_starts.tolist(),
+            "char_ends": self.char_ends.tolist(),
+            "starts": [None if np.isnan(t) else round(float(t), 3) for t in self.starts],
+            "ends": [None if np.isnan(t) else round(float(t), 3) for t in self.ends],
+            "speakers": self.speakers.tolist(),
+            "confidences": [None if np.isnan(c) else round(float(c), 4) for c in self.confidences],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Transcript":
+        """Inverse of to_dict"""
+        def floats(values):
+            return np.array([np.nan if v is None else v for v in values], dtype=np.float32)
+
+        return cls(
+            data["text"], data["char_starts"], data["char_ends"],
+            floats(data["starts"]), floats(data["ends"]),
+            data["speakers"], floats(data["confidences"])
+        )
+
+    @property
+    def has_timings(self) -> bool:
+        return bool(len(self)) and not np.isnan(self.starts).all()
+
+    @property
+    def duration(self) -> Optional[float]:
+        """Seconds from the start of the call to the end of the last word"""
+        if not self.has_timings:
+            return None
+        return float(np.nanmax(self.ends))
+
+    def speaker_ids(self) -> List[int]:
+        """Diarized speakers in order of first appearance"""
+        ids, first = np.unique(self.speakers[self.speakers != NO_SPEAKER], return_index=True)
+        return [int(ids[i]) for i in np.argsort(first)]
+
+    def _turn_bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        """First and one-past-last word index of each turn"""
+        if not len(self):
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        changes = np.flatnonzero(np.diff(self.speakers)) + 1
+        return np.concatenate(([0], changes)), np.concatenate((changes, [len(self)]))
+
+    def turns(self) -> List[Dict]:
+        """
+        Speaker turns (runs of consecutive words by one speaker)
+
+        Returns:
+            List of dicts with 'speaker', 'start', 'end' (seconds or None),
+            'char_start', 'char_end' and 'text'
+        """
+        result = []
+        for first, last in zip(*self._turn_bounds()):
+            char_start, char_end = int(self.char_starts[first]), int(self.char_ends[last - 1])
+            result.append({
+                "speaker": int(self.speakers[first]),
+                **self._times(first, last - 1),
+                "char_start": char_start,
+                "char_end": char_end,
+                "text": self.text[char_start:char_end],
+            })
+        return result
+
+    def _times(self, first: int, last: int) -> Dict[str, Optional[float]]:
+        start, end = self.starts[first], self.ends[last]
+        return {
+            "start": None if np.isnan(start) else round(float(start), 3),
+            "end": None if np.isnan(end) else round(float(end), 3),
+        }
+
+    def broker_speakers(self) -> List[int]:
+        """
+        Speakers pitching the deal
+
+        The speaker whose turns carry the most deal figures and terms (prices,
+        percentages, cap rate, NOI, units) is taken to be the broker. Each
+        separately diarized segment (see SPEAKERS_PER_SEGMENT) picks its own.
+
+        Returns:
+            [speaker] per segment, or [] when the transcript is not diarized
+        """
+        speakers = self.speaker_ids()
+        if len(speakers) < 2:
+            return speakers
+
+        cues: Dict[int, int] = {}
+        for turn in self.turns():
+            cues[turn["speaker"]] = cues.get(turn["speaker"], 0) + len(_DEAL_CUES.findall(turn["text"]))
+
+        segments: Dict[int, List[int]] = {}
+        for speaker in speakers:
+            segments.setdefault(speaker // SPEAKERS_PER_SEGMENT, []).append(speaker)
+        return [
+            max(segment, key=lambda speaker: cues.get(speaker, 0))
+            for _, segment in sorted(segments.items())
+        ]
+
+    def for_speakers(self, speakers: Iterable[int]) -> "Transcript":
+        """
+        Transcript of only the given speakers' words (timings unchanged)
+
+        Args:
+            speakers: Speaker ids to keep; empty keeps everything
+        """
+        speakers = list(speakers)
+        if not speakers:
+            return self
+        keep = np.isin(self.speakers, speakers)
+        if keep.all():
+            return self
+
+        indices = np.flatnonzero(keep)
+        tokens = [self.text[self.char_starts[i]:self.char_ends[i]] for i in indices]
+        # Each kept turn stays its own line even when two turns of one speaker become adjacent
+        turn_ids = np.cumsum(np.concatenate(([0], np.diff(self.speakers) != 0)))[indices]
+        restricted = self._from_tokens(
+            tokens, self.starts[indices], self.ends[indices], turn_ids, self.confidences[indices]
+        )
+        restricted.speakers = self.speakers[indices]
+        return restricted
+
+    def locate(self, char_start: int, char_end: Optional[int] = None) -> Optional[Dict]:
+        """
+        Audio position of a span of the text
+
+        Args:
+            char_start: Start character offset in text
+            char_end: End offset (defaults to char_start + 1)
+
+        Returns:
+            Dict with 'start', 'end' (seconds or None), 'speaker' and 'quote'
+            (the words covering the span), or None when the span holds no word
+        """
+        if not len(self):
+            return None
+        char_end = char_start + 1 if char_end is None else char_end
+        first = max(0, int(np.searchsorted(self.char_ends, char_start, side="right")))
+        last = int(np.searchsorted(self.char_starts, char_end, side="left")) - 1
+        if first >= len(self) or last < first:
+            return None
+        return {
+            **self._times(first, last),
+            "speaker": int(self.speakers[first]),
+            "quote": self.text[self.char_starts[first]:self.char_ends[last]],
+        }
@@ -0,0 +1,322 @@
+"""
+Underwriting engine - vectorized cash-flow projection, debt math and return metrics
+"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Base-case assumptions; the 75% LTV matches the leverage score_deal has always assumed
+DEFAULT_ASSUMPTIONS = {
+    "hold_years": 10,
+    "ltv": 0.75,
+    "interest_rate": 0.065,
+    "amortization_years": 30,
+    "rent_growth": 0.03,            # annual NOI growth
+    "exit_cap_spread": 0.005,       # exit cap = going-in cap + spread, unless exit_cap_rate is set
+    "exit_cap_rate": None,          # decimal, e.g. 0.07
+    "selling_costs": 0.02,          # fraction of sale price
+    "closing_costs": 0.015,         # fraction of purchase price, funded with equity
+    "reserves_per_unit": 250.0,     # annual replacement reserves per unit
+    "reserves_per_sf": 0.15,        # annual replacement reserves per SF (when no unit count)
+    "reserves_growth": 0.03,
+}
+
+# Going-in cap rates outside this range mean price or NOI was mis-extracted
+PLAUSIBLE_CAP_RATE_RANGE = (0.01, 0.25)
+
+
+def _grid_axis(values: Optional[Sequence[float]], default: float) -> np.ndarray:
+    return np.atleast_1d(np.asarray(values if values is not None else [default], dtype=np.float64))
+
+
+def annual_debt_service(loan, interest_rate, amortization_years: int) -> np.ndarray:
+    """Annual payment on a monthly-amortizing loan (loan and rate may be arrays)"""
+    months = amortization_years * 12
+    monthly_rate = np.asarray(interest_rate, dtype=np.float64) / 12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor = np.where(
+            monthly_rate == 0,
+            1.0 / months,
+            monthly_rate / (1 - (1 + monthly_rate) ** -months)
+        )
+    return loan * factor * 12
+
+
+def loan_balance(loan, interest_rate, amortization_years: int, years: int) -> np.ndarray:
+    """Outstanding balance of a monthly-amortizing loan after a number of years"""
+    months = years * 12
+    monthly_rate = np.asarray(interest_rate, dtype=np.float64) / 12
+    payment = annual_debt_service(loan, interest_rate, amortization_years) / 12
+    growth = (1 + monthly_rate) ** months
+    with np.errstate(divide="ignore", invalid="ignore"):
+        paid = np.where(monthly_rate == 0, payment * months, payment * (growth - 1) / monthly_rate)
+    return loan * growth - paid
+
+
+def _npv_and_slope(cash_flows: np.ndarray, x: np.ndarray):
+    """NPV as a polynomial in x = 1 / (1 + r) and its derivative in x, by Horner's rule"""
+    npv = cash_flows[:, -1].copy()
+    slope = np.zeros_like(npv)
+    for t in range(cash_flows.shape[1] - 2, -1, -1):
+        slope = slope * x + npv
+        npv = npv * x + cash_flows[:, t]
+    return npv, slope
+
+
+def irr(cash_flows: np.ndarray, guess: float = 0.1, max_iter: int = 50, tol: float = 1e-7) -> np.ndarray:
+    """
+    Internal rate of return along the last axis, solved by Newton's method for every row at once
+
+    Newton steps run on x = 1 / (1 + r), where NPV is a polynomial, and
+    only rows that have not converged yet are iterated.
+
+    Args:
+        cash_flows: Array of shape (..., periods), period 0 first
+        guess: Starting rate
+        max_iter: Newton iterations
+        tol: Convergence tolerance on NPV relative to the initial outlay
+
+    Returns:
+        Array of shape (...) with the IRR, NaN where it does not exist or did not converge
+    """
+    cash_flows = np.asarray(cash_flows, dtype=np.float64)
+    batch_shape = cash_flows.shape[:-1]
+    flows = cash_flows.reshape(-1, cash_flows.shape[-1])
+    scale = np.maximum(np.abs(flows[:, 0]), 1.0) * tol
+
+    # Rows without both an outflow and an inflow have no IRR
+    has_sign_change = (flows.min(axis=1) < 0) & (flows.max(axis=1) > 0)
+    x = np.full(flows.shape[0], 1.0 / (1.0 + guess))
+    converged = np.zeros(flows.shape[0], dtype=bool)
+    active = np.flatnonzero(has_sign_change)
+
+    for _ in range(max_iter):
+        if not active.size:
+            break
+        npv, slope = _npv_and_slope(flows[active], x[active])
+        done = np.abs(npv) < scale[active]
+        converged[active[done]] = True
+
+        step = np.divide(npv, slope, out=np.zeros_like(npv), where=slope != 0)
+        # x in [1/11, 100] keeps r within [-0.99, 10]
+        x[active] = np.where(done, x[active], np.clip(x[active] - step, 1.0 / 11.0, 100.0))
+        active = active[~done]
+
+    rate = 1.0 / x - 1.0
+    return np.where(converged, rate, np.nan).reshape(batch_shape)
+
+
+def project_cash_flows(
+    purchase_price: float,
+    noi: float,
+    units: Optional[int] = None,
+    square_feet: Optional[int] = None,
+    capex: float = 0.0,
+    assumptions: Optional[Dict] = None,
+    exit_cap_rates: Optional[Sequence[float]] = None,
+    rent_growths: Optional[Sequence[float]] = None,
+    ltvs: Optional[Sequence[float]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Project hold-period cash flows over a grid of exit caps x rent growth x LTV
+
+    Every scenario is evaluated in one pass: arrays broadcast to shape
+    (exit caps, rent growths, LTVs, years).
+
+    Args:
+        purchase_price: Purchase price in dollars
+        noi: In-place (year 1) NOI in dollars
+        units: Unit count, for per-unit replacement reserves
+        square_feet: Building size, for per-SF reserves when there is no unit count
+        capex: Up-front capital needs (e.g. deferred maintenance), spent in year 1
+        assumptions: Overrides for DEFAULT_ASSUMPTIONS
+        exit_cap_rates: Exit cap rates as decimals (default: from assumptions)
+        rent_growths: Annual NOI growth rates (default: from assumptions)
+        ltvs: Loan-to-value ratios (default: from assumptions)
+
+    Returns:
+        Dictionary of arrays:
+            - exit_cap_rates, rent_growths, ltvs: the grid axes
+            - noi: (G, years + 1) NOI path including the forward exit-year NOI
+            - levered_cash_flows, unlevered_cash_flows: (E, G, L, years + 1), year 0 first
+            - levered_irr, unlevered_irr, equity_multiple: (E, G, L)
+            - dscr, min_dscr, debt_yield: (L,) / (G, L) / (L,)
+            - loan_amount, annual_debt_service, equity: (L,)
+    """
+    a = {**DEFAULT_ASSUMPTIONS, **(assumptions or {})}
+    years = int(a["hold_years"])
+
+    going_in_cap = noi / purchase_price
+    default_exit_cap = a["exit_cap_rate"] or going_in_cap + a["exit_cap_spread"]
+
+    exit_caps = _grid_axis(exit_cap_rates, default_exit_cap)
+    growths = _grid_axis(rent_growths, a["rent_growth"])
+    ltv = _grid_axis(ltvs, a["ltv"])
+
+    # NOI path: years 1..years+1 (the last year prices the exit), shape (G, years + 1)
+    t = np.arange(years + 1, dtype=np.float64)
+    noi_path = noi * (1.0 + growths[:, None]) ** t
+
+    # Replacement reserves plus up-front capex in year 1, shape (years,)
+    if units:
+        reserves = a["reserves_per_unit"] * units
+    elif square_feet:
+        reserves = a["reserves_per_sf"] * square_feet
+    else:
+        reserves = 0.0
+    capex_path = reserves * (1.0 + a["reserves_growth"]) ** t[:years]
+    capex_path[0] += capex
+
+    # Debt, shape (L,)
+    loan = purchase_price * ltv
+    debt_service = annual_debt_service(loan, a["interest_rate"], a["amortization_years"])
+    balance = loan_balance(loan, a["interest_rate"], a["amortization_years"], years)
+    equity = purchase_price * (1.0 - ltv) + purchase_price * a["closing_costs"]
+
+    # Operating cash flow before debt, shape (G, years)
+    operating = noi_path[:, :years] - capex_path
+
+    # Net sale proceeds before debt payoff, shape (E, G)
+    sale = noi_path[None, :, years] / exit_caps[:, None] * (1.0 - a["selling_costs"])
+
+    shape = (exit_caps.size, growths.size, ltv.size, years + 1)
+    levered = np.zeros(shape)
+    levered[..., 0] = -equity[None, None, :]
+    levered[..., 1:] = operating[None, :, None, :] - debt_service[None, None, :, None]
+    levered[..., years] += sale[:, :, None] - balance[None, None, :]
+
+    unlevered = np.zeros(shape[:2] + (years + 1,))
+    unlevered[..., 0] = -purchase_price * (1.0 + a["closing_costs"])
+    unlevered[..., 1:] = operating[None, :, :]
+    unlevered[..., years] += sale
+
+    equity_multiple = levered[..., 1:].sum(axis=-1) / equity[None, None, :]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dscr = np.where(debt_service > 0, noi / debt_service, np.nan)
+        min_dscr = np.where(
+            debt_service[None, :] > 0,
+            noi_path[:, :years].min(axis=1)[:, None] / debt_service[None, :],
+            np.nan
+        )
+        debt_yield = np.where(loan > 0, noi / loan, np.nan)
+
+    return {
+        "exit_cap_rates": exit_caps,
+        "rent_growths": growths,
+        "ltvs": ltv,
+        "noi": noi_path,
+        "levered_cash_flows": levered,
+        "unlevered_cash_flows": unlevered,
+        "levered_irr": irr(levered),
+        "unlevered_irr": np.broadcast_to(irr(unlevered)[..., None], shape[:3]),
+        "equity_multiple": equity_multiple,
+        "dscr": dscr,
+        "min_dscr": min_dscr,
+        "debt_yield": debt_yield,
+        "loan_amount": loan,
+        "annual_debt_service": debt_service,
+        "equity": equity,
+    }
+
+
+def deal_inputs(struct: Dict) -> Optional[Dict]:
+    """Pull projection inputs from a structured deal (None when price/NOI are missing or implausible)"""
+    purchase_price = struct.get("purchase_price") or struct.get("asking_price")
+    noi = struct.get("noi")
+    if not purchase_price or not noi:
+        return None
+    low, high = PLAUSIBLE_CAP_RATE_RANGE
+    if not low <= noi / purchase_price <= high:
+        return None
+    return {
+        "purchase_price": float(purchase_price),
+        "noi": float(noi),
+        "units": struct.get("units"),
+        "square_feet": struct.get("square_feet"),
+        "capex": float(struct.get("deferred_maintenance") or 0.0),
+    }
+
+
+def _finite(value) -> Optional[float]:
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def underwrite_deal(struct: Dict, assumptions: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Base-case underwriting for a structured deal
+
+    Args:
+        struct: Structured deal data (needs purchase/asking price and NOI)
+        assumptions: Overrides for DEFAULT_ASSUMPTIONS
+
+    Returns:
+        Dictionary of scalar metrics, or None when price or NOI is missing
+        or implies an implausible going-in cap rate
+    """
+    inputs = deal_inputs(struct)
+    if inputs is None:
+        return None
+
+    projection = project_cash_flows(**inputs, assumptions=assumptions)
+    a = {**DEFAULT_ASSUMPTIONS, **(assumptions or {})}
+
+    return {
+        "ltv": float(projection["ltvs"][0]),
+        "loan_amount": float(projection["loan_amount"][0]),
+        "annual_debt_service": float(projection["annual_debt_service"][0]),
+        "equity": float(projection["equity"][0]),
+        "exit_cap_rate": float(projection["exit_cap_rates"][0]),
+        "hold_years": int(a["hold_years"]),
+        "capex": inputs["capex"],
+        "levered_irr": _finite(projection["levered_irr"][0, 0, 0]),
+        "unlevered_irr": _finite(projection["unlevered_irr"][0, 0, 0]),
+        "equity_multiple": _finite(projection["equity_multiple"][0, 0, 0]),
+        "dscr": _finite(projection["dscr"][0]),
+        "min_dscr": _finite(projection["min_dscr"][0, 0]),
+        "debt_yield": _finite(projection["debt_yield"][0]),
+    }
+
+
+def scenario_grid(
+    struct: Dict,
+    exit_cap_rates: Sequence[float],
+    rent_growths: Sequence[float],
+    ltvs: Sequence[float],
+    assumptions: Optional[Dict] = None
+) -> List[Dict]:
+    """
+    Evaluate a deal over every combination of exit cap, rent growth and LTV
+
+    Returns:
+        One record per scenario with exit_cap_rate, rent_growth, ltv,
+        levered_irr, equity_multiple, dscr and debt_yield (empty when
+        underwrite_deal would return None)
+    """
+    inputs = deal_inputs(struct)
+    if inputs is None:
+        return []
+
+    p = project_cash_flows(
+        **inputs,
+        assumptions=assumptions,
+        exit_cap_rates=exit_cap_rates,
+        rent_growths=rent_growths,
+        ltvs=ltvs
+    )
+
+    records = []
+    for e, exit_cap in enumerate(p["exit_cap_rates"]):
+        for g, growth in enumerate(p["rent_growths"]):
+            for l, ltv in enumerate(p["ltvs"]):
+                records.append({
+                    "exit_cap_rate": float(exit_cap),
+                    "rent_growth": float(growth),
+                    "ltv": float(ltv),
+                    "levered_irr": _finite(p["levered_irr"][e, g, l]),
+                    "equity_multiple": _finite(p["equity_multiple"][e, g, l]),
+                    "dscr": _finite(p["dscr"][l]),
+                    "debt_yield": _finite(p["debt_yield"][l]),
+                })
+    return records
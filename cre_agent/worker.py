@@ -0,0 +1,206 @@
+"""
+Job worker - processes queued deal jobs with a pool of threads
+
+Run one or more per host:
+
+    python -m cre_agent.worker --concurrency 4
+
+Each worker claims jobs from the shared SQLite queue (see jobs.py), runs
+them on its threads and renews their leases while they work. SIGINT/SIGTERM
+stop claiming new jobs and let running ones finish; jobs of a worker that
+is killed outright are picked up again by another worker once their lease
+expires. The app can also host a worker in-process (get_local_worker).
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+
+from .jobs import DEAL_JOB, DEFAULT_LEASE_SECONDS, JobQueue, get_job_queue
+
+logger = logging.getLogger(__name__)
+
+# progress(fraction, message) - reports progress and renews the job's lease
+ProgressCallback = Callable[[float, str], None]
+
+
+def run_deal_job(payload: Dict, progress: ProgressCallback) -> Dict:
+    """Handler for deal jobs: run the agent pipeline and return the run payload"""
+    from .agent_orchestrator import run_deal_agent
+    from .config import load_settings
+    from .transcript import Transcript
+
+    transcript = Transcript.from_dict(payload["transcript"]) if payload.get("transcript") else None
+    return run_deal_agent(
+        payload["raw_text"],
+        payload["buybox"],
+        load_settings(),
+        known_fields=payload.get("known_fields"),
+        transcript=transcript,
+        progress=progress
+    )
+
+
+# Job kind -> handler(payload, progress) returning a JSON-serializable result
+JOB_HANDLERS: Dict[str, Callable[[Dict, ProgressCallback], object]] = {
+    DEAL_JOB: run_deal_job,
+}
+
+
+class Worker:
+    """Pool of threads claiming and running jobs from a JobQueue"""
+
+    def __init__(
+        self,
+        queue: Optional[JobQueue] = None,
+        concurrency: int = 2,
+        poll_interval: float = 1.0,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        worker_id: Optional[str] = None
+    ):
+        self.queue = queue or get_job_queue()
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:4]}"
+        self.stop_event = threading.Event()
+        self._active: Dict[str, float] = {}
+        self._active_lock = threading.Lock()
+
+    def stop(self) -> None:
+        """Stop claiming jobs; running jobs finish"""
+        self.stop_event.set()
+
+    def run_one(self) -> bool:
+        """
+        Claim and run a single job on the calling thread
+
+        Returns:
+            True if a job was run, False if the queue had nothing runnable
+        """
+        job = self.queue.claim(self.worker_id, self.lease_seconds)
+        if job is None:
+            return False
+
+        job_id = job["job_id"]
+        handler = JOB_HANDLERS.get(job["kind"])
+        if handler is None:
+            self.queue.fail(job_id, self.worker_id, f"Unknown job kind {job['kind']!r}")
+            return True
+
+        def progress(fraction: float, message: str) -> None:
+            self.queue.heartbeat(job_id, self.worker_id, self.lease_seconds, progress=fraction, message=message)
+
+        with self._active_lock:
+            self._active[job_id] = 0.0
+        logger.info(f"Worker {self.worker_id} running {job['kind']} job {job_id} (attempt {job['attempts']})")
+        try:
+            result = handler(job["payload"], progress)
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed")
+            status = self.queue.fail(job_id, self.worker_id, f"{type(e).__name__}: {e}")
+            if status == "queued":
+                logger.info(f"Job {job_id} will be retried")
+        else:
+            if not self.queue.complete(job_id, self.worker_id, result):
+                logger.warning(f"Job {job_id} finished after its lease was lost; result discarded")
+        finally:
+            with self._active_lock:
+                self._active.pop(job_id, None)
+        return True
+
+    def _work_loop(self) -> None:
+        while not self.stop_event.is_set():
+            try:
+                ran = self.run_one()
+            except Exception:
+                logger.exception(f"Worker {self.worker_id} could not claim a job")
+                ran = False
+            if not ran:
+                self.stop_event.wait(self.poll_interval)
+
+    def _heartbeat_loop(self) -> None:
+        # Keep leases of long-running jobs alive even when handlers report no progress
+        while not self.stop_event.wait(self.lease_seconds / 3):
+            with self._active_lock:
+                job_ids = list(self._active)
+            for job_id in job_ids:
+                self.queue.heartbeat(job_id, self.worker_id, self.lease_seconds)
+
+    def run(self) -> None:
+        """Run until stop() is called (blocks; running jobs finish before it returns)"""
+        logger.info(f"Worker {self.worker_id} started with {self.concurrency} threads on {self.queue.path}")
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job-worker") as pool:
+            for _ in range(self.concurrency):
+                pool.submit(self._work_loop)
+        logger.info(f"Worker {self.worker_id} stopped")
+
+    def start(self) -> threading.Thread:
+        """Run in a background daemon thread"""
+        thread = threading.Thread(target=self.run, name=f"worker-{self.worker_id}", daemon=True)
+        thread.start()
+        return thread
+
+
+_local_worker: Optional[Worker] = None
+_local_worker_lock = threading.Lock()
+
+
+def get_local_worker(concurrency: int = 2, queue_path: Optional[Union[str, Path]] = None) -> Worker:
+    """
+    Get the worker running inside this process, starting it on first call
+
+    Lets a single app server process its own jobs without a separate
+    worker process; extra worker processes can still share the queue.
+    """
+    global _local_worker
+    if _local_worker is None:
+        with _local_worker_lock:
+            if _local_worker is None:
+                worker = Worker(get_job_queue(queue_path), concurrency=concurrency)
+                worker.start()
+                _local_worker = worker
+    return _local_worker
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Process queued CRE deal jobs")
+    parser.add_argument("--concurrency", type=int,
+                        help="Jobs run at once (default: the job_workers setting, JOB_WORKERS in the env or .env)")
+    parser.add_argument("--queue", help="Queue database (default: runs/jobs.sqlite)")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between polls when idle")
+    parser.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help="Seconds before an unresponsive worker's job is reclaimed")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if args.concurrency is None:
+        # Same config as the app and the server
+        from .config import load_settings
+        args.concurrency = load_settings().job_workers
+    worker = Worker(
+        get_job_queue(args.queue),
+        concurrency=max(1, args.concurrency),
+        poll_interval=args.poll_interval,
+        lease_seconds=args.lease
+    )
+
+    def shutdown(signum, frame):
+        logger.info(f"Received signal {signum}; finishing running jobs")
+        worker.stop()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Load test for the deal agent HTTP API
+
+Fires deal submissions at a running server with a fixed number of
+concurrent clients and reports throughput and latency percentiles.
+
+    uvicorn cre_agent.server:app --port 8000
+    python load_test.py --url http://127.0.0.1:8000 --requests 2000 --concurrency 300
+    python load_test.py --mode async --requests 2000 --concurrency 300
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+import numpy as np
+
+from cre_agent.examples import get_all_examples
+
+
+async def submit_sync(client: httpx.AsyncClient, text: str) -> int:
+    response = await client.post("/deals", json={"raw_text": text})
+    return response.status_code
+
+
+async def submit_async(client: httpx.AsyncClient, text: str, poll_interval: float) -> int:
+    response = await client.post("/deals/async", json={"raw_text": text})
+    if response.status_code != 202:
+        return response.status_code
+    status_url = response.json()["status_url"]
+    while True:
+        await asyncio.sleep(poll_interval)
+        job = (await client.get(status_url)).json()
+        if job["status"] == "succeeded":
+            return 200
+        if job["status"] in ("failed", "cancelled"):
+            return 500
+
+
+async def run_load(args) -> Dict:
+    texts = list(get_all_examples().values())
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    counter = iter(range(args.requests))
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout, connect=10.0)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=timeout) as client:
+        async def client_loop():
+            for index in counter:
+                text = texts[index % len(texts)]
+                if args.unique:
+                    # Distinct text so each submission is processed, not deduplicated
+                    text = f"{text}\n\nRef {uuid.uuid4().hex}"
+                started = time.perf_counter()
+                try:
+                    if args.mode == "sync":
+                        status = await submit_sync(client, text)
+                    else:
+                        status = await submit_async(client, text, args.poll_interval)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - started)
+                statuses[status] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latency_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "statuses": dict(statuses),
+        "p50": float(np.percentile(latency_ms, 50)),
+        "p95": float(np.percentile(latency_ms, 95)),
+        "p99": float(np.percentile(latency_ms, 99)),
+        "max": float(latency_ms.max()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the deal agent HTTP API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--requests", type=int, default=1000, help="Total submissions")
+    parser.add_argument("--concurrency", type=int, default=200, help="Concurrent clients")
+    parser.add_argument("--mode", choices=["sync", "async"], default="sync",
+                        help="POST /deals, or POST /deals/async and poll the job")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Client timeout per request (s)")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--no-unique", dest="unique", action="store_false",
+                        help="Resubmit identical texts (exercises the dedup path)")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_load(args))
+    print(f"{result['requests']} {args.mode} submissions, {args.concurrency} concurrent clients")
+    print(f"  elapsed     {result['elapsed']:.1f}s")
+    print(f"  throughput  {result['throughput']:.1f} req/s")
+    print(f"  latency     p50 {result['p50']:.0f}ms  p95 {result['p95']:.0f}ms  "
+          f"p99 {result['p99']:.0f}ms  max {result['max']:.0f}ms")
+    print(f"  statuses    {result['statuses']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,144 +1,525 @@
-"""
-View and download evidence files from S3
-"""
-import boto3
-import json
-import sys
-from cre_agent.config import load_settings
-
-
-def list_evidence_files(bucket_name: str, prefix: str = "evidence/", region: str = "us-east-1"):
-    """List all evidence files in the bucket"""
-    try:
-        s3_client = boto3.client("s3", region_name=region)
-        response = s3_client.list_objects_v2(
-            Bucket=bucket_name,
-            Prefix=prefix,
-            MaxKeys=100
-        )
-        
-        if "Contents" in response:
-            print(f"\n📁 Found {len(response['Contents'])} evidence files:\n")
-            for i, obj in enumerate(response["Contents"], 1):
-                size_kb = obj['Size'] / 1024
-                print(f"{i}. {obj['Key']}")
-                print(f"   Size: {size_kb:.2f} KB | Modified: {obj['LastModified']}")
-            return response["Contents"]
-        else:
-            print(f"\n⚠️  No evidence files found with prefix '{prefix}'")
-            return []
-    except Exception as e:
-        print(f"❌ Error listing files: {e}")
-        return []
-
-
-def view_evidence_file(bucket_name: str, key: str, region: str = "us-east-1"):
-    """View an evidence file"""
-    try:
-        s3_client = boto3.client("s3", region_name=region)
-        response = s3_client.get_object(Bucket=bucket_name, Key=key)
-        content = response["Body"].read().decode("utf-8")
-        evidence = json.loads(content)
-        
-        print("=" * 60)
-        print(f"Evidence File: {key}")
-        print("=" * 60)
-        print(json.dumps(evidence, indent=2))
-        print("=" * 60)
-        
-        return evidence
-    except Exception as e:
-        print(f"❌ Error viewing file: {e}")
-        return None
-
-
-def download_evidence_file(bucket_name: str, key: str, output_path: str = None, region: str = "us-east-1"):
-    """Download an evidence file"""
-    try:
-        s3_client = boto3.client("s3", region_name=region)
-        
-        if not output_path:
-            # Use filename from key
-            output_path = key.split("/")[-1]
-        
-        print(f"Downloading {key} to {output_path}...")
-        s3_client.download_file(bucket_name, key, output_path)
-        print(f"✅ Downloaded to: {output_path}")
-        return output_path
-    except Exception as e:
-        print(f"❌ Error downloading file: {e}")
-        return None
-
-
-def get_s3_url(bucket_name: str, key: str, region: str = "us-east-1") -> str:
-    """Generate S3 URL (requires proper permissions)"""
-    return f"https://{bucket_name}.s3.{region}.amazonaws.com/{key}"
-
-
-if __name__ == "__main__":
-    import argparse
-    
-    parser = argparse.ArgumentParser(description="View and manage S3 evidence files")
-    parser.add_argument(
-        "--action",
-        type=str,
-        choices=["list", "view", "download"],
-        default="list",
-        help="Action to perform"
-    )
-    parser.add_argument(
-        "--key",
-        type=str,
-        help="S3 object key (for view/download)"
-    )
-    parser.add_argument(
-        "--output",
-        type=str,
-        help="Output file path (for download)"
-    )
-    parser.add_argument(
-        "--bucket-name",
-        type=str,
-        help="S3 bucket name (default: from .env)"
-    )
-    parser.add_argument(
-        "--region",
-        type=str,
-        default="us-east-1",
-        help="AWS region"
-    )
-    
-    args = parser.parse_args()
-    
-    # Get bucket name from settings or args
-    if args.bucket_name:
-        bucket_name = args.bucket_name
-    else:
-        settings = load_settings()
-        if not settings.s3_bucket:
-            print("❌ S3_BUCKET not configured. Use --bucket-name or set in .env")
-            sys.exit(1)
-        bucket_name = settings.s3_bucket
-    
-    print(f"Using bucket: {bucket_name} (region: {args.region})")
-    
-    if args.action == "list":
-        files = list_evidence_files(bucket_name, region=args.region)
-        if files:
-            print(f"\n💡 To view a file:")
-            print(f"   python view_s3_evidence.py --action view --key \"{files[0]['Key']}\"")
-            print(f"\n💡 To download a file:")
-            print(f"   python view_s3_evidence.py --action download --key \"{files[0]['Key']}\"")
-    
-    elif args.action == "view":
-        if not args.key:
-            print("❌ --key is required for view action")
-            sys.exit(1)
-        view_evidence_file(bucket_name, args.key, args.region)
-    
-    elif args.action == "download":
-        if not args.key:
-            print("❌ --key is required for download action")
-            sys.exit(1)
-        download_evidence_file(bucket_name, args.key, args.output, args.region)
-
+"""
+View and download evidence files from S3
+"""
+import boto3
+import hashlib
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from botocore.config import Config
+
+from cre_agent.config import load_settings
+from cre_agent.storage import parse_evidence_s3_key
+
+
+EVIDENCE_PREFIX = "evidence/"
+INDEX_NAME = "index.json"
+CURSOR_NAME = "cursor.json"
+
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    """Parse a YYYY-MM-DD string (None passes through)"""
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def _list_common_prefixes(s3_client, bucket_name: str, prefix: str) -> List[str]:
+    """List the immediate "sub-directories" of a prefix without listing the objects below them"""
+    prefixes = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix, Delimiter="/"):
+        prefixes.extend(p["Prefix"] for p in page.get("CommonPrefixes", []))
+    return prefixes
+
+
+def iter_partition_prefixes(
+    s3_client,
+    bucket_name: str,
+    prefix: str = EVIDENCE_PREFIX,
+    since: Optional[date] = None,
+    until: Optional[date] = None
+) -> Iterator[str]:
+    """
+    Yield the evidence/YYYY/MM/DD/ partitions that can contain matching packets
+
+    With both bounds set the partitions are generated directly. Otherwise the
+    year/month/day levels are walked with a delimiter, pruning any level that
+    falls outside the requested range, so only partition names are listed.
+    """
+    if since and until:
+        day = since
+        while day <= until:
+            yield f"{prefix}{day:%Y/%m/%d}/"
+            day += timedelta(days=1)
+        return
+
+    lo = since or date.min
+    hi = until or date.max
+
+    for year_prefix in _list_common_prefixes(s3_client, bucket_name, prefix):
+        year = year_prefix[len(prefix):].strip("/")
+        if not year.isdigit() or not lo.year <= int(year) <= hi.year:
+            continue
+        for month_prefix in _list_common_prefixes(s3_client, bucket_name, year_prefix):
+            month = month_prefix[len(year_prefix):].strip("/")
+            if not month.isdigit():
+                continue
+            if (int(year), int(month)) < (lo.year, lo.month) or (int(year), int(month)) > (hi.year, hi.month):
+                continue
+            for day_prefix in _list_common_prefixes(s3_client, bucket_name, month_prefix):
+                day_str = day_prefix[len(month_prefix):].strip("/")
+                try:
+                    day = date(int(year), int(month), int(day_str))
+                except ValueError:
+                    continue
+                if lo <= day <= hi:
+                    yield day_prefix
+
+
+def iter_evidence_objects(
+    s3_client,
+    bucket_name: str,
+    prefix: str = EVIDENCE_PREFIX,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    run_id: Optional[str] = None
+) -> Iterator[Dict]:
+    """
+    Yield evidence object summaries using paginated listing
+
+    Keys follow evidence/YYYY/MM/DD/<run_id>_<timestamp>.json, so date and
+    run_id filters are pushed into the listing prefix instead of being applied
+    after listing the whole bucket.
+    """
+    if since or until or run_id:
+        partitions = iter_partition_prefixes(s3_client, bucket_name, prefix, since, until)
+    else:
+        partitions = iter([prefix])
+
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for partition in partitions:
+        list_prefix = f"{partition}{run_id}_" if run_id else partition
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=list_prefix):
+            yield from page.get("Contents", [])
+
+
+def list_evidence_files(
+    bucket_name: str,
+    prefix: str = EVIDENCE_PREFIX,
+    region: str = "us-east-1",
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    run_id: Optional[str] = None
+):
+    """List evidence files in the bucket, optionally filtered by date range and run_id"""
+    try:
+        s3_client = boto3.client("s3", region_name=region)
+        files = list(iter_evidence_objects(s3_client, bucket_name, prefix, since, until, run_id))
+
+        if files:
+            print(f"\n📁 Found {len(files)} evidence files:\n")
+            for i, obj in enumerate(files, 1):
+                size_kb = obj['Size'] / 1024
+                print(f"{i}. {obj['Key']}")
+                print(f"   Size: {size_kb:.2f} KB | Modified: {obj['LastModified']}")
+            return files
+        else:
+            print(f"\n⚠️  No evidence files found with prefix '{prefix}'")
+            return []
+    except Exception as e:
+        print(f"❌ Error listing files: {e}")
+        return []
+
+
+def _object_path(root: Path, digest: str) -> Path:
+    return root / "objects" / digest[:2] / f"{digest}.json"
+
+
+def _load_json(path: Path, default):
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    return default
+
+
+def _save_json(path: Path, data) -> None:
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    tmp_path.replace(path)
+
+
+def mirror_evidence_files(
+    bucket_name: str,
+    objects: List[Dict],
+    mirror_dir: str = "./evidence_mirror",
+    region: str = "us-east-1",
+    workers: int = 16
+) -> Dict[str, int]:
+    """
+    Download evidence objects into the local content-addressed mirror
+
+    Mirror layout:
+        objects/<xx>/<sha256>.json   packet bodies, stored once per unique content
+        index.json                   key -> {etag, sha256, date, run_id}
+
+    Objects whose ETag matches the index entry are skipped. Downloads run on
+    a bounded thread pool; large objects use ranged, multi-part transfers.
+
+    Args:
+        bucket_name: S3 bucket name
+        objects: Object summaries from iter_evidence_objects
+        mirror_dir: Local mirror root
+        region: AWS region
+        workers: Maximum concurrent downloads
+
+    Returns:
+        Counts of downloaded, skipped and failed objects
+    """
+    from boto3.s3.transfer import TransferConfig
+
+    root = Path(mirror_dir)
+    (root / "objects").mkdir(parents=True, exist_ok=True)
+    index = _load_json(root / INDEX_NAME, {})
+
+    # boto3 clients are thread-safe; share one connection pool sized for the workers
+    s3_client = boto3.client(
+        "s3",
+        region_name=region,
+        config=Config(max_pool_connections=max(10, workers * 2))
+    )
+    transfer_config = TransferConfig(
+        multipart_threshold=8 * 1024 * 1024,
+        multipart_chunksize=8 * 1024 * 1024,
+        max_concurrency=4
+    )
+
+    counts = {"downloaded": 0, "skipped": 0, "failed": 0}
+    pending = []
+    for obj in objects:
+        entry = index.get(obj["Key"])
+        if entry and entry["etag"] == obj.get("ETag") and _object_path(root, entry["sha256"]).exists():
+            counts["skipped"] += 1
+        else:
+            pending.append(obj)
+
+    def _download(obj: Dict) -> str:
+        tmp_path = root / "objects" / f".{hashlib.sha1(obj['Key'].encode()).hexdigest()}.part"
+        s3_client.download_file(bucket_name, obj["Key"], str(tmp_path), Config=transfer_config)
+
+        sha = hashlib.sha256()
+        with open(tmp_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(block)
+        digest = sha.hexdigest()
+
+        object_path = _object_path(root, digest)
+        if object_path.exists():
+            tmp_path.unlink()
+        else:
+            object_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.replace(object_path)
+        return digest
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_download, obj): obj for obj in pending}
+        for future in as_completed(futures):
+            obj = futures[future]
+            try:
+                digest = future.result()
+                index[obj["Key"]] = {
+                    "etag": obj.get("ETag"),
+                    "sha256": digest,
+                    **parse_evidence_s3_key(obj["Key"])
+                }
+                counts["downloaded"] += 1
+            except Exception as e:
+                print(f"❌ Error downloading {obj['Key']}: {e}")
+                counts["failed"] += 1
+
+    _save_json(root / INDEX_NAME, index)
+    return counts
+
+
+def sync_evidence_mirror(
+    bucket_name: str,
+    mirror_dir: str = "./evidence_mirror",
+    region: str = "us-east-1",
+    workers: int = 16
+) -> Dict[str, int]:
+    """
+    Incrementally sync the evidence prefix into the local mirror
+
+    A cursor file records the newest date partition seen. Each sync lists
+    only that partition and the ones after it (the cursor day is re-listed
+    because keys within a day are ordered by run_id, not upload time), so
+    older partitions are never listed again.
+
+    Returns:
+        Counts of downloaded, skipped and failed objects plus partitions listed
+    """
+    root = Path(mirror_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    cursor = _load_json(root / CURSOR_NAME, {})
+    since = parse_date(cursor.get("partition_date"))
+
+    s3_client = boto3.client("s3", region_name=region)
+    paginator = s3_client.get_paginator("list_objects_v2")
+
+    if since:
+        partitions = list(iter_partition_prefixes(s3_client, bucket_name, since=since))
+    else:
+        partitions = list(iter_partition_prefixes(s3_client, bucket_name))
+
+    objects = []
+    for partition in partitions:
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=partition):
+            objects.extend(page.get("Contents", []))
+
+    counts = mirror_evidence_files(bucket_name, objects, mirror_dir, region, workers)
+    counts["partitions"] = len(partitions)
+
+    # Only advance the cursor past partitions that synced cleanly
+    if partitions and counts["failed"] == 0:
+        newest = "-".join(partitions[-1].strip("/").split("/")[-3:])
+        _save_json(root / CURSOR_NAME, {
+            "partition_date": newest,
+            "synced_at": datetime.now().isoformat()
+        })
+
+    return counts
+
+
+def query_mirror(
+    mirror_dir: str = "./evidence_mirror",
+    run_id: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    verdict: Optional[str] = None
+) -> List[Dict]:
+    """
+    Query evidence packets from the local mirror (no network access)
+
+    Args:
+        mirror_dir: Local mirror root
+        run_id: Only packets for this run
+        since: Only packets on or after this date
+        until: Only packets on or before this date
+        verdict: Only packets with this analysis verdict
+
+    Returns:
+        List of evidence packets with their S3 key under "_key"
+    """
+    root = Path(mirror_dir)
+    index = _load_json(root / INDEX_NAME, {})
+
+    results = []
+    for key in sorted(index):
+        entry = index[key]
+        if run_id and entry.get("run_id") != run_id:
+            continue
+        packet_date = parse_date(entry.get("date"))
+        if since and (packet_date is None or packet_date < since):
+            continue
+        if until and (packet_date is None or packet_date > until):
+            continue
+
+        with open(_object_path(root, entry["sha256"])) as f:
+            evidence = json.load(f)
+        if verdict and evidence.get("analysis", {}).get("verdict") != verdict:
+            continue
+
+        evidence["_key"] = key
+        results.append(evidence)
+
+    return results
+
+
+def view_evidence_file(bucket_name: str, key: str, region: str = "us-east-1"):
+    """View an evidence file"""
+    try:
+        s3_client = boto3.client("s3", region_name=region)
+        response = s3_client.get_object(Bucket=bucket_name, Key=key)
+        content = response["Body"].read().decode("utf-8")
+        evidence = json.loads(content)
+        
+        print("=" * 60)
+        print(f"Evidence File: {key}")
+        print("=" * 60)
+        print(json.dumps(evidence, indent=2))
+        print("=" * 60)
+        
+        return evidence
+    except Exception as e:
+        print(f"❌ Error viewing file: {e}")
+        return None
+
+
+def download_evidence_file(bucket_name: str, key: str, output_path: str = None, region: str = "us-east-1"):
+    """Download an evidence file"""
+    try:
+        s3_client = boto3.client("s3", region_name=region)
+        
+        if not output_path:
+            # Use filename from key
+            output_path = key.split("/")[-1]
+        
+        print(f"Downloading {key} to {output_path}...")
+        s3_client.download_file(bucket_name, key, output_path)
+        print(f"✅ Downloaded to: {output_path}")
+        return output_path
+    except Exception as e:
+        print(f"❌ Error downloading file: {e}")
+        return None
+
+
+def get_s3_url(bucket_name: str, key: str, region: str = "us-east-1") -> str:
+    """Generate S3 URL (requires proper permissions)"""
+    return f"https://{bucket_name}.s3.{region}.amazonaws.com/{key}"
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="View and manage S3 evidence files")
+    parser.add_argument(
+        "--action",
+        type=str,
+        choices=["list", "view", "download", "mirror", "sync", "query"],
+        default="list",
+        help="Action to perform"
+    )
+    parser.add_argument(
+        "--key",
+        type=str,
+        help="S3 object key (for view/download)"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Output file path (for download)"
+    )
+    parser.add_argument(
+        "--since",
+        type=str,
+        help="Only packets on or after this date (YYYY-MM-DD)"
+    )
+    parser.add_argument(
+        "--until",
+        type=str,
+        help="Only packets on or before this date (YYYY-MM-DD)"
+    )
+    parser.add_argument(
+        "--run-id",
+        type=str,
+        help="Only packets for this run ID"
+    )
+    parser.add_argument(
+        "--mirror-dir",
+        type=str,
+        default="./evidence_mirror",
+        help="Local mirror directory (for mirror/sync/query)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=16,
+        help="Concurrent downloads (for mirror/sync)"
+    )
+    parser.add_argument(
+        "--verdict",
+        type=str,
+        help="Only packets with this verdict (for query)"
+    )
+    parser.add_argument(
+        "--bucket-name",
+        type=str,
+        help="S3 bucket name (default: from .env)"
+    )
+    parser.add_argument(
+        "--region",
+        type=str,
+        default="us-east-1",
+        help="AWS region"
+    )
+    
+    args = parser.parse_args()
+    
+    since = parse_date(args.since)
+    until = parse_date(args.until)
+
+    # Queries run against the local mirror only
+    if args.action == "query":
+        packets = query_mirror(args.mirror_dir, args.run_id, since, until, args.verdict)
+        print(f"\n📁 {len(packets)} evidence packets in {args.mirror_dir}:\n")
+        for packet in packets:
+            analysis = packet.get("analysis", {})
+            print(f"{packet['_key']}")
+            print(f"   Run: {packet.get('run_id')} | Score: {analysis.get('score')} | Verdict: {analysis.get('verdict')}")
+        sys.exit(0)
+
+    # Get bucket name from settings or args
+    if args.bucket_name:
+        bucket_name = args.bucket_name
+    else:
+        settings = load_settings()
+        if not settings.s3_bucket:
+            print("❌ S3_BUCKET not configured. Use --bucket-name or set in .env")
+            sys.exit(1)
+        bucket_name = settings.s3_bucket
+    
+    print(f"Using bucket: {bucket_name} (region: {args.region})")
+    
+    if args.action == "list":
+        files = list_evidence_files(
+            bucket_name,
+            region=args.region,
+            since=since,
+            until=until,
+            run_id=args.run_id
+        )
+        if files:
+            print(f"\n💡 To view a file:")
+            print(f"   python view_s3_evidence.py --action view --key \"{files[0]['Key']}\"")
+            print(f"\n💡 To download a file:")
+            print(f"   python view_s3_evidence.py --action download --key \"{files[0]['Key']}\"")
+    
+    elif args.action == "view":
+        if not args.key:
+            print("❌ --key is required for view action")
+            sys.exit(1)
+        view_evidence_file(bucket_name, args.key, args.region)
+    
+    elif args.action == "download":
+        if not args.key:
+            print("❌ --key is required for download action")
+            sys.exit(1)
+        download_evidence_file(bucket_name, args.key, args.output, args.region)
+
+    elif args.action == "mirror":
+        s3_client = boto3.client("s3", region_name=args.region)
+        objects = list(iter_evidence_objects(
+            s3_client, bucket_name, since=since, until=until, run_id=args.run_id
+        ))
+        print(f"Mirroring {len(objects)} evidence files to {args.mirror_dir} ({args.workers} workers)...")
+        counts = mirror_evidence_files(
+            bucket_name, objects, args.mirror_dir, args.region, args.workers
+        )
+        print(
+            f"✅ Downloaded: {counts['downloaded']} | "
+            f"Unchanged: {counts['skipped']} | Failed: {counts['failed']}"
+        )
+
+    elif args.action == "sync":
+        print(f"Syncing evidence to {args.mirror_dir} ({args.workers} workers)...")
+        counts = sync_evidence_mirror(bucket_name, args.mirror_dir, args.region, args.workers)
+        print(
+            f"✅ Partitions listed: {counts['partitions']} | Downloaded: {counts['downloaded']} | "
+            f"Unchanged: {counts['skipped']} | Failed: {counts['failed']}"
+        )
+